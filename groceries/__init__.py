@@ -1,3 +1,25 @@
-from . import format
-from .price_book import create_price_book, read_price_book
-from .shopping_list import generate_shopping_list
+import importlib
+
+# the public names of the package, and the module each is imported from on first use.
+# Importing the package itself stays cheap, since pandas, openpyxl and SQLAlchemy are
+# only imported by the modules that use them
+__LAZY = {
+    "format": "groceries.format",
+    "create_price_book": "groceries.price_book",
+    "read_price_book": "groceries.price_book",
+    "generate_shopping_list": "groceries.shopping_list",
+    "PriceMatrix": "groceries.price_matrix",
+}
+
+
+def __getattr__(name):
+    if name not in __LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(__LAZY[name])
+    if module.__name__.endswith(f".{name}"):
+        return module
+    return getattr(module, name)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__LAZY))
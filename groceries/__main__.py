@@ -0,0 +1,3 @@
+from groceries.cli import main
+
+raise SystemExit(main())
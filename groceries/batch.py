@@ -0,0 +1,140 @@
+"""
+Export the price books and shopping lists of many databases at once
+
+Each database (e.g. one per household) is a job, that is run on a process pool. Every
+job creates its own engine in the worker process, exports the price book and the
+shopping list of its database to its own output directory (formatted as they are
+written), and reports the time of each step. A failing job does not stop the other
+jobs, its error is reported instead.
+"""
+
+import logging
+import time
+import traceback
+
+from concurrent.futures import as_completed, ProcessPoolExecutor
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+from groceries import instrument
+from groceries.db import get_engine
+from groceries.price_book import create_price_book
+from groceries.shopping_list import generate_shopping_list
+
+logger = logging.getLogger(__name__)
+
+SQL_PATH = Path("sql") / "shopping_list.sql"
+
+
+def run_job(database, output_path, sql_path=SQL_PATH, force=False):
+    """
+    Export the price book and shopping list of a single database
+
+    Parameters
+    ----------
+    database : str or Path
+        path to the SQLite database
+    output_path : str or Path
+        directory to write `price_book.xlsx`, `shopping_list.xlsx` and `changed.xlsx`
+        to, created when it does not exist
+    sql_path : str or Path, optional
+        path to the shopping list query
+    force : bool, optional
+        export even when the files are up-to-date
+
+    Returns
+    -------
+    dict : the database, whether the job succeeded, the error message when it did not,
+        and the time and number of queries of each step
+    """
+    database = Path(database)
+    output_path = Path(output_path)
+    result = {"database": str(database), "ok": False, "error": None, "steps": {}}
+
+    def step(name, func, *args, **kwargs):
+        with instrument.stage(f"{database.stem}: {name}") as metrics:
+            func(*args, **kwargs)
+        result["steps"][name] = {"seconds": metrics.seconds, "queries": metrics.queries}
+
+    start = time.perf_counter()
+    engine = None
+    try:
+        if not database.exists():
+            raise FileNotFoundError(f"database not found: {database}")
+        output_path.mkdir(parents=True, exist_ok=True)
+
+        engine = get_engine(f"sqlite:///{database.absolute()}")
+        with Session(bind=engine) as session:
+            step(
+                "price book",
+                create_price_book,
+                session,
+                output_path / "price_book.xlsx",
+                force=force,
+            )
+            step(
+                "shopping list",
+                generate_shopping_list,
+                output_path=output_path / "shopping_list.xlsx",
+                changed_path=output_path / "changed.xlsx",
+                sql_path=sql_path,
+                session=session,
+                force=force,
+            )
+        result["ok"] = True
+    except Exception:
+        result["error"] = traceback.format_exc(limit=3)
+        logger.error(f"job failed for {database}:\n{result['error']}")
+    finally:
+        if engine is not None:
+            engine.dispose()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_batch(jobs, sql_path=SQL_PATH, force=False, max_workers=None):
+    """
+    Run the exports of many databases on a process pool
+
+    Parameters
+    ----------
+    jobs : iterable of tuple
+        (database path, output directory) of each job
+    sql_path : str or Path, optional
+        path to the shopping list query
+    force : bool, optional
+        export even when the files are up-to-date
+    max_workers : int, optional
+        number of worker processes, defaults to the number of CPUs
+
+    Returns
+    -------
+    dict : the number of jobs that succeeded and failed, the total wall time, and the
+        result of each job (see `run_job`) in the order of `jobs`
+    """
+    jobs = list(jobs)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(run_job, database, output_path, sql_path, force): k
+            for k, (database, output_path) in enumerate(jobs)
+        }
+        results = [None] * len(jobs)
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            status = "done" if result["ok"] else "FAILED"
+            logger.info(f"{status}: {result['database']} ({result['seconds']:.2f}s)")
+
+    report = {
+        "succeeded": sum(result["ok"] for result in results),
+        "failed": sum(not result["ok"] for result in results),
+        "seconds": time.perf_counter() - start,
+        "jobs": results,
+    }
+    logger.info(
+        f"batch finished {len(jobs)} jobs in {report['seconds']:.2f}s: "
+        f"{report['succeeded']} succeeded, {report['failed']} failed"
+    )
+    return report
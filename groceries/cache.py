@@ -0,0 +1,104 @@
+"""
+Skip exports when the data behind them has not changed
+
+Each export records the revision of its inputs in a small JSON stamp file next to the
+exported file. When the export is requested again with the same revision, and the
+exported file still exists, the export can be skipped.
+"""
+
+import json
+import logging
+
+from pathlib import Path
+
+from sqlalchemy import select, text
+
+from groceries.db import models
+
+logger = logging.getLogger(__name__)
+
+
+def db_revision(session, tables=None):
+    """
+    Get the current revision of the database tables
+
+    Parameters
+    ----------
+    session : Session
+        database session
+    tables : list of str, optional
+        names of the tables to get the revision for. Defaults to all tracked tables
+
+    Returns
+    -------
+    dict : revision counter for each table
+    """
+    if tables is None:
+        tables = models.revision.TRACKED_TABLES
+
+    # databases created before the revision counters existed do not have the triggers
+    # yet, so install them once. They go through the session's own connection, a
+    # second connection would wait on the session's lock
+    installed = session.execute(
+        text(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'trigger' AND name LIKE 'Revision_%'"
+        )
+    ).scalars()
+    if set(models.revision.trigger_names()) - set(installed):
+        logger.info("install revision triggers")
+        models.revision.install_triggers(session.connection())
+
+    query = select(models.Revision.table_name, models.Revision.revision).where(
+        models.Revision.table_name.in_(tables)
+    )
+    return dict(session.execute(query).all())
+
+
+def file_revision(path):
+    """return the revision of a file, based on its modification time and size"""
+    stat = Path(path).stat()
+    return {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def __stamp_path(path):
+    path = Path(path)
+    return path.with_name(f"{path.name}.rev.json")
+
+
+def __read_stamp(path):
+    try:
+        with open(__stamp_path(path), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def is_current(path, key, revision):
+    """
+    Check if an exported file is up-to-date
+
+    Parameters
+    ----------
+    path : str or Path
+        path to the exported file
+    key : str
+        name of the step that created the file, e.g. "export" or "format"
+    revision : dict
+        revision of the inputs for the step
+
+    Returns
+    -------
+    bool : True when the file exists and was last created from the same revision
+    """
+    if not Path(path).exists():
+        return False
+    return __read_stamp(path).get(key) == revision
+
+
+def stamp(path, key, revision):
+    """record that the file at `path` was created from `revision` by step `key`"""
+    stamps = __read_stamp(path)
+    stamps[key] = revision
+    with open(__stamp_path(path), "w") as f:
+        json.dump(stamps, f, indent=2)
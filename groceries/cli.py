@@ -0,0 +1,347 @@
+"""
+Command line interface, run with `python -m groceries <command>`
+
+Only the standard library is imported on startup. Each command imports the modules it
+needs when it runs, so `--help` (or a mistyped command) does not pay for importing
+pandas, openpyxl or SQLAlchemy, or for connecting to the database.
+"""
+
+import argparse
+import logging
+import subprocess
+import sys
+import time
+
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# modules that must not be imported when the CLI starts
+HEAVY_MODULES = ["numpy", "openpyxl", "pandas", "pyarrow", "sqlalchemy"]
+
+# maximum startup time of `python -m groceries --help`, in seconds, on top of the time
+# it takes to start the interpreter
+STARTUP_BUDGET = 0.1
+
+PRICE_COLUMNS = "EFG"
+
+
+def __session(args):
+    from groceries.db import get_session
+
+    return get_session(args.database)
+
+
+def __populate(args):
+    from groceries.db import get_engine, populate, recreate_all
+
+    if args.recreate:
+        recreate_all(get_engine(args.database))
+    session = __session(args)
+    populate.initial_populate(Path(args.data_path), session)
+    session.commit()
+
+
+def __migrate(args):
+    from groceries.db import get_engine
+    from groceries.db.migrate import migrate
+
+    migrate(get_engine(args.database))
+
+
+def __update_prices(args):
+    from groceries.db import populate
+
+    counts = populate.populate_prices(Path(args.path), __session(args))
+    logger.info(f"updated prices from {args.path}: {counts}")
+
+
+def __export_price_book(args):
+    from groceries.price_book import create_price_book
+
+    create_price_book(__session(args), args.path, force=args.force, as_of=args.as_of)
+
+
+def __import_price_book(args):
+    from groceries.price_book import read_price_book
+
+    session = __session(args)
+    read_price_book(args.path, session)
+    session.commit()
+
+
+def __shopping_list(args):
+    from groceries.shopping_list import generate_shopping_list
+
+    generate_shopping_list(
+        output_path=args.path,
+        changed_path=args.changed,
+        sql_path=args.sql,
+        session=__session(args),
+        force=args.force,
+        as_of=args.as_of,
+        trip_cost=args.trip_cost,
+    )
+
+
+def __watch(args):
+    from groceries.watch import PriceBookWatcher
+
+    watcher = PriceBookWatcher(
+        args.path,
+        __session(args),
+        output_path=args.shopping_list,
+        changed_path=args.changed,
+        sql_path=args.sql,
+    )
+    try:
+        watcher.run(interval=args.interval)
+    except KeyboardInterrupt:
+        logger.info("stopped watching")
+
+
+def __batch(args):
+    from groceries.batch import run_batch
+
+    report = run_batch(
+        args.job, sql_path=args.sql, force=args.force, max_workers=args.workers
+    )
+    for result in report["jobs"]:
+        if not result["ok"]:
+            logger.error(f"{result['database']}:\n{result['error']}")
+    return 1 if report["failed"] else 0
+
+
+def __format(args):
+    from groceries import format, tabular
+
+    for path in args.paths:
+        format.format_workbook(path, args.columns, format_=tabular.PRICE_FORMAT)
+
+
+def __parser():
+    parser = argparse.ArgumentParser(
+        prog="groceries", description="Track grocery prices, and plan where to shop"
+    )
+    parser.add_argument(
+        "--database",
+        metavar="URL",
+        help="database URL, defaults to the GROCERIES_DATABASE_URL environment "
+        "variable, or the test database",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="log debug messages"
+    )
+    commands = parser.add_subparsers(dest="command", metavar="command", required=True)
+
+    command = commands.add_parser(
+        "populate", help="populate the database from the setup files"
+    )
+    command.add_argument("data_path", help="directory with the setup CSV files")
+    command.add_argument(
+        "--recreate",
+        action="store_true",
+        help="drop and recreate all tables first, deleting all data",
+    )
+    command.set_defaults(func=__populate)
+
+    command = commands.add_parser(
+        "migrate",
+        help="add the tables, columns and triggers an existing database is missing, "
+        "keeping its data",
+    )
+    command.set_defaults(func=__migrate)
+
+    command = commands.add_parser(
+        "update-prices",
+        help="import a new prices file, writing only the prices that changed",
+    )
+    command.add_argument("path", help="prices file, in the setup file format")
+    command.set_defaults(func=__update_prices)
+
+    command = commands.add_parser(
+        "export-price-book", help="export the price book from the database"
+    )
+    command.add_argument("path", help="price book file (.xlsx, .csv or .parquet)")
+    command.add_argument(
+        "--as-of",
+        type=datetime.fromisoformat,
+        help="export the prices at this point in time (ISO format)",
+    )
+    command.add_argument(
+        "--force", action="store_true", help="export even when it is up-to-date"
+    )
+    command.set_defaults(func=__export_price_book)
+
+    command = commands.add_parser(
+        "import-price-book", help="apply the changes in a price book to the database"
+    )
+    command.add_argument("path", help="price book file (.xlsx, .csv or .parquet)")
+    command.set_defaults(func=__import_price_book)
+
+    command = commands.add_parser(
+        "shopping-list", help="generate the shopping list, and the changes to it"
+    )
+    command.add_argument("path", help="shopping list file")
+    command.add_argument(
+        "--changed", required=True, help="file for the changes to the shopping list"
+    )
+    command.add_argument(
+        "--sql",
+        default=str(Path("sql") / "shopping_list.sql"),
+        help="shopping list query (default: %(default)s)",
+    )
+    options = command.add_mutually_exclusive_group()
+    options.add_argument(
+        "--as-of",
+        type=datetime.fromisoformat,
+        help="use the prices at this point in time (ISO format). The query must "
+        "take an `as_of` parameter, e.g. sql/shopping_list_as_of.sql",
+    )
+    options.add_argument(
+        "--trip-cost",
+        type=float,
+        help="cost of each store visited, to trade off prices against trips",
+    )
+    command.add_argument(
+        "--force", action="store_true", help="generate even when it is up-to-date"
+    )
+    command.set_defaults(func=__shopping_list)
+
+    command = commands.add_parser(
+        "watch",
+        help="apply each saved edit of the price book, and regenerate the shopping "
+        "list",
+    )
+    command.add_argument("path", help="price book file to watch")
+    command.add_argument(
+        "--shopping-list", required=True, help="shopping list file to regenerate"
+    )
+    command.add_argument(
+        "--changed", required=True, help="file for the changes to the shopping list"
+    )
+    command.add_argument(
+        "--sql",
+        default=str(Path("sql") / "shopping_list.sql"),
+        help="shopping list query (default: %(default)s)",
+    )
+    command.add_argument(
+        "--interval",
+        type=float,
+        default=0.2,
+        help="seconds between checks of the price book (default: %(default)s)",
+    )
+    command.set_defaults(func=__watch)
+
+    command = commands.add_parser(
+        "batch",
+        help="export the price books and shopping lists of many databases at once",
+    )
+    command.add_argument(
+        "--job",
+        nargs=2,
+        action="append",
+        required=True,
+        metavar=("DATABASE", "OUTPUT"),
+        help="SQLite database, and the directory to export it to. Repeat for each "
+        "database",
+    )
+    command.add_argument(
+        "--sql",
+        default=str(Path("sql") / "shopping_list.sql"),
+        help="shopping list query (default: %(default)s)",
+    )
+    command.add_argument(
+        "--workers", type=int, help="number of worker processes (default: CPUs)"
+    )
+    command.add_argument(
+        "--force", action="store_true", help="export even when it is up-to-date"
+    )
+    command.set_defaults(func=__batch)
+
+    command = commands.add_parser(
+        "format", help="format the column widths and prices of existing workbooks"
+    )
+    command.add_argument("paths", nargs="+", help="workbooks to format in place")
+    command.add_argument(
+        "--columns",
+        default=PRICE_COLUMNS,
+        help="letters of the price columns (default: %(default)s)",
+    )
+    command.set_defaults(func=__format)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the command line interface
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        command line arguments, defaults to `sys.argv`
+
+    Returns
+    -------
+    int : exit code
+    """
+    args = __parser().parse_args(argv)
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(levelname)-8s :: %(message)s"))
+    package_logger = logging.getLogger("groceries")
+    package_logger.addHandler(handler)
+    package_logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
+
+    # imported once the arguments are parsed, as it imports SQLAlchemy
+    from groceries import instrument
+
+    with instrument.stage(args.command):
+        exit_code = args.func(args)
+    return exit_code or 0
+
+
+def __run(code):
+    """wall time of running `code` in a new interpreter"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def check_startup(budget=STARTUP_BUDGET, repeat=5):
+    """
+    Check that the CLI starts within its time budget, without importing heavy modules
+
+    The startup time of `python -m groceries --help` is measured in a new interpreter,
+    (the best of `repeat` runs) and compared to the startup time of the interpreter
+    itself.
+
+    Raises
+    ------
+    RuntimeError
+        when a heavy module is imported on startup, or startup is over budget
+    """
+    code = (
+        "import sys\n"
+        "from groceries import cli\n"
+        "try:\n"
+        "    cli.main(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"imported = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "assert not imported, f'imported on startup: {imported}'\n"
+    )
+    try:
+        __run(code)
+    except subprocess.CalledProcessError as exc:
+        raise RuntimeError(exc.stderr.decode().strip().splitlines()[-1]) from None
+
+    baseline = min(__run("pass") for _ in range(repeat))
+    startup = min(__run(code) for _ in range(repeat)) - baseline
+    message = f"startup time {startup * 1000:.0f} ms, budget {budget * 1000:.0f} ms"
+    if startup > budget:
+        raise RuntimeError(message)
+    logger.info(message)
+    return startup
@@ -2,12 +2,14 @@
 # flake8: noqa
 
 import logging
+import os
+import threading
 
 from pathlib import Path
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import scoped_session, sessionmaker
 
 Base = declarative_base()
 
@@ -15,6 +17,7 @@ logger = logging.getLogger(__name__)
 
 # must import models after Base is defined to avoid circular import error
 from . import models  # isort:skip
+from . import history  # isort:skip
 from . import populate  # isort:skip
 
 # path to project root
@@ -22,12 +25,104 @@ PATH = Path(__file__).parent.parent.parent.absolute()
 
 DATABASE_URI = f"sqlite:///{PATH / 'test_groceries.db'}"
 
+# environment variable with the URL of the database, overriding the default
+DATABASE_URL_ENV = "GROCERIES_DATABASE_URL"
 
-engine = create_engine(DATABASE_URI)
-session = Session(bind=engine)
+# applied to every new SQLite connection. WAL journaling lets readers (e.g. exports)
+# run concurrently with a writer (e.g. the price book import), and with WAL the
+# database is only synced at checkpoints instead of on every commit
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # negative values are in KiB
+    "temp_store": "MEMORY",
+}
 
+__lock = threading.Lock()
+__engines = {}
+__sessions = {}
 
-def recreate_all():
+
+def database_url(url=None):
+    """the database URL, from the argument, the environment or the default"""
+    if url is not None:
+        return str(url)
+    return os.environ.get(DATABASE_URL_ENV, DATABASE_URI)
+
+
+def __set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+def get_engine(url=None):
+    """
+    Get the engine for a database
+
+    Engines are created on first use and shared for each URL. Every SQLite connection
+    is configured with `SQLITE_PRAGMAS`.
+
+    Parameters
+    ----------
+    url : str, optional
+        database URL. Defaults to the `GROCERIES_DATABASE_URL` environment variable,
+        or the test database in the project root when that is not set
+
+    Returns
+    -------
+    Engine
+    """
+    url = database_url(url)
+    with __lock:
+        if url not in __engines:
+            engine = create_engine(url)
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", __set_sqlite_pragmas)
+            logger.debug(f"created database engine: {engine}")
+            __engines[url] = engine
+        return __engines[url]
+
+
+def get_session(url=None):
+    """
+    Get the thread-local session for a database
+
+    The returned `scoped_session` can be used like a `Session`, and gives each thread
+    its own session (and connection). Call `remove()` on it to close the session of
+    the current thread.
+
+    Parameters
+    ----------
+    url : str, optional
+        database URL, see `get_engine`
+
+    Returns
+    -------
+    scoped_session
+    """
+    url = database_url(url)
+    engine = get_engine(url)
+    with __lock:
+        if url not in __sessions:
+            __sessions[url] = scoped_session(sessionmaker(bind=engine))
+        return __sessions[url]
+
+
+def __getattr__(name):
+    # the default engine and session are created on first use, not on import
+    if name == "engine":
+        return get_engine()
+    if name == "session":
+        return get_session()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def recreate_all(engine=None):
+    if engine is None:
+        engine = get_engine()
     Base.metadata.drop_all(engine)
     Base.metadata.create_all(engine, checkfirst=False)
     logger.info("recreated database")
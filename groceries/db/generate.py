@@ -0,0 +1,130 @@
+"""
+Generate synthetic setup data at any scale
+
+The data is written as a setup directory, in the same layout that
+`populate.initial_populate` reads:
+
+- `base items/categories.csv`, `preference_types.csv`, `stores.csv` and `units.csv`
+- `items.csv`, with the category, unit and preferred store of each item
+- `prices.csv`, with one row per item and one column per store. Each cell is a price,
+  a preference type short name ("P" or "NP") or blank
+"""
+
+import logging
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PREFERENCE_TYPES = [("Standard", "S"), ("Preferred", "P"), ("Not Preferred", "NP")]
+
+UNITS = ["ea", "lb", "oz", "fl-oz", "gal", "pk", "bx"]
+
+
+def generate_setup(
+    path,
+    n_items=100,
+    n_stores=5,
+    n_categories=8,
+    preferred_density=0.05,
+    not_preferred_density=0.05,
+    blank_density=0.3,
+    preferred_store_density=0.1,
+    n_inactive_stores=1,
+    seed=None,
+):
+    """
+    Generate random setup data, and write it to a setup directory
+
+    Parameters
+    ----------
+    path : str or Path
+        setup directory to write the files to, created when it does not exist
+    n_items : int, optional
+        number of items
+    n_stores : int, optional
+        number of stores, including the inactive stores
+    n_categories : int, optional
+        number of categories
+    preferred_density : float, optional
+        fraction of the price cells with the preferred ("P") preference type
+    not_preferred_density : float, optional
+        fraction of the price cells with the not preferred ("NP") preference type
+    blank_density : float, optional
+        fraction of the price cells that are blank, every other cell has a price
+    preferred_store_density : float, optional
+        fraction of the items with a preferred store
+    n_inactive_stores : int, optional
+        number of stores that are not active
+    seed : int, optional
+        seed of the random generator, for repeatable data
+
+    Returns
+    -------
+    dict : number of rows written to each file
+    """
+    if preferred_density + not_preferred_density + blank_density > 1:
+        raise ValueError("the preference type and blank densities add up to over 1")
+
+    rng = np.random.default_rng(seed)
+    path = Path(path)
+    base_path = path / "base items"
+    base_path.mkdir(parents=True, exist_ok=True)
+
+    categories = [f"category {k}" for k in range(n_categories)]
+    stores = [f"Store {k}" for k in range(n_stores)]
+    active = np.arange(n_stores) < n_stores - n_inactive_stores
+
+    pd.DataFrame({"category": categories}).to_csv(
+        base_path / "categories.csv", index=False
+    )
+    pd.DataFrame(PREFERENCE_TYPES, columns=["type", "short"]).to_csv(
+        base_path / "preference_types.csv", index=False
+    )
+    pd.DataFrame({"name": stores, "active": active}).to_csv(
+        base_path / "stores.csv", index=False
+    )
+    pd.DataFrame({"unit": UNITS}).to_csv(base_path / "units.csv", index=False)
+
+    descriptions = np.array([f"item {k}" for k in range(n_items)], dtype=object)
+    has_pref_store = rng.random(n_items) < preferred_store_density
+    items = pd.DataFrame(
+        {
+            "description": descriptions,
+            "unit": rng.choice(UNITS, n_items),
+            "category": rng.choice(categories, n_items),
+            "preferred_store": np.where(
+                has_pref_store, rng.choice(stores, n_items), None
+            ),
+        }
+    )
+    items.to_csv(path / "items.csv", index=False)
+
+    # each cell is drawn from the cumulative densities of P, NP and blank cells
+    draw = rng.random((n_items, n_stores))
+    prices = np.char.mod("$%.2f", rng.integers(50, 2000, (n_items, n_stores)) / 100)
+    cells = np.select(
+        [
+            draw < preferred_density,
+            draw < preferred_density + not_preferred_density,
+            draw < preferred_density + not_preferred_density + blank_density,
+        ],
+        ["P", "NP", ""],
+        default=prices.astype(object),
+    )
+    df = pd.DataFrame(cells, columns=[store.lower() for store in stores])
+    df.insert(0, "item", descriptions)
+    df.insert(0, "index", np.arange(n_items))
+    df.to_csv(path / "prices.csv", index=False)
+
+    counts = {
+        "categories": n_categories,
+        "stores": n_stores,
+        "items": n_items,
+        "prices": int((cells != "").sum()),
+    }
+    logger.info(f"generated setup data at {path}: {counts}")
+    return counts
@@ -0,0 +1,84 @@
+"""
+Point-in-time queries on the price history
+
+Every change to the Prices table is recorded in the PriceHistory table, so the prices
+can be reconstructed as they were at any point in time.
+"""
+
+from sqlalchemy import func, select
+
+from . import models
+
+
+def prices_as_of(as_of):
+    """
+    Get the prices as they were at a point in time
+
+    The latest observation at or before `as_of` is selected for each store and item,
+    using the (StoreID, ItemID, ObservedAt) index. Prices that had been removed at that
+    time are not included.
+
+    Parameters
+    ----------
+    as_of : datetime or BindParameter
+        point in time to get the prices for, or a bound parameter to set it when the
+        query is run
+
+    Returns
+    -------
+    Subquery : with the same StoreID, ItemID, PreferenceTypeID and Price columns as the
+        Prices table, so it can be used in its place
+    """
+    history = models.PriceHistory.__table__
+
+    # SQLite returns the bare columns from the row with the max(ObservedAt)
+    latest = (
+        select(
+            history.c.StoreID,
+            history.c.ItemID,
+            history.c.PreferenceTypeID,
+            history.c.Price,
+            func.max(history.c.ObservedAt).label("ObservedAt"),
+        )
+        .where(history.c.ObservedAt <= as_of)
+        .group_by(history.c.StoreID, history.c.ItemID)
+        .subquery("LatestPrices")
+    )
+
+    return (
+        select(latest)
+        .where(latest.c.Price.is_not(None) | latest.c.PreferenceTypeID.is_not(None))
+        .subquery("PricesAsOf")
+    )
+
+
+def price_at(session, store_id, item_id, as_of=None):
+    """
+    Get the price of an item at a store at a point in time
+
+    Parameters
+    ----------
+    session : Session
+        database session
+    store_id : int
+        ID of the store
+    item_id : int
+        ID of the item
+    as_of : datetime, optional
+        point in time to get the price for. Defaults to the latest price
+
+    Returns
+    -------
+    PriceHistory or None : the latest observation at or before `as_of`, or None when
+        the item was never priced at the store before then. The price and preference
+        are both None when the price had been removed
+    """
+    query = select(models.PriceHistory).where(
+        models.PriceHistory.store_id == store_id,
+        models.PriceHistory.item_id == item_id,
+    )
+    if as_of is not None:
+        query = query.where(models.PriceHistory.observed_at <= as_of)
+
+    query = query.order_by(models.PriceHistory.observed_at.desc()).limit(1)
+    return session.execute(query).scalars().first()
@@ -0,0 +1,110 @@
+"""
+Bring the schema of an existing database up-to-date with the models, keeping its data
+
+`recreate_all` drops every table, so it can only be used on a new database. A migration
+instead adds whatever the database is missing:
+
+- tables that do not exist yet, e.g. the PriceHistory table
+- columns that do not exist yet, e.g. Prices.ObservedAt. SQLite can only add nullable
+  columns, so the column default of the model is written to every existing row
+- indexes, triggers and the tables maintained by triggers
+
+The price history of a database that did not have one starts with the current prices,
+as observed when they were last written (or at the time of the migration).
+"""
+
+import logging
+
+from sqlalchemy import bindparam, inspect, select, text
+
+from . import Base, get_engine, models
+
+logger = logging.getLogger(__name__)
+
+
+def __default(column):
+    """the value of the default of a column, or None when it has no default"""
+    default = column.default
+    if default is None or not (default.is_scalar or default.is_callable):
+        return None
+    # callable defaults are wrapped to take the execution context
+    return default.arg(None) if default.is_callable else default.arg
+
+
+def __add_columns(connection, table, existing):
+    """add the columns of a table that do not exist yet, set to their default"""
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        type_ = column.type.compile(dialect=connection.dialect)
+        connection.exec_driver_sql(
+            f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {type_}'
+        )
+        default = __default(column)
+        if default is not None:
+            stmt = text(f'UPDATE "{table.name}" SET "{column.name}" = :value')
+            stmt = stmt.bindparams(bindparam("value", default, type_=column.type))
+            connection.execute(stmt)
+        added.append(column.name)
+    return added
+
+
+def __seed_history(connection):
+    """record the current prices as the first observations of the price history"""
+    history = models.PriceHistory.__table__
+    price = models.Price.__table__
+    columns = ["StoreID", "ItemID", "PreferenceTypeID", "Price", "ObservedAt", "Note"]
+    query = select(*(price.c[column] for column in columns))
+    connection.execute(history.insert().from_select(columns, query))
+
+
+def migrate(engine=None):
+    """
+    Add the tables, columns, indexes and triggers an existing database is missing
+
+    This is safe to run on a database that is already up-to-date, anything that already
+    exists is left alone. Everything is done in a single transaction.
+
+    Parameters
+    ----------
+    engine : Engine, optional
+        engine of the database, defaults to the default engine
+
+    Returns
+    -------
+    dict : the names of the tables that were created, and the names of the columns
+        that were added to each table
+    """
+    if engine is None:
+        engine = get_engine()
+
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        existing = set(inspector.get_table_names())
+        created = [
+            t.name for t in Base.metadata.sorted_tables if t.name not in existing
+        ]
+
+        # columns are added before the triggers are installed, so filling them in does
+        # not fire any trigger
+        columns = {}
+        for table in Base.metadata.sorted_tables:
+            if table.name in existing:
+                names = {c["name"] for c in inspector.get_columns(table.name)}
+                added = __add_columns(connection, table, names)
+                if added:
+                    columns[table.name] = added
+
+        # creates the missing tables and indexes, and installs the triggers
+        Base.metadata.create_all(connection, checkfirst=True)
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+        if models.PriceHistory.__tablename__ in created:
+            __seed_history(connection)
+
+    changes = {"created": created, "columns": columns}
+    logger.info(f"migrated database {engine.url}: {changes}")
+    return changes
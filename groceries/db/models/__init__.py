@@ -1,9 +1,13 @@
 # pylint: disable=F
 # flake8: noqa
 
+from .best_price import BestPrice
 from .category import Category
 from .item import Item
 from .preference import PreferenceType
 from .price import Price
+from .price_hash import PriceHash
+from .price_history import PriceHistory
+from .revision import Revision
 from .store import Store
 from .unit import Unit
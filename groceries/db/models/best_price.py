@@ -0,0 +1,163 @@
+from sqlalchemy import Column, event, Float, ForeignKey, inspect, Integer
+from sqlalchemy.orm import relationship
+
+from .. import Base
+
+
+class BestPrice(Base):
+    """
+    Cheapest store and price of each item, as chosen by the shopping list
+
+    The table is maintained by triggers on the Prices, Items, Stores and
+    PreferenceTypes tables, so it is always up-to-date and the shopping list is read
+    with one row per item instead of aggregating every price. An item has a row when it
+    is active and has a standard or preferred price at an active store (its preferred
+    store, when it has one).
+
+    The table and triggers are created with the schema, or added to an existing
+    database by a migration.
+    """
+
+    __tablename__ = "BestPrices"
+
+    item_id = Column("ItemID", Integer, ForeignKey("Items.ItemID"), primary_key=True)
+    store_id = Column("StoreID", Integer, ForeignKey("Stores.StoreID"), nullable=False)
+    price = Column("Price", Float, nullable=True)
+
+    item = relationship("Item")
+    store = relationship("Store")
+
+    def __init__(self, item, store, price):
+        self.item = item
+        self.store = store
+        self.price = price
+
+    def __repr__(self):
+        return f"{self.item}, {self.store}, {self.price}"
+
+
+def __insert_best(where):
+    """
+    SQL to insert the best price of the items that match a condition on the Prices
+
+    This is the selection `sql/shopping_list.sql` used to make over the whole Prices
+    table.
+    """
+    return f"""
+        INSERT INTO BestPrices (ItemID, StoreID, Price)
+        SELECT P.ItemID, P.StoreID, min(P.Price)
+        FROM Prices AS P
+            INNER JOIN Stores AS S ON P.StoreID = S.StoreID
+            INNER JOIN Items AS I ON P.ItemID = I.ItemID
+        WHERE {where}
+            AND S.Active = 1 AND I.Active = 1
+            AND P.PreferenceTypeID IN (
+                SELECT TypeID FROM PreferenceTypes WHERE ShortType IN ('P', 'S')
+            )
+            AND (I.PreferredStoreID IS NULL OR I.PreferredStoreID = P.StoreID)
+        GROUP BY P.ItemID
+    """
+
+
+def __recompute(items=None):
+    """
+    SQL to recompute the best price of some items (item ID expressions or a subquery),
+    or of all items
+
+    For some items, their prices are looked up through the index on Prices.ItemID, so
+    only the prices of those items are read.
+    """
+    if items is None:
+        return f"DELETE FROM BestPrices; {__insert_best('1 = 1')};"
+    return (
+        f"DELETE FROM BestPrices WHERE ItemID IN ({items}); "
+        f"{__insert_best(f'P.ItemID IN ({items})')};"
+    )
+
+
+TRIGGERS = {
+    "BestPrices_Prices_INSERT": f"""
+        CREATE TRIGGER IF NOT EXISTS "BestPrices_Prices_INSERT"
+        AFTER INSERT ON "Prices"
+        BEGIN {__recompute("NEW.ItemID")} END
+    """,
+    "BestPrices_Prices_UPDATE": f"""
+        CREATE TRIGGER IF NOT EXISTS "BestPrices_Prices_UPDATE"
+        AFTER UPDATE OF StoreID, ItemID, PreferenceTypeID, Price ON "Prices"
+        BEGIN {__recompute("OLD.ItemID, NEW.ItemID")} END
+    """,
+    "BestPrices_Prices_DELETE": f"""
+        CREATE TRIGGER IF NOT EXISTS "BestPrices_Prices_DELETE"
+        AFTER DELETE ON "Prices"
+        BEGIN {__recompute("OLD.ItemID")} END
+    """,
+    "BestPrices_Items_UPDATE": f"""
+        CREATE TRIGGER IF NOT EXISTS "BestPrices_Items_UPDATE"
+        AFTER UPDATE OF Active, PreferredStoreID ON "Items"
+        WHEN OLD.Active IS NOT NEW.Active
+            OR OLD.PreferredStoreID IS NOT NEW.PreferredStoreID
+        BEGIN {__recompute("NEW.ItemID")} END
+    """,
+    "BestPrices_Items_DELETE": """
+        CREATE TRIGGER IF NOT EXISTS "BestPrices_Items_DELETE"
+        AFTER DELETE ON "Items"
+        BEGIN DELETE FROM BestPrices WHERE ItemID = OLD.ItemID; END
+    """,
+    # only the items with a price at the store can change
+    "BestPrices_Stores_UPDATE": f"""
+        CREATE TRIGGER IF NOT EXISTS "BestPrices_Stores_UPDATE"
+        AFTER UPDATE OF Active ON "Stores"
+        WHEN OLD.Active IS NOT NEW.Active
+        BEGIN
+            {__recompute("SELECT ItemID FROM Prices WHERE StoreID = NEW.StoreID")}
+        END
+    """,
+    "BestPrices_PreferenceTypes_UPDATE": f"""
+        CREATE TRIGGER IF NOT EXISTS "BestPrices_PreferenceTypes_UPDATE"
+        AFTER UPDATE OF ShortType ON "PreferenceTypes"
+        BEGIN {__recompute()} END
+    """,
+}
+
+
+def rebuild(connection):
+    """recompute the best price of every item"""
+    connection.exec_driver_sql("DELETE FROM BestPrices")
+    connection.exec_driver_sql(__insert_best("1 = 1"))
+
+
+def install_triggers(connection):
+    """
+    Create the BestPrices table and the triggers that maintain it, and fill it from
+    the current prices
+
+    This is safe to run on an existing database, the table and triggers are only
+    created when they do not exist yet.
+    """
+    BestPrice.__table__.create(connection, checkfirst=True)
+    for ddl in TRIGGERS.values():
+        connection.exec_driver_sql(ddl)
+    rebuild(connection)
+
+
+def drop_triggers(connection):
+    """
+    Drop the triggers that maintain the BestPrices table
+
+    While they are dropped, the table is not kept up-to-date. Use `install_triggers` to
+    create them again, which also rebuilds the table.
+    """
+    for name in TRIGGERS:
+        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS "{name}"')
+
+
+def is_installed(connection):
+    """whether the BestPrices table exists"""
+    return inspect(connection).has_table(BestPrice.__tablename__)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def __after_create(target, connection, **kwargs):
+    # the triggers reference the Prices, Items, Stores and PreferenceTypes tables, so
+    # wait until all tables exist
+    install_triggers(connection)
@@ -8,12 +8,22 @@ class Item(Base):
     __tablename__ = "Items"
 
     item_id = Column("ItemID", Integer, primary_key=True, autoincrement=True)
-    unit_id = Column("UnitID", Integer, ForeignKey("Units.UnitID"), nullable=True)
+    unit_id = Column(
+        "UnitID", Integer, ForeignKey("Units.UnitID"), nullable=True, index=True
+    )
     category_id = Column(
-        "CategoryID", Integer, ForeignKey("Categories.CategoryID"), nullable=True
+        "CategoryID",
+        Integer,
+        ForeignKey("Categories.CategoryID"),
+        nullable=True,
+        index=True,
     )
     preferred_store_id = Column(
-        "PreferredStoreID", Integer, ForeignKey("Stores.StoreID"), nullable=True
+        "PreferredStoreID",
+        Integer,
+        ForeignKey("Stores.StoreID"),
+        nullable=True,
+        index=True,
     )
 
     description = Column("Description", String, nullable=False, unique=True)
@@ -7,6 +7,7 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     UniqueConstraint,
@@ -23,23 +24,52 @@ class Price(Base):
     store_id = Column("StoreID", Integer, ForeignKey("Stores.StoreID"), nullable=False)
     item_id = Column("ItemID", Integer, ForeignKey("Items.ItemID"), nullable=False)
     preference_type_id = Column(
-        "PreferenceTypeID", Integer, ForeignKey("PreferenceTypes.TypeID"), nullable=True
+        "PreferenceTypeID",
+        Integer,
+        ForeignKey("PreferenceTypes.TypeID"),
+        nullable=True,
+        index=True,
     )
 
     price = Column("Price", Float, CheckConstraint('"Price" > 0'), nullable=True)
+    observed_at = Column(
+        "ObservedAt",
+        DateTime,
+        nullable=False,
+        default=datetime.now,
+        onupdate=datetime.now,
+    )
+    note = Column("Note", String, nullable=True)
 
     store = relationship("Store")
     preference = relationship("PreferenceType")
 
     item = relationship("Item", back_populates="prices")
 
-    __table_args__ = (UniqueConstraint("StoreID", "ItemID"),)
+    __table_args__ = (
+        # also serves as the index for lookups by StoreID
+        UniqueConstraint("StoreID", "ItemID"),
+        # covers the shopping list aggregation, which groups on ItemID and only needs
+        # the preference type, store and price. This also serves lookups by ItemID
+        Index(
+            "ix_Prices_ItemID_PreferenceTypeID_StoreID_Price",
+            "ItemID",
+            "PreferenceTypeID",
+            "StoreID",
+            "Price",
+        ),
+    )
 
-    def __init__(self, store, item, price, preference=None):
+    def __init__(
+        self, store, item, price, preference=None, observed_at=None, note=None
+    ):
         self.store = store
         self.item = item
         self.price = price
         self.preference = preference
+        # an explicit None would be stored instead of the column default
+        self.observed_at = datetime.now() if observed_at is None else observed_at
+        self.note = note
 
     def __repr__(self):
         return f"{self.store}, {self.item}, {self.price}, {self.preference}"
@@ -0,0 +1,89 @@
+from sqlalchemy import Column, event, ForeignKey, Integer
+
+from .. import Base
+
+
+class PriceHash(Base):
+    """
+    Content hash of the prices file cell each price was last imported from
+
+    Every cell has a hash, including blank cells. Triggers delete the hash of a price
+    whenever the price is written by anything else, e.g. a price book import, so a
+    missing hash means the price may differ from the cell. When the prices file is
+    imported again, only the cells with a different or missing hash are written.
+    """
+
+    __tablename__ = "PriceHashes"
+
+    # the primary key starts with the item, to look up the hashes of a chunk of items
+    item_id = Column("ItemID", Integer, ForeignKey("Items.ItemID"), primary_key=True)
+    store_id = Column(
+        "StoreID", Integer, ForeignKey("Stores.StoreID"), primary_key=True
+    )
+    hash_ = Column("Hash", Integer, nullable=False)
+
+    def __init__(self, store_id, item_id, hash_):
+        self.store_id = store_id
+        self.item_id = item_id
+        self.hash_ = hash_
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}({self.store_id}, {self.item_id}, {self.hash_})"
+        )
+
+
+def __invalidate(row):
+    return (
+        f"DELETE FROM PriceHashes "
+        f"WHERE ItemID = {row}.ItemID AND StoreID = {row}.StoreID;"
+    )
+
+
+TRIGGERS = {
+    "PriceHashes_Prices_INSERT": f"""
+        CREATE TRIGGER IF NOT EXISTS "PriceHashes_Prices_INSERT"
+        AFTER INSERT ON "Prices"
+        BEGIN {__invalidate("NEW")} END
+    """,
+    "PriceHashes_Prices_UPDATE": f"""
+        CREATE TRIGGER IF NOT EXISTS "PriceHashes_Prices_UPDATE"
+        AFTER UPDATE OF StoreID, ItemID, PreferenceTypeID, Price ON "Prices"
+        BEGIN {__invalidate("OLD")} {__invalidate("NEW")} END
+    """,
+    "PriceHashes_Prices_DELETE": f"""
+        CREATE TRIGGER IF NOT EXISTS "PriceHashes_Prices_DELETE"
+        AFTER DELETE ON "Prices"
+        BEGIN {__invalidate("OLD")} END
+    """,
+}
+
+
+def is_installed(connection):
+    """whether every trigger that invalidates the hashes exists"""
+    names = connection.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+    ).scalars()
+    return set(TRIGGERS).issubset(names)
+
+
+def install_triggers(connection):
+    """
+    Create the PriceHashes table and the triggers that invalidate its hashes
+
+    This is safe to run on an existing database. When the triggers did not exist yet,
+    prices may have been written without invalidating their hashes, so every stored
+    hash is deleted and the next import writes every cell once.
+    """
+    PriceHash.__table__.create(connection, checkfirst=True)
+    if is_installed(connection):
+        return
+    connection.execute(PriceHash.__table__.delete())
+    for ddl in TRIGGERS.values():
+        connection.exec_driver_sql(ddl)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def __after_create(target, connection, **kwargs):
+    # the triggers reference the Prices table, so wait until all tables exist
+    install_triggers(connection)
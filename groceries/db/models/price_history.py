@@ -0,0 +1,133 @@
+from datetime import datetime
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    event,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+)
+from sqlalchemy.orm import relationship
+
+from .. import Base
+
+# current local time, in the same format SQLAlchemy stores DateTime values in SQLite
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f000', 'now', 'localtime')"
+
+
+class PriceHistory(Base):
+    """
+    Append-only record of every price observation
+
+    A row is added by a trigger each time a Price is inserted or updated. When a Price
+    is deleted, a row without a price or preference type is added to mark that the
+    item is no longer priced at that store from then on.
+    """
+
+    __tablename__ = "PriceHistory"
+
+    history_id = Column("HistoryID", Integer, primary_key=True, autoincrement=True)
+    store_id = Column("StoreID", Integer, ForeignKey("Stores.StoreID"), nullable=False)
+    item_id = Column("ItemID", Integer, ForeignKey("Items.ItemID"), nullable=False)
+    preference_type_id = Column(
+        "PreferenceTypeID", Integer, ForeignKey("PreferenceTypes.TypeID"), nullable=True
+    )
+
+    price = Column("Price", Float, nullable=True)
+    observed_at = Column("ObservedAt", DateTime, nullable=False, default=datetime.now)
+    note = Column("Note", String, nullable=True)
+
+    store = relationship("Store")
+    item = relationship("Item")
+    preference = relationship("PreferenceType")
+
+    # as-of and latest price lookups for a store and item are index seeks
+    __table_args__ = (
+        Index(
+            "ix_PriceHistory_StoreID_ItemID_ObservedAt",
+            "StoreID",
+            "ItemID",
+            "ObservedAt",
+        ),
+    )
+
+    def __init__(
+        self, store, item, price, preference=None, observed_at=None, note=None
+    ):
+        self.store = store
+        self.item = item
+        self.price = price
+        self.preference = preference
+        # an explicit None would be stored instead of the column default
+        self.observed_at = datetime.now() if observed_at is None else observed_at
+        self.note = note
+
+    def __repr__(self):
+        return (
+            f"{self.observed_at}: {self.store}, {self.item}, {self.price}, "
+            f"{self.preference}"
+        )
+
+
+TRIGGERS = {
+    "PriceHistory_INSERT": f"""
+        CREATE TRIGGER IF NOT EXISTS "PriceHistory_INSERT" AFTER INSERT ON "Prices"
+        BEGIN
+            INSERT INTO PriceHistory
+                (StoreID, ItemID, PreferenceTypeID, Price, ObservedAt, Note)
+            VALUES (
+                NEW.StoreID, NEW.ItemID, NEW.PreferenceTypeID, NEW.Price,
+                coalesce(NEW.ObservedAt, {SQLITE_NOW}), NEW.Note
+            );
+        END
+    """,
+    # an update that does not set the observation time (e.g. a plain SQL update) is
+    # observed now, not at the time of the price it replaces
+    "PriceHistory_UPDATE": f"""
+        CREATE TRIGGER IF NOT EXISTS "PriceHistory_UPDATE"
+        AFTER UPDATE OF StoreID, ItemID, PreferenceTypeID, Price ON "Prices"
+        BEGIN
+            INSERT INTO PriceHistory
+                (StoreID, ItemID, PreferenceTypeID, Price, ObservedAt, Note)
+            VALUES (
+                NEW.StoreID, NEW.ItemID, NEW.PreferenceTypeID, NEW.Price,
+                CASE
+                    WHEN NEW.ObservedAt IS NOT OLD.ObservedAt
+                        AND NEW.ObservedAt IS NOT NULL
+                    THEN NEW.ObservedAt
+                    ELSE {SQLITE_NOW}
+                END,
+                NEW.Note
+            );
+        END
+    """,
+    "PriceHistory_DELETE": f"""
+        CREATE TRIGGER IF NOT EXISTS "PriceHistory_DELETE" AFTER DELETE ON "Prices"
+        BEGIN
+            INSERT INTO PriceHistory
+                (StoreID, ItemID, PreferenceTypeID, Price, ObservedAt, Note)
+            VALUES (OLD.StoreID, OLD.ItemID, NULL, NULL, {SQLITE_NOW}, 'removed');
+        END
+    """,
+}
+
+
+def install_triggers(connection):
+    """
+    Create the triggers that record every change to Prices in the PriceHistory
+
+    Existing triggers are replaced, so a database created with an older version of a
+    trigger gets the current one.
+    """
+    for name, ddl in TRIGGERS.items():
+        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS "{name}"')
+        # executed as-is, the strftime format is not a bound parameter
+        connection.exec_driver_sql(ddl)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def __after_create(target, connection, **kwargs):
+    install_triggers(connection)
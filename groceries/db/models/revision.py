@@ -0,0 +1,73 @@
+import time
+
+from sqlalchemy import Column, DDL, event, Integer, String
+
+from .. import Base
+
+# tables that make up the data behind the exports. Every insert, update or delete on
+# one of these tables increments its revision counter
+TRACKED_TABLES = [
+    "Categories",
+    "Items",
+    "PreferenceTypes",
+    "Prices",
+    "Stores",
+    "Units",
+]
+
+
+class Revision(Base):
+    __tablename__ = "Revisions"
+
+    table_name = Column("TableName", String, primary_key=True)
+    revision = Column("Revision", Integer, nullable=False, default=0)
+
+    def __init__(self, table_name, revision=0):
+        self.table_name = table_name
+        self.revision = revision
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}('{self.table_name}', {self.revision})"
+
+
+def trigger_names():
+    """return the names of all the triggers that maintain the revision counters"""
+    ops = ["INSERT", "UPDATE", "DELETE"]
+    return [f"Revision_{table}_{op}" for table in TRACKED_TABLES for op in ops]
+
+
+def install_triggers(connection):
+    """
+    Create the triggers that maintain the revision counter of each tracked table
+
+    This is safe to run on an existing database; anything that already exists is left
+    alone.
+    """
+    Revision.__table__.create(connection, checkfirst=True)
+
+    # counters start at the current time (in ns) rather than zero, so a recreated
+    # database never repeats a revision that was handed out before it was recreated
+    start = time.time_ns()
+    for table in TRACKED_TABLES:
+        connection.execute(
+            DDL(
+                f"INSERT OR IGNORE INTO Revisions (TableName, Revision) "
+                f"VALUES ('{table}', {start})"
+            )
+        )
+
+    for name in trigger_names():
+        _, table, op = name.split("_")
+        connection.execute(
+            DDL(
+                f'CREATE TRIGGER IF NOT EXISTS "{name}" AFTER {op} ON "{table}" '
+                f"BEGIN UPDATE Revisions SET Revision = Revision + 1 "
+                f"WHERE TableName = '{table}'; END"
+            )
+        )
+
+
+@event.listens_for(Base.metadata, "after_create")
+def __after_create(target, connection, **kwargs):
+    # the triggers reference the tracked tables, so wait until all tables exist
+    install_triggers(connection)
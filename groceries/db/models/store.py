@@ -1,5 +1,3 @@
-import numpy as np
-
 from sqlalchemy import Boolean, Column, Float, Integer, String
 
 from .. import Base
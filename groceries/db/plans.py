@@ -0,0 +1,170 @@
+"""
+Query plan checks for the queries shipped with the package
+
+Each query is run through SQLite's `EXPLAIN QUERY PLAN`, and the check fails when any
+of them reads the Prices table with a full table scan instead of through an index.
+"""
+
+import logging
+import re
+
+from pathlib import Path
+
+from sqlalchemy import bindparam, create_engine, DateTime, text
+from sqlalchemy.orm import Session
+
+from . import Base
+from .queries import load_query
+
+logger = logging.getLogger(__name__)
+
+# matches the table and alias from a "SCAN" step of a query plan. Older versions of
+# SQLite report these as "SCAN TABLE <table> AS <alias>"
+SCAN = re.compile(r"^SCAN (?:TABLE )?(?P<name>\S+)(?: AS (?P<alias>\S+))?(?P<rest>.*)$")
+
+# matches a subquery that is evaluated before the step that reads it
+SUBQUERY = re.compile(r"^(?:MATERIALIZE|CO-ROUTINE) (?P<name>\S+)$")
+
+
+class QueryPlanError(Exception):
+    """raised when a query plan falls back to a full table scan"""
+
+
+def query_plan(session, statement):
+    """
+    Get the query plan for a statement
+
+    Parameters
+    ----------
+    session : Session
+        database session
+    statement : str or Executable
+        SQL text or SQLAlchemy statement to explain. Any bound parameters are set to
+        NULL, they do not change the plan
+
+    Returns
+    -------
+    list of tuple : (id, parent id, detail) of each step of the query plan
+    """
+    if isinstance(statement, str):
+        statement = text(statement)
+
+    compiled = statement.compile(dialect=session.get_bind().dialect)
+    params = (None,) * len(compiled.positiontup or [])
+
+    connection = session.connection()
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+    return [(row[0], row[1], row[-1]) for row in rows]
+
+
+def __table_names(sql, table):
+    """return the table name and all the aliases it is used as in the SQL"""
+    aliases = re.findall(rf'"?\b{table}\b"?\s+AS\s+"?(\w+)"?', sql, flags=re.IGNORECASE)
+    return {table, *aliases}
+
+
+def full_scans(session, statement, table="Prices"):
+    """
+    Find the steps of a query plan that do a full table scan of a table
+
+    Parameters
+    ----------
+    session : Session
+        database session
+    statement : str or Executable
+        SQL text or SQLAlchemy statement to check
+    table : str, optional
+        name of the table, defaults to "Prices"
+
+    Returns
+    -------
+    list of str : the query plan steps that scan the table without an index
+    """
+    sql = str(statement) if not isinstance(statement, str) else statement
+    names = __table_names(sql, table)
+
+    plan = query_plan(session, statement)
+
+    # a subquery can reuse the alias of the table, e.g. "(... from Prices as P) as P".
+    # Scans of the subquery are at the same level of the plan as its materialization
+    subqueries = {}
+    for _, parent, detail in plan:
+        match = SUBQUERY.match(detail)
+        if match is not None:
+            subqueries.setdefault(parent, set()).add(match["name"])
+
+    scans = []
+    for _, parent, detail in plan:
+        match = SCAN.match(detail)
+        if match is None or "INDEX" in match["rest"]:
+            continue
+        name = match["alias"] or match["name"]
+        if name in subqueries.get(parent, set()):
+            continue
+        if match["name"] in names or name in names:
+            scans.append(detail)
+    return scans
+
+
+def shipped_queries(sql_path):
+    """
+    Get all the queries shipped with the package
+
+    Parameters
+    ----------
+    sql_path : str or Path
+        directory with the shipped `.sql` files
+
+    Returns
+    -------
+    dict : query name and the SQL text or statement
+    """
+    # imported here, the price matrix imports the database package
+    from groceries.price_matrix import price_matrix_query
+
+    queries = {
+        "price_matrix": price_matrix_query(),
+        "price_matrix_as_of": price_matrix_query(
+            as_of=bindparam("as_of", type_=DateTime)
+        ),
+    }
+    for path in sorted(Path(sql_path).glob("*.sql")):
+        queries[path.stem] = load_query(path)
+    return queries
+
+
+def check_query_plans(sql_path, session=None, table="Prices"):
+    """
+    Check that none of the shipped queries do a full table scan of the Prices table
+
+    Parameters
+    ----------
+    sql_path : str or Path
+        directory with the shipped `.sql` files
+    session : Session, optional
+        database session. Defaults to a new in-memory database created from the
+        models, so the plans reflect the declared schema and indexes
+    table : str, optional
+        name of the table that must not be fully scanned, defaults to "Prices"
+
+    Raises
+    ------
+    QueryPlanError
+        when any of the queries does a full table scan
+    """
+    if session is None:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        session = Session(bind=engine)
+
+    failures = {}
+    for name, statement in shipped_queries(sql_path).items():
+        scans = full_scans(session, statement, table=table)
+        logger.debug(f"query plan for '{name}': {len(scans)} full scan(s) of {table}")
+        if scans:
+            failures[name] = scans
+
+    if failures:
+        details = "\n".join(f"  {name}: {scans}" for name, scans in failures.items())
+        raise QueryPlanError(f"full table scan of {table} in:\n{details}")
+    logger.info(f"no full table scans of {table} in the shipped queries")
@@ -3,142 +3,300 @@ import logging
 import numpy as np
 import pandas as pd
 
-from .. import models
-
-logger = logging.getLogger(__name__)
-
-
-def __get_setup(path, func):
-
-    df = pd.read_csv(path, na_filter=False)
-    df["model"] = df.apply(lambda row: func(row), axis=1)
-    return df["model"].tolist()
-
-
-def get_base_items(path):
-
-    maps = {
-        "categories.csv": lambda row: models.Category(category=row["category"]),
-        "preference_types.csv": lambda row: models.PreferenceType(
-            type_=row["type"], short=row["short"]
-        ),
-        "stores.csv": lambda row: models.Store(name=row["name"], active=row["active"]),
-        "units.csv": lambda row: models.Unit(row["unit"]),
-    }
-
-    data = {}
-    for filename, func in maps.items():
-        full_path = path / filename
-        items = __get_setup(full_path, func)
-        data.setdefault(filename, items)
-        # print(items)
-    return data
-
-
-def get_items(items_path, categories_db, units_db, stores_db):
-    # must be done after base items have been loaded
-
-    categories = {category.category: category for category in categories_db}
-    units = {unit.unit: unit for unit in units_db}
-    stores = {store.name: store for store in stores_db}
-
-    df = pd.read_csv(items_path)
-
-    df["model"] = df.apply(
-        lambda row: models.Item(
-            description=row["description"],
-            unit=units.get(row["unit"], None),
-            category=categories.get(row["category"], None),
-            preferred_store=stores.get(row["preferred_store"]),
-        ),
-        axis=1,
-    )
-    items = df["model"].tolist()
-
-    return items
-
-
-def __create_price(row):
-    store = row["Store"]
-    item = row["Item"]
-    price_val = row["price"]
-    pref = row["Preference"]
-
-    if np.isnan(price_val) and pref.short == "S":
-        return None
-    price_ = models.Price(store=store, item=item, price=price_val, preference=pref)
-    return price_
+from sqlalchemy import bindparam, delete, insert, select
+from sqlalchemy.dialects import sqlite
 
+from groceries import tabular
 
-def __parse_price(price_):
-    try:
-        return float(price_)
-    except ValueError:
-        return np.nan
-
-
-def get_prices(price_path, stores_db, items_db, preferences_db):
-    stores = {store.name.lower(): store for store in stores_db}
-    items = {item.description: item for item in items_db}
-    preferences = {preference.short: preference for preference in preferences_db}
+from .. import models
+from ..models import best_price, price_hash
+from ..reference import get_reference
 
-    df = pd.read_csv(price_path)
+logger = logging.getLogger(__name__)
 
-    # change all the store (price) columns into rows
+# maximum number of rows inserted (and committed) in a single transaction
+CHUNK_SIZE = 10_000
+
+# the base item files, with the model and the table column of each file column
+BASE_FILES = {
+    "categories.csv": (models.Category, {"category": "Category"}),
+    "preference_types.csv": (
+        models.PreferenceType,
+        {"type": "Type", "short": "ShortType"},
+    ),
+    "stores.csv": (models.Store, {"name": "Store", "active": "Active"}),
+    "units.csv": (models.Unit, {"unit": "Unit"}),
+}
+
+
+def __none(values):
+    """convert a Series to a list, replacing any missing values with None"""
+    values = values.astype(object)
+    return values.where(values.notnull(), None).tolist()
+
+
+def __records(df, columns):
+    """rows of a DataFrame as insert parameters, with the table column names as keys"""
+    keys = list(columns.values())
+    values = zip(*(__none(df[column]) for column in columns))
+    return [dict(zip(keys, row)) for row in values]
+
+
+def __ids(values, ids):
+    """map values to IDs, as integers with None for values without an ID"""
+    return values.map(ids).astype("Int64")
+
+
+def __lookup(session, name_column, id_column):
+    """dict of the name and ID of every row in a table"""
+    return dict(session.execute(select(name_column, id_column)).all())
+
+
+def __insert(session, table, records):
+    """insert a chunk of records with a single executemany, and commit them"""
+    if records:
+        session.execute(insert(table), records)
+        session.commit()
+    return len(records)
+
+
+def populate_base_items(path, session, chunk_size=CHUNK_SIZE):
+    """insert the categories, preference types, stores and units"""
+    for filename, (model, columns) in BASE_FILES.items():
+        n_rows = 0
+        for df in tabular.read_chunks(path / filename, chunk_size, na_filter=False):
+            n_rows += __insert(session, model.__table__, __records(df, columns))
+        logger.debug(f"inserted {n_rows} rows from {filename}")
+
+
+def populate_items(items_path, session, chunk_size=CHUNK_SIZE):
+    """insert the items, must be done after the base items are inserted"""
+    reference = get_reference(session)
+
+    n_rows = 0
+    for df in tabular.read_chunks(items_path, chunk_size):
+        df = df.assign(
+            UnitID=__ids(df["unit"], reference.unit_ids),
+            CategoryID=__ids(df["category"], reference.category_ids),
+            PreferredStoreID=__ids(df["preferred_store"], reference.store_ids),
+        )
+        records = __records(
+            df,
+            {
+                "description": "Description",
+                "UnitID": "UnitID",
+                "CategoryID": "CategoryID",
+                "PreferredStoreID": "PreferredStoreID",
+            },
+        )
+        n_rows += __insert(session, models.Item.__table__, records)
+    logger.debug(f"inserted {n_rows} items")
+
+
+def __hashes(values):
+    """content hash of each value, as a signed 64-bit integer that SQLite can store"""
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy().view(np.int64)
+    return pd.Series(hashes, index=values.index, dtype="Int64")
+
+
+def __parse_prices(df, store_ids, item_ids, pref_types, standard_pt="S"):
+    """
+    Parse a chunk of the prices file into one row per item and store
+
+    Each cell is a price, optionally with a "$" sign, or a preference type short name.
+    Blank cells have no price with the standard preference type.
+    """
     df = pd.melt(
         df, id_vars=["index", "item"], var_name="store_name", value_name="price_raw"
     )
-
-    df["Store"] = df["store_name"].apply(lambda x: stores.get(x))
-    df["Item"] = df["item"].apply(lambda x: items.get(x))
-    df["price_raw"] = (
-        df["price_raw"]
-        .apply(lambda x: str(x).replace("$", ""))
-        .apply(lambda x: x.strip())
-        .astype(float, errors="ignore")
-    )
-    df["Preference"] = df["price_raw"].apply(
-        lambda x: preferences.get(x, preferences["S"])
+    df["store_id"] = __ids(df["store_name"], store_ids)
+    df["item_id"] = __ids(df["item"], item_ids)
+
+    unknown = df["item_id"].isnull()
+    if unknown.any():
+        logger.warning(
+            f"ignoring prices for unknown items: "
+            f"{df.loc[unknown, 'item'].unique().tolist()}"
+        )
+        df = df[~unknown]
+
+    raw = df["price_raw"].fillna("").astype(str)
+    raw = raw.str.replace("$", "", regex=False).str.strip()
+    df["pt_id"] = __ids(raw, pref_types).fillna(pref_types[standard_pt])
+    df["price"] = pd.to_numeric(raw, errors="coerce")
+
+    df["blank"] = df["price"].isnull() & (df["pt_id"] == pref_types[standard_pt])
+    df["hash"] = __hashes(raw)
+    return df[["store_id", "item_id", "pt_id", "price", "blank", "hash"]]
+
+
+def __get_hashes(session, item_ids):
+    """return a DataFrame of the hashes of all cells of the given items"""
+    table = models.PriceHash.__table__
+    query = select(table.c.StoreID, table.c.ItemID, table.c.Hash).where(
+        table.c.ItemID.in_([int(id_) for id_ in item_ids])
     )
-    df["price"] = df["price_raw"].apply(__parse_price)
-
-    df["Price"] = df.apply(__create_price, axis=1)
-    df["preference_type"] = df["Preference"].apply(
-        lambda x: None if x is None else x.short
+    df = pd.DataFrame(
+        session.execute(query).all(), columns=["store_id", "item_id", "old_hash"]
     )
+    return df.astype("Int64")
+
+
+def __apply_prices(session, df):
+    """
+    delete the prices of blank cells, insert or update all other prices, and store the
+    hash of every cell
+    """
+    price = models.Price.__table__
+    hash_table = models.PriceHash.__table__
+
+    to_delete = df[df["blank"]]
+    if not to_delete.empty:
+        keys = __records(to_delete, {"store_id": "b_store_id", "item_id": "b_item_id"})
+        stmt = delete(price).where(
+            price.c.StoreID == bindparam("b_store_id"),
+            price.c.ItemID == bindparam("b_item_id"),
+        )
+        session.execute(stmt, keys)
+
+    to_upsert = df[~df["blank"]]
+    if not to_upsert.empty:
+        stmt = sqlite.insert(price)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[price.c.StoreID, price.c.ItemID],
+            set_={
+                "Price": stmt.excluded.Price,
+                "PreferenceTypeID": stmt.excluded.PreferenceTypeID,
+                "ObservedAt": stmt.excluded.ObservedAt,
+            },
+        )
+        records = __records(
+            to_upsert,
+            {
+                "store_id": "StoreID",
+                "item_id": "ItemID",
+                "price": "Price",
+                "pt_id": "PreferenceTypeID",
+            },
+        )
+        session.execute(stmt, records)
+
+    # after the prices, as writing a price deletes its hash
+    if not df.empty:
+        stmt = sqlite.insert(hash_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[hash_table.c.ItemID, hash_table.c.StoreID],
+            set_={"Hash": stmt.excluded.Hash},
+        )
+        records = __records(
+            df, {"store_id": "StoreID", "item_id": "ItemID", "hash": "Hash"}
+        )
+        session.execute(stmt, records)
 
-    # remove rows that have both a standard preference type and no price.
-    # Those are simply blank, storing these in the price table has no value.
-    # Do this by selecting all rows where the price is not nan or the preference is not
-    # standard
-    df = df[(~np.isnan(df["price"])) | (df["preference_type"] != "S")]
-
-    df = df.sort_values(by="preference_type")
-    prices = df["Price"].tolist()
-
-    return prices
-
-
-def initial_populate(data_path, session):
-
-    base = get_base_items(data_path / "base items")
-
-    base_items = []
-    for _, items in base.items():
-        base_items.extend(items)
-
-    categories = [x for x in base_items if isinstance(x, models.Category)]
-    units = [x for x in base_items if isinstance(x, models.Unit)]
-    stores = [x for x in base_items if isinstance(x, models.Store)]
-    preferences = [x for x in base_items if isinstance(x, models.PreferenceType)]
-
-    items = get_items(data_path / "items.csv", categories, units, stores)
-
-    prices = get_prices(data_path / "prices.csv", stores, items, preferences)
-
-    session.add_all(base_items)
-    session.add_all(items)
-    session.add_all(prices)
     session.commit()
-
-    logger.info(f"repopulated database with sample data and commit")
+    return len(to_upsert), len(to_delete)
+
+
+def populate_prices(price_path, session, chunk_size=CHUNK_SIZE):
+    """
+    Import the prices file, writing only the cells that changed since the last import
+
+    The content hash of every cell is stored when it is imported. Each chunk of the
+    file is compared to the stored hashes, and only the cells with a different or
+    missing hash are written: their price is inserted or updated, or deleted when the
+    cell is blank. Prices of cells that did not change are left untouched, as are
+    prices of items or stores that are not in the file. A price written by anything
+    else (e.g. a price book import) has its hash deleted by a trigger, so its cell is
+    written again on the next import.
+
+    On an empty database every cell is new, so this is also the initial import. On a
+    database populated before the hashes were stored, the first import writes every
+    cell.
+
+    Parameters
+    ----------
+    price_path : Path
+        path to the prices file
+    session : Session
+        database session. Each chunk is committed
+    chunk_size : int, optional
+        maximum number of cells written in a single transaction
+
+    Returns
+    -------
+    dict : number of prices that were written, deleted and unchanged
+    """
+    # databases created before the hashes were stored do not have the table or the
+    # triggers that invalidate the hashes
+    price_hash.install_triggers(session.connection())
+
+    item = models.Item.__table__
+    reference = get_reference(session)
+
+    # the store columns of the prices file are the lower case store names
+    store_ids = {name.lower(): id_ for name, id_ in reference.store_ids.items()}
+    item_ids = __lookup(session, item.c.Description, item.c.ItemID)
+    pref_types = reference.preference_type_ids
+
+    # each row of the file is one price per store, so each chunk has fewer rows
+    rows = max(1, chunk_size // max(1, len(store_ids)))
+    counts = {"written": 0, "deleted": 0, "unchanged": 0}
+    for df in tabular.read_chunks(price_path, rows):
+        unknown = [c for c in df.columns[2:] if c not in store_ids]
+        if unknown:
+            logger.warning(f"ignoring prices for unknown stores: {unknown}")
+            df = df.drop(columns=unknown)
+
+        df = __parse_prices(df, store_ids, item_ids, pref_types)
+        hashes = __get_hashes(session, df["item_id"].unique())
+        df = pd.merge(df, hashes, on=["store_id", "item_id"], how="left")
+
+        same = (df["hash"] == df["old_hash"]).fillna(False)
+        written, deleted = __apply_prices(session, df[~same])
+        counts["written"] += written
+        counts["deleted"] += deleted
+        counts["unchanged"] += int(same.sum())
+
+    logger.debug(f"imported prices: {counts}")
+    return counts
+
+
+def initial_populate(data_path, session, chunk_size=CHUNK_SIZE):
+    """
+    Populate an empty database from the setup files
+
+    The files are read in chunks, and each chunk is inserted with a single executemany
+    statement and committed, so memory use does not grow with the size of the files.
+    Foreign keys are resolved with dictionaries of the names and IDs inserted before.
+    The triggers that maintain the BestPrices table are dropped while the prices are
+    inserted, and the table is rebuilt once at the end.
+
+    The chunks are committed as they are inserted, so a populate that fails leaves the
+    chunks inserted before the failure in the database. Recreate the database (see
+    `groceries.db.recreate_all`) before populating it again.
+
+    Parameters
+    ----------
+    data_path : Path
+        setup directory, with the `base items` directory, `items.csv` and `prices.csv`
+    session : Session
+        database session. Each chunk is committed
+    chunk_size : int, optional
+        maximum number of rows inserted in a single transaction
+    """
+    # the best prices are rebuilt once at the end, instead of by a trigger per price
+    best_price.drop_triggers(session.connection())
+    try:
+        populate_base_items(data_path / "base items", session, chunk_size=chunk_size)
+        populate_items(data_path / "items.csv", session, chunk_size=chunk_size)
+        populate_prices(data_path / "prices.csv", session, chunk_size=chunk_size)
+        session.commit()
+        logger.info("repopulated database with sample data and commit")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        # in a transaction of its own, so the triggers are restored even when the
+        # populate failed and its last chunk was rolled back
+        with session.get_bind().begin() as connection:
+            best_price.install_triggers(connection)
@@ -0,0 +1,133 @@
+"""
+Registry of the SQL queries, loaded from `.sql` files
+
+Each file is read and compiled into a `text()` statement once, with the types of its
+known parameters (e.g. `:as_of`) bound, and the statement is reused until the file
+changes. The results are fetched on a connection that is closed as soon as they are
+read, either as a single DataFrame, or as a generator of DataFrame chunks, so a large
+result never has to be held in memory at once.
+"""
+
+import logging
+import threading
+
+from pathlib import Path
+
+import pandas as pd
+
+from sqlalchemy import bindparam, DateTime, text
+
+logger = logging.getLogger(__name__)
+
+# types of the parameters the shipped queries take
+PARAMETER_TYPES = {"as_of": DateTime}
+
+# number of rows fetched in each chunk
+CHUNK_SIZE = 10_000
+
+__lock = threading.Lock()
+# query path to (modification time, compiled statement)
+__queries = {}
+
+
+def __compile(sql):
+    """compile the SQL of a query, binding the types of its known parameters"""
+    statement = text(sql)
+    params = [
+        bindparam(name, type_=PARAMETER_TYPES[name])
+        for name in statement.compile().params
+        if name in PARAMETER_TYPES
+    ]
+    return statement.bindparams(*params) if params else statement
+
+
+def load_query(path):
+    """
+    Get the compiled statement of a query file
+
+    The file is only read and compiled again when it changed since it was loaded.
+
+    Parameters
+    ----------
+    path : str or Path
+        path to the `.sql` file
+
+    Returns
+    -------
+    TextClause
+    """
+    path = Path(path).resolve()
+    mtime = path.stat().st_mtime_ns
+    with __lock:
+        cached = __queries.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    statement = __compile(path.read_text())
+    with __lock:
+        __queries[path] = (mtime, statement)
+    logger.debug(f"loaded query: {path}")
+    return statement
+
+
+def __statement(query):
+    """the statement of a query file path, or the query itself"""
+    if isinstance(query, (str, Path)):
+        return load_query(query)
+    return query
+
+
+def fetch_frame(query, session, params=None):
+    """
+    Run a query, and get all of its results
+
+    Parameters
+    ----------
+    query : str or Path or Executable
+        path to a query file, or a statement
+    session : Session
+        database session. The query runs on a new connection of its engine, that is
+        closed once the results are read
+    params : dict, optional
+        values of the query parameters
+
+    Returns
+    -------
+    DataFrame : with the columns of the query
+    """
+    statement = __statement(query)
+    with session.get_bind().connect() as conn:
+        result = conn.execute(statement, params or {})
+        return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def fetch_chunks(query, session, params=None, chunksize=CHUNK_SIZE):
+    """
+    Run a query, and get its results in chunks
+
+    The rows are streamed from the database as the chunks are read. The connection is
+    closed once the generator is exhausted or closed.
+
+    Parameters
+    ----------
+    query : str or Path or Executable
+        path to a query file, or a statement
+    session : Session
+        database session, see `fetch_frame`
+    params : dict, optional
+        values of the query parameters
+    chunksize : int, optional
+        maximum number of rows in each chunk
+
+    Yields
+    ------
+    DataFrame : the next chunk of rows, with the columns of the query
+    """
+    statement = __statement(query)
+    with session.get_bind().connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(
+            statement, params or {}
+        )
+        columns = list(result.keys())
+        for rows in result.partitions(chunksize):
+            yield pd.DataFrame(rows, columns=columns)
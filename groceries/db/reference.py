@@ -0,0 +1,165 @@
+"""
+Cache of the small reference tables: stores, categories, units and preference types
+
+The reference tables are read once per database, and kept as plain dictionaries of
+names and IDs, so looking up a name or ID never runs a query. The cache of a database
+is cleared whenever any of its reference tables is written through SQLAlchemy (ORM
+flushes, Core statements and text statements alike), and again when that transaction
+is committed or rolled back. Writes by other processes are not seen, use `invalidate`
+after those.
+"""
+
+import logging
+import re
+import threading
+import weakref
+
+from dataclasses import dataclass
+
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_TABLES = {
+    models.Category.__tablename__,
+    models.PreferenceType.__tablename__,
+    models.Store.__tablename__,
+    models.Unit.__tablename__,
+}
+
+# matches the table written by a statement, or any schema change
+WRITE = re.compile(
+    r"^\s*(?:(?:INSERT|REPLACE)(?:\s+OR\s+\w+)?\s+INTO|UPDATE(?:\s+OR\s+\w+)?|"
+    r'DELETE\s+FROM)\s+"?(?P<table>\w+)"?|^\s*(?:DROP|CREATE|ALTER)\s',
+    re.IGNORECASE,
+)
+
+__lock = threading.Lock()
+__cache = weakref.WeakKeyDictionary()
+# number of times the cache of each engine was cleared, so data that was loaded while
+# the cache was cleared is not stored
+__generations = weakref.WeakKeyDictionary()
+
+
+@dataclass(frozen=True)
+class Reference:
+    """
+    Lookups of the reference tables by name and by ID
+
+    Attributes
+    ----------
+    store_ids, store_names : dict
+        store name to ID and ID to name, of all stores
+    active_stores : dict
+        store name to ID of the active stores, sorted by name
+    category_ids, category_names : dict
+        category name to ID and ID to name
+    unit_ids, unit_names : dict
+        unit name to ID and ID to name
+    preference_type_ids, preference_type_shorts : dict
+        preference type short name (e.g. "S") to ID and ID to short name
+    """
+
+    store_ids: dict
+    store_names: dict
+    active_stores: dict
+    category_ids: dict
+    category_names: dict
+    unit_ids: dict
+    unit_names: dict
+    preference_type_ids: dict
+    preference_type_shorts: dict
+
+    @property
+    def active_store_names(self):
+        """sorted names of the active stores"""
+        return list(self.active_stores)
+
+
+def __load(session):
+    store = models.Store.__table__
+    category = models.Category.__table__
+    unit = models.Unit.__table__
+    pref_type = models.PreferenceType.__table__
+
+    stores = session.execute(
+        select(store.c.Store, store.c.StoreID, store.c.Active).order_by(store.c.Store)
+    ).all()
+    categories = session.execute(
+        select(category.c.Category, category.c.CategoryID)
+    ).all()
+    units = session.execute(select(unit.c.Unit, unit.c.UnitID)).all()
+    pref_types = session.execute(
+        select(pref_type.c.ShortType, pref_type.c.TypeID)
+    ).all()
+
+    return Reference(
+        store_ids={name: id_ for name, id_, _ in stores},
+        store_names={id_: name for name, id_, _ in stores},
+        active_stores={name: id_ for name, id_, active in stores if active},
+        category_ids=dict(categories),
+        category_names={id_: name for name, id_ in categories},
+        unit_ids=dict(units),
+        unit_names={id_: name for name, id_ in units},
+        preference_type_ids=dict(pref_types),
+        preference_type_shorts={id_: short for short, id_ in pref_types},
+    )
+
+
+def get_reference(session):
+    """
+    Get the reference data of the database a session is bound to
+
+    The tables are only queried when the cache of the database is empty.
+
+    Parameters
+    ----------
+    session : Session
+        database session
+
+    Returns
+    -------
+    Reference
+    """
+    engine = session.get_bind()
+    with __lock:
+        reference = __cache.get(engine)
+        generation = __generations.get(engine, 0)
+    if reference is None:
+        reference = __load(session)
+        with __lock:
+            if __generations.get(engine, 0) == generation:
+                __cache[engine] = reference
+        logger.debug(f"loaded reference data for {engine}")
+    return reference
+
+
+def invalidate(engine=None):
+    """clear the cached reference data of an engine, or of every engine"""
+    with __lock:
+        engines = list(__cache) if engine is None else [engine]
+        for engine_ in engines:
+            __cache.pop(engine_, None)
+            __generations[engine_] = __generations.get(engine_, 0) + 1
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def __after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    match = WRITE.match(statement)
+    if match is None:
+        return
+    table = match.group("table")
+    if table is None or table in REFERENCE_TABLES:
+        conn.info["reference_written"] = True
+        invalidate(conn.engine)
+
+
+@event.listens_for(Engine, "commit")
+@event.listens_for(Engine, "rollback")
+def __end_transaction(conn):
+    # data loaded during the transaction may include its uncommitted writes
+    if conn.info.pop("reference_written", False):
+        invalidate(conn.engine)
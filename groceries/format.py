@@ -2,37 +2,165 @@ import logging
 
 from collections.abc import Iterable
 
-from openpyxl.utils import get_column_letter
+import pandas as pd
+
+from openpyxl import load_workbook
+from openpyxl.utils import column_index_from_string, get_column_letter
 
 logger = logging.getLogger(__name__)
 
+STANDARD_WIDTH = 8.43
+
+ACCOUNTING = r'_($* #,##0.00_);_($* (#,##0.00);_($* "-"??_);_(@_)'
+
+
+def column_widths(df, standard_width=STANDARD_WIDTH, header=True):
+    """
+    Calculate the width of each column needed to fit its values
+
+    The widths are calculated with vectorized string lengths for each column, so the
+    individual cells are never visited.
+
+    Parameters
+    ----------
+    df : DataFrame
+        data that is (or will be) written to the worksheet
+    standard_width : float, optional
+        minimum width of each column
+    header : bool, optional
+        include the column names in the width, as they are written as a header row.
+        Defaults to True
 
-def column_width(worksheet, standard_width=8.43):
+    Returns
+    -------
+    list of float : width of each column, in the same order as the DataFrame columns
+    """
+    widths = []
+    for column in df.columns:
+        values = df[column]
+        values = values[values.notnull()].astype(str)
+        width = values.str.len().max() if len(values) else 0
+        if header:
+            width = max(width, len(str(column)))
+        widths.append(max(standard_width, width + 1))
+    return widths
+
+
+def column_width(worksheet, standard_width=STANDARD_WIDTH, df=None):
+    """
+    Set the width of every column in a worksheet to fit its values
+
+    Parameters
+    ----------
+    worksheet : Worksheet
+        worksheet to format
+    standard_width : float, optional
+        minimum width of each column
+    df : DataFrame, optional
+        data that was written to the worksheet, with the column names written as a
+        header row. When not given, the values are read from the worksheet
+    """
     logger.debug(f"format column width for {worksheet}")
-    for icol, col in enumerate(worksheet.columns, 1):
-        col_letter = get_column_letter(icol)
-        width = standard_width
-        for cell in col:
-            width = max(width, len(str(cell.value)) + 1)
-        worksheet.column_dimensions[col_letter].width = width
+    header = df is not None
+    if df is None:
+        df = pd.DataFrame(worksheet.values)
+
+    widths = column_widths(df, standard_width=standard_width, header=header)
+    for icol, width in enumerate(widths, 1):
+        worksheet.column_dimensions[get_column_letter(icol)].width = width
     return worksheet
 
 
 def number_format(worksheet, column_letters, format_=None):
+    """
+    Set the number format of whole columns of a worksheet
+
+    The format is set on the column, so it applies to the blank cells of the column and
+    any cells added later. Excel keeps the style of the cells that already exist, so
+    each of those is formatted too. All of them share a single style.
+
+    Parameters
+    ----------
+    worksheet : Worksheet
+        worksheet to format
+    column_letters : str or iterable of str
+        letters of the columns to format, e.g. "EFG"
+    format_ : str, optional
+        number format, or "Accounting". Defaults to the "General" format
+    """
     logger.debug(f"format as numbers for {worksheet} ({column_letters})")
     if not isinstance(column_letters, Iterable):
         column_letters = [column_letters]
 
-    columns = [worksheet[letter] for letter in column_letters]
-    for column in columns:
-        __number_format(column, format_=format_)
+    format_ = __format_code(format_)
+    for letter in column_letters:
+        __number_format(worksheet, letter, format_)
+
+
+def format_sheet(worksheet, df, number_formats=None, standard_width=STANDARD_WIDTH):
+    """
+    Format a worksheet that a DataFrame was written to
+
+    Parameters
+    ----------
+    worksheet : Worksheet
+        worksheet to format
+    df : DataFrame
+        data that was written to the worksheet, starting in the first column with the
+        column names written as a header row
+    number_formats : dict, optional
+        number format for each column name
+    standard_width : float, optional
+        minimum width of each column
+    """
+    column_width(worksheet, standard_width=standard_width, df=df)
+
+    if number_formats is None:
+        number_formats = {}
+    for icol, column in enumerate(df.columns, 1):
+        if column in number_formats:
+            number_format(
+                worksheet, [get_column_letter(icol)], format_=number_formats[column]
+            )
+    return worksheet
 
 
-def __number_format(column, format_=None):
+def __format_code(format_=None):
     if format_ is None:
-        format_ = "General"
+        return "General"
     if format_ == "Accounting":
-        format_ = r'_($* #,##0.00_);_($* (#,##0.00);_($* "-"??_);_(@_)'
+        return ACCOUNTING
+    return format_
+
 
-    for cell in column:
+def __number_format(worksheet, column_letter, format_):
+    # the column format only covers new cells, the existing cells need their own
+    worksheet.column_dimensions[column_letter].number_format = format_
+    icol = column_index_from_string(column_letter)
+    for (cell,) in worksheet.iter_rows(min_col=icol, max_col=icol):
         cell.number_format = format_
+
+
+def format_workbook(path, column_letters=None, format_=None):
+    """
+    Format every sheet of an existing workbook, and save it in place
+
+    Parameters
+    ----------
+    path : str or Path
+        path to the workbook
+    column_letters : iterable of str, optional
+        letters of the columns to apply the number format to, e.g. "EFG"
+    format_ : str, optional
+        number format for the columns, see `number_format`
+    """
+    workbook = load_workbook(path)
+    try:
+        for worksheet in workbook.worksheets:
+            column_width(worksheet)
+            if column_letters:
+                number_format(worksheet, column_letters, format_=format_)
+        workbook.save(path)
+    finally:
+        workbook.close()
+    logger.info(f"formatted workbook: {path}")
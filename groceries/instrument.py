@@ -0,0 +1,203 @@
+"""
+Time stages of work, and count the SQL queries they run
+
+A stage is timed with the `stage` context manager. While it is open, every query run
+on the same thread (through any SQLAlchemy engine) is counted, with the time spent in
+the database, the number of rows written and the number of rows fetched. Stages can be
+nested, a query counts for every open stage. The metrics of each stage are logged, and
+appended to a JSON lines metrics file when one is given.
+
+A query budget catches N+1 query patterns, where the number of queries grows with the
+size of the data::
+
+    with query_budget(10):
+        read_price_book(path, session)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# environment variable with the path of the metrics file, when none is given
+METRICS_PATH_ENV = "GROCERIES_METRICS_PATH"
+
+__local = threading.local()
+__lock = threading.Lock()
+
+
+class QueryBudgetError(AssertionError):
+    """raised when a block of code runs more queries than its budget"""
+
+
+@dataclass
+class Metrics:
+    """metrics of a single stage"""
+
+    name: str
+    seconds: float = 0.0
+    queries: int = 0
+    sql_seconds: float = 0.0
+    rows_written: int = 0
+    rows_read: int = 0
+    statements: Counter = field(default_factory=Counter, repr=False)
+
+    def most_repeated(self, n=3):
+        """the statements that were run the most, with the number of times each ran"""
+        return self.statements.most_common(n)
+
+    def to_dict(self):
+        metrics = asdict(self)
+        del metrics["statements"]
+        return metrics
+
+
+def __active():
+    if not hasattr(__local, "stages"):
+        __local.stages = []
+    return __local.stages
+
+
+def __before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    if __active():
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+class __CountingCursor:
+    """DBAPI cursor that counts the rows fetched from it, for the stages given"""
+
+    def __init__(self, cursor, stages):
+        self.cursor = cursor
+        self.stages = stages
+
+    def __count(self, rows):
+        for metrics in self.stages:
+            metrics.rows_read += len(rows)
+        return rows
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        return row if row is None else self.__count([row])[0]
+
+    def fetchmany(self, *args, **kwargs):
+        return self.__count(self.cursor.fetchmany(*args, **kwargs))
+
+    def fetchall(self):
+        return self.__count(self.cursor.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+def __after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    stages = __active()
+    if not stages or not conn.info.get("query_start"):
+        return
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    # drivers report the rows written by a statement. The rows returned by a select are
+    # only known once they are fetched (SQLite reports -1), so the cursor the result
+    # fetches from counts them
+    rows = max(cursor.rowcount, 0)
+    if cursor.description is not None and context is not None:
+        context.cursor = __CountingCursor(cursor, list(stages))
+    for metrics in stages:
+        metrics.queries += 1
+        metrics.sql_seconds += elapsed
+        metrics.rows_written += rows
+        metrics.statements[statement] += 1
+
+
+def instrument(engine=Engine):
+    """
+    Count the queries run through an engine
+
+    Parameters
+    ----------
+    engine : Engine, optional
+        engine to instrument. Defaults to every engine
+    """
+    with __lock:
+        if not event.contains(engine, "before_cursor_execute", __before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", __before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", __after_cursor_execute)
+
+
+def __write_metrics(path, metrics):
+    record = {"time": datetime.now().isoformat(timespec="seconds"), **metrics.to_dict()}
+    with __lock, open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+@contextmanager
+def stage(name, metrics_path=None):
+    """
+    Time a stage of work, and count the queries it runs
+
+    Parameters
+    ----------
+    name : str
+        name of the stage
+    metrics_path : str or Path, optional
+        JSON lines file the metrics are appended to. Defaults to the
+        `GROCERIES_METRICS_PATH` environment variable, when set
+
+    Yields
+    ------
+    Metrics : the metrics of the stage, complete once the block exits
+    """
+    instrument()
+    if metrics_path is None:
+        metrics_path = os.environ.get(METRICS_PATH_ENV)
+
+    metrics = Metrics(name)
+    stages = __active()
+    stages.append(metrics)
+    start = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.seconds = time.perf_counter() - start
+        stages.pop()
+
+        logger.info(
+            f"{name}: {metrics.seconds:.3f}s, {metrics.queries} queries "
+            f"({metrics.sql_seconds:.3f}s), {metrics.rows_written} rows written, "
+            f"{metrics.rows_read} rows read"
+        )
+        if metrics_path is not None:
+            __write_metrics(metrics_path, metrics)
+
+
+@contextmanager
+def query_budget(max_queries, name="query budget"):
+    """
+    Check that a block of code runs at most a number of queries
+
+    Raises
+    ------
+    QueryBudgetError
+        when the block ran more queries than the budget, with the most repeated
+        statements in the message
+    """
+    with stage(name) as metrics:
+        yield metrics
+
+    if metrics.queries > max_queries:
+        repeated = "\n".join(
+            f"  {count}x {statement}" for statement, count in metrics.most_repeated()
+        )
+        raise QueryBudgetError(
+            f"{name}: ran {metrics.queries} queries, over the budget of "
+            f"{max_queries}. Most repeated statements:\n{repeated}"
+        )
@@ -0,0 +1,188 @@
+"""
+Run the steps of a job as a pipeline of stages
+
+Each stage declares the names of the inputs it requires and the outputs it provides
+(e.g. files, or the state of the database). A stage starts as soon as every input it
+requires has been provided, so independent stages run concurrently on a pool of
+workers. Stages that write to the database are marked `serial`, and are never run at
+the same time as any other serial stage. The time and queries of each stage are
+recorded with `groceries.instrument`.
+"""
+
+import logging
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from groceries import instrument
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    A single step of a pipeline
+
+    Parameters
+    ----------
+    name : str
+        unique name of the stage, used in the timing report
+    func : callable
+        called without any arguments to run the stage
+    requires : tuple of str, optional
+        names of the inputs that must be provided before the stage can run
+    provides : tuple of str, optional
+        names of the outputs that are provided once the stage finished
+    serial : bool, optional
+        the stage writes to the database, and is run one at a time with any other
+        serial stage. Defaults to False
+    """
+
+    name: str
+    func: object
+    requires: tuple = ()
+    provides: tuple = ()
+    serial: bool = False
+
+
+def __timed(name, func):
+    with instrument.stage(name) as metrics:
+        func()
+    return metrics.seconds
+
+
+def __ready(pending, running, provided):
+    """the pending stages that can start now, with at most one serial stage running"""
+    serial_running = any(stage.serial for stage in running)
+    ready = []
+    for stage in pending:
+        if not provided.issuperset(stage.requires):
+            continue
+        if stage.serial:
+            if serial_running:
+                continue
+            serial_running = True
+        ready.append(stage)
+    return ready
+
+
+def __check(stages, available):
+    """check that every stage can run, by running the pipeline in order without work"""
+    names = [stage.name for stage in stages]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate stage names: {duplicates}")
+
+    provided = set(available)
+    pending = list(stages)
+    while pending:
+        ready = [stage for stage in pending if provided.issuperset(stage.requires)]
+        if not ready:
+            missing = {
+                stage.name: sorted(set(stage.requires) - provided) for stage in pending
+            }
+            raise ValueError(f"stages can never run, missing inputs: {missing}")
+        for stage in ready:
+            provided.update(stage.provides)
+            pending.remove(stage)
+
+
+def run_pipeline(stages, available=(), max_workers=None, executor=None):
+    """
+    Run every stage of a pipeline
+
+    When a stage fails, no further stages are started. The stages that are already
+    running are finished, and the exception of the failed stage is raised.
+
+    Parameters
+    ----------
+    stages : list of Stage
+        the stages to run. Stages that are ready at the same time are started in the
+        order of this list
+    available : iterable of str, optional
+        names of the inputs that already exist before any stage runs, e.g. input files
+    max_workers : int, optional
+        maximum number of stages that run at the same time, when the default thread
+        pool is used
+    executor : Executor, optional
+        pool to run the stages on, e.g. a `ProcessPoolExecutor` for CPU bound stages.
+        The stage functions must then be picklable. Defaults to a thread pool
+
+    Returns
+    -------
+    dict : wall time of each stage in seconds, in the order the stages finished
+    """
+    __check(stages, available)
+
+    provided = set(available)
+    pending = list(stages)
+    running = {}
+    timings = {}
+    failed = None
+
+    start = time.perf_counter()
+    pool = executor if executor is not None else ThreadPoolExecutor(max_workers)
+    try:
+        while running or (pending and failed is None):
+            if failed is None:
+                for stage in __ready(pending, running.values(), provided):
+                    logger.debug(f"start stage: {stage.name}")
+                    pending.remove(stage)
+                    running[pool.submit(__timed, stage.name, stage.func)] = stage
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    timings[stage.name] = future.result()
+                except Exception as exc:
+                    logger.error(f"stage failed: {stage.name} ({exc!r})")
+                    failed = failed or exc
+                    continue
+                provided.update(stage.provides)
+    finally:
+        if executor is None:
+            pool.shutdown()
+
+    if failed is not None:
+        raise failed
+
+    logger.info(
+        f"pipeline finished {len(timings)} stages in "
+        f"{time.perf_counter() - start:.2f}s (total stage time "
+        f"{sum(timings.values()):.2f}s)"
+    )
+    return timings
+
+
+def select_stages(stages, names):
+    """
+    Select the stages to run from a pipeline
+
+    The outputs of the stages that are not selected are expected to exist already,
+    unless a selected stage provides them.
+
+    Parameters
+    ----------
+    stages : list of Stage
+        every stage of the pipeline
+    names : iterable of str
+        names of the stages to run
+
+    Returns
+    -------
+    tuple : (list of the selected stages, set of the available inputs), to pass to
+        `run_pipeline`
+    """
+    names = set(names)
+    unknown = names - {stage.name for stage in stages}
+    if unknown:
+        raise ValueError(f"unknown stages: {sorted(unknown)}")
+
+    selected = [stage for stage in stages if stage.name in names]
+    skipped = [stage for stage in stages if stage.name not in names]
+    available = {name for stage in skipped for name in stage.provides}
+    available -= {name for stage in selected for name in stage.provides}
+    return selected, available
@@ -1,2 +1,3 @@
 from .create import create_price_book
-from .read import read_price_book
+from .read import apply_price_book, read_price_book
+from .validate import PriceBookValidationError, validate_price_book
@@ -1,14 +1,12 @@
 import logging
 
-import numpy as np
-import pandas as pd
-
-from groceries.db import models
+from groceries import cache, tabular
+from groceries.price_matrix import PriceMatrix
 
 logger = logging.getLogger(__name__)
 
 
-def __create_item_description(row, description_col="item", unit_col="unit"):
+def __create_item_description(df, description_col="item", unit_col="unit"):
     """
     Create item description by combining item description and item unit
 
@@ -17,8 +15,8 @@ def __create_item_description(row, description_col="item", unit_col="unit"):
 
     Parameters
     ----------
-    row : Dataframe row
-        The row is expected to have an `item` column, and a `unit` column
+    df : DataFrame
+        The DataFrame is expected to have an `item` column, and a `unit` column
     description_col : str, optional
         name of the DataFrame column where the item description is found. Defaults to
         `description_col="item"`
@@ -27,140 +25,76 @@ def __create_item_description(row, description_col="item", unit_col="unit"):
 
     Returns
     -------
-    str : combination of item description and unit. Returns just description when
+    Series : combination of item description and unit. Returns just description when
         unit is `None`
     """
-    description_ = row[description_col]
-    unit_ = row[unit_col]
+    description_ = df[description_col]
+    unit_ = df[unit_col]
 
-    if unit_ is None:
-        return description_
-    return f"{description_} (per {unit_})"
+    with_unit = description_ + " (per " + unit_.astype(str) + ")"
+    return description_.where(unit_.isnull(), with_unit)
 
 
-def __price(row, pref_col="pt", price_col="price", standard_pt="S"):
+def create_price_book(session, out_path, force=False, as_of=None):
     """
-    Read proper price from DataFrame
+    Create a price book with one row per item and one price column per active store
+
+    The price book is built from the price matrix, which is loaded with a single
+    query, so no ORM objects are loaded.
 
     Parameters
     ----------
-    row : DataFrame row
-        This is expected to have a preference type column and a price column
-    pref_col : str, optional
-        name of preference type column, defaults to 'pt'
-    price_col : str, optional
-        name or price column, defaults to 'price'
-    standard_pt : str, optional
-        standard preference type string (default is "S"). Any preference types of this
-        category are simply returned
+    session : Session
+        database session
+    out_path : str or Path or None
+        path to export the price book to. When `None`, it is not exported
+    force : bool, optional
+        export the price book even when the database has not changed since the last
+        export to `out_path`. Defaults to False. When the export is up-to-date, the
+        price book is still built and returned, only writing the file is skipped
+    as_of : datetime, optional
+        create the price book with the prices as they were at this time. Defaults to
+        the current prices
 
     Returns
     -------
-    numeric or str
-        price as a decimal when pref_col is equal to None or price_col = standard_pt
+    DataFrame : the price book
     """
-    pt_ = row[pref_col]  # preference type (short)
-    price_ = row[price_col]
-
-    if pt_ is None or pt_ == standard_pt:
-        return price_
-    return pt_
-
-
-def __preferred_store(x):
-    if x is None:
-        return None
-    store = x.preferred_store
-    if store is None:
-        return None
-    return store.name
-
-
-def __store_names(session, active=True):
-    """return list of active store names"""
-    stores = session.query(models.Store).filter(models.Store.active == active).all()
-    store_names = [s.name for s in stores]
-    store_names.sort()
-    return store_names
-
 
-def __parse_pref_type(x):
-    if x is None or x.preference is None:
-        return np.nan
-    return x.preference.short
-
-
-def __parse_category(x):
-    if x.category is None:
-        return
-    return x.category.category
-
-
-def create_price_book(session, out_path):
+    revision = None
+    is_current = False
+    if out_path is not None:
+        revision = cache.db_revision(session)
+        revision["as_of"] = None if as_of is None else as_of.isoformat()
+        is_current = not force and cache.is_current(out_path, "export", revision)
 
     logger.debug(f"start generating price book at: {out_path}")
 
-    # Items that DO have a Price, and add the Item and Price objects to a DataFrame
-    result_query = session.query(models.Item, models.Price).outerjoin(models.Price)
-    results = result_query.all()
-    df = pd.DataFrame(results, columns=["Item", "Price"])
-
-    # get items that do NOT have a price
-    sub_query = session.query(models.Price.item_id)
-    results = session.query(models.Item).where(models.Item.item_id.not_in(sub_query))
-    results = results.all()
-    df_no_prices = pd.DataFrame(results, columns=["Item"])
-
-    # now, process the Price object by extracting key Price related columns. Note that
-    # everything in the dataframe is guaranteed to have a Price object, because of the
-    # query; it was pulling from the Price table in the DB
-    df["store"] = df["Price"].apply(lambda x: None if x is None else x.store.name)
-    df["pt"] = df["Price"].apply(__parse_pref_type)
-    df["price"] = df["Price"].apply(lambda x: None if x is None else x.price)
-    df["price"] = df[["pt", "price"]].apply(__price, axis=1)
-
-    # Now that all price related columns have been processed, combine the Items that do
-    # not have a price. From here down, the Price object does not exist for all rows,
-    # but the Item object does exist for all rows.
-    df = pd.concat([df, df_no_prices], ignore_index=True)
-
-    df["item_id"] = df["Item"].apply(lambda x: x.item_id)
-    df["item"] = df["Item"].apply(lambda x: x.description)
-    df["category"] = df["Item"].apply(__parse_category)
-    df["unit"] = df["Item"].apply(lambda x: None if x.unit is None else x.unit.unit)
-    df["pref_store"] = df["Item"].apply(__preferred_store)
-    df["description"] = df[["item", "unit"]].apply(__create_item_description, axis=1)
-
-    # create dataframe of distinct items, this will serve as the price book DataFrame.
-    # The store price columns will be merged into this DataFrame
-    price_book = df[
-        ["item_id", "category", "description", "pref_store"]
-    ].drop_duplicates(subset=["item_id"])
-
-    # create a list of all stores that are in the query (had prices)
-    # note that this does not affect the standard df (inplace=False)
-    stores = __store_names(session, active=True)
-
-    # iterate over stores and merge prices into price book based on item ID
-    for store in stores:
-        logger.debug(f"process prices for price book for '{store}'")
-        # get dataframe of item ID and price for each item for current store
-        price_df = df[["item_id", "store", "price"]]
-        price_df = price_df[price_df["store"] == store]  # select only current store
-
-        # only item ID and price columns needed
-        price_df = price_df[["item_id", "price"]]
-
-        # merge the price for the current store with the item description dataframe, and
-        # rename price column to match store name
-        price_book = pd.merge(
-            price_book, price_df, on="item_id", how="outer", validate="1:1"
+    matrix = PriceMatrix.from_db(session, as_of=as_of)
+
+    # one row per item, the store price columns are joined onto this DataFrame
+    price_book = matrix.items[["item_id", "category", "description", "pref_store"]]
+    price_book = price_book.assign(
+        description=__create_item_description(
+            matrix.items, description_col="description"
         )
-        price_book = price_book.rename(columns={"price": store})
+    )
 
+    # every active store gets a column, even when it does not have any prices
+    stores = matrix.store_names
+    price_book = price_book.join(matrix.to_frame(), on="item_id")
     price_book = price_book.sort_values(by=["category", "description"])
 
-    if out_path is not None:
+    # building the price book takes a single query, reading back the export would be
+    # slower and would not keep the types of the cells
+    if is_current:
+        logger.info(f"price book is up-to-date: {out_path}")
+    elif out_path is not None:
         logger.debug(f"export price book: {out_path}")
-        price_book.to_excel(out_path, index=False)
+        tabular.write_table(
+            out_path,
+            price_book,
+            number_formats={store: tabular.PRICE_FORMAT for store in stores},
+        )
+        cache.stamp(out_path, "export", revision)
     return price_book
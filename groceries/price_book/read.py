@@ -1,139 +1,304 @@
 import logging
 
-import numpy as np
 import pandas as pd
 
+from sqlalchemy import bindparam, delete, insert, select, update
+
+from groceries import tabular
 from groceries.db import models
+from groceries.db.reference import get_reference
 
-logger = logging.getLogger(__name__)
+from .validate import check_price_book, ID_COLUMNS
 
+logger = logging.getLogger(__name__)
 
-def __get_prices_to_delete(df):
-    # get all Price objects where the price is blank
-    missing_price_df = df[(np.isnan(df["price2"])) & (df["Price"].notnull())]["Price"]
 
-    missing_price_df["price_id"] = df["Price"].apply(
-        lambda x: None if x is None else x.price_id
+def __strip(values):
+    """strip string values, leaving any other values untouched"""
+    return values.map(lambda x: x.strip() if isinstance(x, str) else x)
+
+
+def __parse_prices(values, preference_types, standard_pt="S"):
+    """
+    Parse raw price book cells into a preference type ID and a price
+
+    Parameters
+    ----------
+    values : Series
+        raw cell values read from the price book
+    preference_types : dict
+        mapping of preference type short name to preference type ID
+    standard_pt : str, optional
+        short name of the standard preference type (default is "S"). Any cell that is
+        not a preference type short name gets this preference type
+
+    Returns
+    -------
+    tuple of Series : (preference type ID, price). The price is NaN for any value
+        that is not numeric
+    """
+    shorts = __strip(values.astype(object)).map(preference_types)
+    pt_ids = shorts.fillna(preference_types[standard_pt]).astype(int)
+    prices = pd.to_numeric(values, errors="coerce").astype(float)
+    return pt_ids, prices
+
+
+def __none(values):
+    """convert a Series to a list, replacing any NaN with None"""
+    values = values.astype(object)
+    return values.where(values.notnull(), None).tolist()
+
+
+def __get_items(session, item_ids=None):
+    """return a DataFrame of the category and preferred store of all (or some) items"""
+    table = models.Item.__table__
+    query = select(table.c.ItemID, table.c.CategoryID, table.c.PreferredStoreID)
+    if item_ids is not None:
+        query = query.where(table.c.ItemID.in_(item_ids))
+    return pd.DataFrame(
+        session.execute(query).all(),
+        columns=["item_id", "category_id", "pref_store_id"],
     )
-    print(missing_price_df.to_string())
-    print(df.head(15).to_string())
-
-
-def __parse_price(price, preference_types):
-    pt = preference_types.get(price)
-    if isinstance(price, str):
-        price = np.nan
-    if pt is None:
-        pt = preference_types.get("S")
-    return pt, price
-
-
-def __update_preferred_store(row):
-    item = row["Item"]
-    pref_store = row["pref_store"]
 
-    item.preferred_store = pref_store
-    return item
 
+def __update_items(session, df, existing, store_ids, category_ids):
+    """update the category and preferred store of items that changed"""
+    table = models.Item.__table__
 
-def __update_item(row):
-    item = row["Item"]
+    df = df[ID_COLUMNS].drop_duplicates(subset=["item_id"])
+    df = df.assign(
+        new_category_id=df["category"].map(category_ids),
+        new_pref_store_id=df["pref_store"].map(store_ids),
+    )
+    df = pd.merge(df, existing, on="item_id", how="inner", validate="1:1")
+
+    changed = ~(
+        (df["category_id"] == df["new_category_id"])
+        | (df["category_id"].isnull() & df["new_category_id"].isnull())
+    ) | ~(
+        (df["pref_store_id"] == df["new_pref_store_id"])
+        | (df["pref_store_id"].isnull() & df["new_pref_store_id"].isnull())
+    )
+    df = df[changed]
+    if df.empty:
+        return 0
 
     # reminder, do not update the description column because the description in the
     # price book is formatted with units!
-    category = row["Category"]
-    pref_store = row["pref_Store"]
-    # description = row['description']
+    stmt = (
+        update(table)
+        .where(table.c.ItemID == bindparam("b_item_id"))
+        .values(
+            CategoryID=bindparam("b_category_id"),
+            PreferredStoreID=bindparam("b_pref_store_id"),
+        )
+    )
+    params = [
+        {"b_item_id": int(item_id), "b_category_id": cat, "b_pref_store_id": store}
+        for item_id, cat, store in zip(
+            df["item_id"],
+            __none(df["new_category_id"]),
+            __none(df["new_pref_store_id"]),
+        )
+    ]
+    session.execute(stmt, params)
+    logger.debug(f"updated {len(params)} items")
+    return len(params)
+
+
+def __get_prices(session, store_ids, item_ids=None):
+    """return a DataFrame of all existing prices for the given stores (and items)"""
+    table = models.Price.__table__
+    query = select(
+        table.c.PriceID,
+        table.c.StoreID,
+        table.c.ItemID,
+        table.c.Price,
+        table.c.PreferenceTypeID,
+    ).where(table.c.StoreID.in_(store_ids))
+    if item_ids is not None:
+        query = query.where(table.c.ItemID.in_(item_ids))
+
+    df = pd.DataFrame(
+        session.execute(query).all(),
+        columns=["price_id", "store_id", "item_id", "old_price", "old_pt_id"],
+    )
+    df["old_price"] = df["old_price"].astype(float)
+    return df
 
-    item.category = category
-    item.preferred_store = pref_store
-    # item.description = description
-    return item
 
+def __reconcile_prices(session, df, standard_pt_id):
+    """
+    Apply the price book cells to the Prices table
 
-def __update_price(row, preference_types=None):
-    price = row["Price"]
-    if price is None:
-        return None
+    Every cell in the price book falls in one of four groups, based on whether a Price
+    already exists for its store and item, and whether the cell is blank (no price with
+    the standard preference type):
 
-    pt, price_val = __parse_price(row["price"], preference_types)
+    - existing and blank: the Price is deleted
+    - existing and changed: the Price is updated
+    - new and not blank: a Price is inserted
+    - anything else is left untouched
 
-    try:
-        price_val = float(price_val)
-    except ValueError:
-        price_val = np.nan
+    Each group is written with a single executemany statement.
+    """
+    table = models.Price.__table__
 
-    price.price = price_val
-    price.preference = pt
-    return price
+    blank = df["price"].isnull() & (df["pt_id"] == standard_pt_id)
+    exists = df["price_id"].notnull()
+    same_price = (df["price"] == df["old_price"]) | (
+        df["price"].isnull() & df["old_price"].isnull()
+    )
+    changed = ~same_price | (df["pt_id"] != df["old_pt_id"])
 
+    to_delete = df[exists & blank]
+    to_update = df[exists & ~blank & changed]
+    to_insert = df[~exists & ~blank]
 
-def __new_prices(row, preference_types):
-    if row["Price"] is not None:
-        return None
+    if not to_delete.empty:
+        stmt = delete(table).where(table.c.PriceID == bindparam("b_price_id"))
+        session.execute(
+            stmt, [{"b_price_id": int(id_)} for id_ in to_delete["price_id"]]
+        )
 
-    item = row["Item"]
-    store = row["Store"]
-    pt, price_val = __parse_price(row["price"], preference_types)
-    try:
-        price_val = float(price_val)
-    except ValueError:
-        price_val = np.nan
+    if not to_update.empty:
+        stmt = (
+            update(table)
+            .where(table.c.PriceID == bindparam("b_price_id"))
+            .values(Price=bindparam("b_price"), PreferenceTypeID=bindparam("b_pt_id"))
+        )
+        params = [
+            {"b_price_id": int(id_), "b_price": price, "b_pt_id": int(pt_id)}
+            for id_, price, pt_id in zip(
+                to_update["price_id"], __none(to_update["price"]), to_update["pt_id"]
+            )
+        ]
+        session.execute(stmt, params)
+
+    if not to_insert.empty:
+        params = [
+            {
+                "StoreID": int(store_id),
+                "ItemID": int(item_id),
+                "Price": price,
+                "PreferenceTypeID": int(pt_id),
+            }
+            for store_id, item_id, price, pt_id in zip(
+                to_insert["store_id"],
+                to_insert["item_id"],
+                __none(to_insert["price"]),
+                to_insert["pt_id"],
+            )
+        ]
+        session.execute(insert(table), params)
+
+    logger.debug(
+        f"prices deleted: {len(to_delete)}, updated: {len(to_update)}, "
+        f"inserted: {len(to_insert)}"
+    )
 
-    if np.isnan(price_val) and pt.short == "S":
-        return None
-    price_ = models.Price(store=store, item=item, price=price_val, preference=pt)
-    return price_
 
+def apply_price_book(df, session, partial=False):
+    """
+    Apply the rows of a price book to the database
 
-def read_price_book(path, session):
+    Parameters
+    ----------
+    df : DataFrame
+        price book rows, read without converting blank cells to NaN
+    session : Session
+        database session. Changes are executed, but not committed
+    partial : bool, optional
+        the rows are only part of the price book. The existing items and prices are
+        then only read for the items in `df`, instead of for all items
 
-    stores = session.query(models.Store).filter(models.Store.active == True).all()
-    store_dict = {store.name: store for store in stores}
+    Returns
+    -------
+    int : number of rows applied
 
-    categories = session.query(models.Category).all()
-    category_dict = {c.category: c for c in categories}
+    Raises
+    ------
+    PriceBookValidationError
+        when any cell of the price book is invalid, before anything is read from or
+        written to the database (apart from loading the reference data cache)
+    """
 
-    pref_types = session.query(models.PreferenceType).all()
-    pref_types = {pt.short: pt for pt in pref_types}
-    # standard_pt = pref_types.get("S")
+    reference = get_reference(session)
+    store_ids = reference.active_stores
+    category_ids = reference.category_ids
+    pref_types = reference.preference_type_ids
 
-    df = pd.read_excel(path, na_filter=False)
+    check_price_book(df, reference)
 
+    df = df.copy()
     # trim all string values
-    cols = ["category", "description", "pref_store"]
-    df[cols] = df[cols].applymap(str.strip)
+    for col in ["category", "description", "pref_store"]:
+        df[col] = __strip(df[col])
+
+    unknown = [c for c in df.columns if c not in ID_COLUMNS and c not in store_ids]
+    if unknown:
+        logger.warning(f"ignoring price book columns for inactive stores: {unknown}")
+        df = df.drop(columns=unknown)
+
+    item_ids = [int(id_) for id_ in df["item_id"].unique()] if partial else None
+    items = __get_items(session, item_ids)
+    unknown = ~df["item_id"].isin(items["item_id"])
+    if unknown.any():
+        logger.warning(
+            f"ignoring price book rows for unknown items: "
+            f"{df.loc[unknown, 'item_id'].tolist()}"
+        )
+        df = df[~unknown]
+
+    __update_items(session, df, items, store_ids, category_ids)
 
     # change all the store (price) columns into rows
+    n_rows = len(df)
     df = pd.melt(
         df,
-        id_vars=["item_id", "category", "description", "pref_store"],
+        id_vars=ID_COLUMNS,
         var_name="store_name",
-        value_name="price",
+        value_name="price_raw",
     )
+    df["store_id"] = df["store_name"].map(store_ids)
+    df["pt_id"], df["price"] = __parse_prices(df["price_raw"], pref_types)
 
-    # add an Object column for the preferred store, category and Item
-    df["pref_Store"] = df["pref_store"].apply(lambda x: store_dict.get(x))
-    df["Category"] = df["category"].apply(lambda x: category_dict.get(x))
-    df["Item"] = df["item_id"].apply(lambda id_: session.query(models.Item).get(id_))
-
-    df["Item"] = df.apply(__update_item, axis=1)
+    prices = __get_prices(session, list(store_ids.values()), item_ids)
+    df = pd.merge(df, prices, on=["store_id", "item_id"], how="left", validate="1:1")
 
-    df["Store"] = df["store_name"].apply(lambda x: store_dict.get(x))
-
-    df["Price"] = df.apply(
-        lambda row: session.query(models.Price)
-        .filter(
-            models.Price.store_id == row["Store"].store_id,
-            models.Price.item_id == row["item_id"],
-        )
-        .first(),
-        axis=1,
-    )
-
-    df["Price"] = df.apply(__update_price, axis=1, preference_types=pref_types)
-    df["new_Price"] = df.apply(__new_prices, axis=1, preference_types=pref_types)
+    __reconcile_prices(session, df, standard_pt_id=pref_types["S"])
 
+    # the ORM objects in the session may be stale after the bulk statements. Any
+    # pending changes are flushed first, so expiring the objects does not discard them
     session.flush()
+    session.expire_all()
+    return n_rows
+
 
+def read_price_book(path, session):
+    """
+    Read a price book and apply any changes to the database
+
+    The price book is reconciled against the database with a fixed number of bulk
+    reads, (all Items and all Prices for active stores, the lookup tables come from the
+    reference data cache) followed by one executemany statement each for the item
+    updates and the price deletes, updates and inserts. The number of queries does not
+    depend on the size of the price book.
+
+    The whole price book is validated first, and any invalid cells are reported
+    together before the database is changed.
+
+    Parameters
+    ----------
+    path : str or Path
+        path to the price book
+    session : Session
+        database session. Changes are executed, but not committed
+
+    Raises
+    ------
+    PriceBookValidationError
+        when any cell of the price book is invalid, see `validate_price_book`
+    """
+    apply_price_book(tabular.read_table(path, na_filter=False), session)
     logger.info(f"read price book: {path}")
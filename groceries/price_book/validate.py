@@ -0,0 +1,163 @@
+"""
+Validation of a price book, before any of it is applied to the database
+
+Every check runs on whole columns at once, and all the problems in the price book are
+collected into a single report, so a price book with many mistakes can be fixed in one
+pass instead of one error at a time.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ID_COLUMNS = ["item_id", "category", "description", "pref_store"]
+
+# number of errors listed in the message of a validation error
+MAX_REPORTED = 20
+
+# spreadsheet row of the first row of data, below the header row
+FIRST_ROW = 2
+
+
+class PriceBookValidationError(ValueError):
+    """
+    raised when a price book has invalid cells, with the report of all the errors as
+    its `errors` DataFrame
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        lines = [
+            f"  row {row}, {column} = {value!r}: {error}"
+            for row, column, value, error in errors.head(MAX_REPORTED).itertuples(
+                index=False
+            )
+        ]
+        if len(errors) > MAX_REPORTED:
+            lines.append(f"  ... and {len(errors) - MAX_REPORTED} more")
+        super().__init__(
+            f"price book has {len(errors)} invalid cells:\n" + "\n".join(lines)
+        )
+
+
+def __strip(values):
+    """values as stripped strings, with missing values as empty strings"""
+    values = values.astype(object)
+    return values.where(values.notnull(), "").astype(str).str.strip()
+
+
+def __errors(df, column, mask, error):
+    """error report rows for the cells of a column selected by a mask"""
+    mask = np.asarray(mask, dtype=bool)
+    return pd.DataFrame(
+        {
+            "row": df.index[mask] + FIRST_ROW,
+            "column": column,
+            "value": df[column].to_numpy()[mask] if column in df else None,
+            "error": error,
+        }
+    )
+
+
+def validate_price_book(df, reference):
+    """
+    Check a price book, and report every invalid cell
+
+    The checks are:
+
+    - the item, category, description and preferred store columns are present
+    - every store column is a store in the database. Columns of stores that are not
+      active are allowed, they are ignored when the price book is applied
+    - every item ID is a whole number, and is only listed once
+    - every category and preferred store, when given, exists in the database
+    - every price cell is blank, a preference type short name, or a price above zero
+
+    Parameters
+    ----------
+    df : DataFrame
+        price book, read without converting blank cells to NaN
+    reference : Reference
+        reference data of the database, see `groceries.db.reference.get_reference`
+
+    Returns
+    -------
+    DataFrame : one row per error, with the spreadsheet `row` (1 is the header row),
+        `column`, `value` and `error` columns. Empty when the price book is valid
+    """
+    # the rows are numbered by their position in the price book, kept when `df` is a
+    # selection of its rows
+    if not pd.api.types.is_integer_dtype(df.index):
+        df = df.reset_index(drop=True)
+    errors = []
+
+    missing = [c for c in ID_COLUMNS if c not in df.columns]
+    for column in missing:
+        errors.append(
+            pd.DataFrame(
+                {"row": [1], "column": [column], "value": [None], "error": "missing"}
+            )
+        )
+
+    stores = [c for c in df.columns if c not in ID_COLUMNS]
+    unknown = [c for c in stores if c not in reference.store_ids]
+    for column in unknown:
+        errors.append(
+            pd.DataFrame(
+                {
+                    "row": [1],
+                    "column": [column],
+                    "value": [column],
+                    "error": "unknown store",
+                }
+            )
+        )
+
+    if "item_id" in df:
+        item_ids = pd.to_numeric(df["item_id"], errors="coerce")
+        not_whole = item_ids.isnull() | (item_ids != item_ids.round())
+        errors.append(__errors(df, "item_id", not_whole, "not a whole number"))
+        duplicated = item_ids.duplicated(keep=False) & ~not_whole
+        errors.append(__errors(df, "item_id", duplicated, "listed more than once"))
+
+    for column, known, error in [
+        ("category", reference.category_ids, "unknown category"),
+        ("pref_store", reference.store_ids, "unknown store"),
+    ]:
+        if column in df:
+            values = __strip(df[column])
+            errors.append(
+                __errors(df, column, (values != "") & ~values.isin(known), error)
+            )
+
+    shorts = list(reference.preference_type_ids)
+    for column in stores:
+        if column in unknown:
+            continue
+        raw = __strip(df[column])
+        prices = pd.to_numeric(raw, errors="coerce")
+        is_text = (raw != "") & prices.isnull() & ~raw.isin(shorts)
+        errors.append(__errors(df, column, is_text, "not a price or a preference type"))
+        not_positive = prices.notnull() & ~(np.isfinite(prices) & (prices > 0))
+        errors.append(__errors(df, column, not_positive, "price is not above zero"))
+
+    report = pd.concat(errors, ignore_index=True)
+    report = report.sort_values(by=["row", "column"], kind="stable")
+    return report.reset_index(drop=True)
+
+
+def check_price_book(df, reference):
+    """
+    Validate a price book, and raise on any invalid cell
+
+    Raises
+    ------
+    PriceBookValidationError
+        with the report of every invalid cell, see `validate_price_book`
+    """
+    errors = validate_price_book(df, reference)
+    if not errors.empty:
+        raise PriceBookValidationError(errors)
+    logger.debug(f"validated price book: {len(df)} rows")
@@ -0,0 +1,317 @@
+"""
+Dense item x store matrix of the prices
+
+The prices are held as a `float64` array with one row per item and one column per
+active store, with the preference type of each price as an `int8` code in a second
+array of the same shape. Items and stores are dictionary-encoded: the ID of each row
+and column is kept in an array, and dictionaries map IDs (and store names) back to
+their row or column. Looking up an item or store is a dictionary lookup, and questions
+such as the cheapest store of every item are answered with a single array operation,
+instead of a filter or merge on a DataFrame.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from sqlalchemy import select
+
+from groceries.db import history, models
+from groceries.db.reference import get_reference
+
+logger = logging.getLogger(__name__)
+
+# preference code of the cells without a price
+NO_PRICE = -1
+
+STANDARD = "S"
+
+ITEM_COLUMNS = [
+    "item_id",
+    "category",
+    "description",
+    "unit",
+    "pref_store_id",
+    "pref_store",
+    "active",
+]
+
+
+def price_matrix_query(as_of=None):
+    """
+    Query every item along with every price it has, as IDs
+
+    The prices are looked up by item, through the index on Prices.ItemID. Items without
+    any price are included once with a null store. The names of the IDs are looked up
+    in the cached reference data, so no other tables are joined. When `as_of` is given,
+    the prices are taken from the price history as they were at that time.
+    """
+    item = models.Item.__table__
+    price = models.Price.__table__ if as_of is None else history.prices_as_of(as_of)
+
+    return (
+        select(
+            item.c.ItemID.label("item_id"),
+            item.c.CategoryID.label("category_id"),
+            item.c.Description.label("description"),
+            item.c.UnitID.label("unit_id"),
+            item.c.PreferredStoreID.label("pref_store_id"),
+            item.c.Active.label("active"),
+            price.c.StoreID.label("store_id"),
+            price.c.PreferenceTypeID.label("pt_id"),
+            price.c.Price.label("price"),
+        )
+        .select_from(item)
+        .outerjoin(price, price.c.ItemID == item.c.ItemID)
+        .order_by(item.c.ItemID)
+    )
+
+
+class PriceMatrix:
+    """
+    Prices of every item (rows) at every store (columns)
+
+    Attributes
+    ----------
+    items : DataFrame
+        one row per item, in the order of the rows, with the `item_id`, `category`,
+        `description`, `unit`, `pref_store_id`, `pref_store` and `active` columns
+    item_ids : ndarray of int64
+        item ID of each row
+    store_ids : ndarray of int64
+        store ID of each column
+    store_names : list of str
+        store name of each column
+    prices : ndarray of float64
+        price of each item at each store, NaN where there is no price value. The
+        prices are exported and written back to the database, so they are kept at
+        full precision
+    preferences : ndarray of int8
+        preference code of each price, the position of its preference type in
+        `preference_types`. Cells without a price are `NO_PRICE` (-1), and prices
+        without a preference type have the standard code
+    preference_types : tuple of str
+        short name of the preference type of each code
+    """
+
+    def __init__(
+        self, items, store_ids, store_names, prices, preferences, preference_types
+    ):
+        self.items = items.reset_index(drop=True)
+        self.item_ids = self.items["item_id"].to_numpy(dtype=np.int64)
+        self.store_ids = np.asarray(store_ids, dtype=np.int64)
+        self.store_names = list(store_names)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.preferences = np.asarray(preferences, dtype=np.int8)
+        self.preference_types = tuple(preference_types)
+
+        self._rows = {id_: row for row, id_ in enumerate(self.item_ids.tolist())}
+        self._cols = {id_: col for col, id_ in enumerate(self.store_ids.tolist())}
+        self._cols.update({name: col for col, name in enumerate(self.store_names)})
+
+    @classmethod
+    def from_prices(cls, items, prices, stores, preference_types):
+        """
+        Build the matrix from one row per price
+
+        Parameters
+        ----------
+        items : DataFrame
+            one row per item, with the columns of `items`
+        prices : DataFrame
+            one row per price, with `item_id`, `store_id`, `pt` (short name of the
+            preference type) and `price` columns. Prices of items or stores that are
+            not in the matrix are ignored
+        stores : dict
+            store name and ID of each column
+        preference_types : iterable of str
+            short names of the preference types
+
+        Returns
+        -------
+        PriceMatrix
+        """
+        preference_types = tuple(preference_types)
+        store_ids = list(stores.values())
+
+        rows = pd.Index(items["item_id"]).get_indexer(prices["item_id"])
+        cols = pd.Index(store_ids).get_indexer(prices["store_id"])
+        known = (rows >= 0) & (cols >= 0)
+        rows, cols = rows[known], cols[known]
+
+        codes = pd.Index(preference_types).get_indexer(
+            prices["pt"].fillna(STANDARD)[known]
+        )
+        values = pd.to_numeric(prices["price"][known], errors="coerce")
+
+        shape = (len(items), len(store_ids))
+        price_values = np.full(shape, np.nan)
+        price_values[rows, cols] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        preferences = np.full(shape, NO_PRICE, dtype=np.int8)
+        preferences[rows, cols] = codes
+
+        return cls(
+            items, store_ids, list(stores), price_values, preferences, preference_types
+        )
+
+    @classmethod
+    def from_db(cls, session, as_of=None):
+        """
+        Load the prices of all items at the active stores, with a single query
+
+        Parameters
+        ----------
+        session : Session
+            database session
+        as_of : datetime, optional
+            load the prices as they were at this time. Defaults to the current prices
+
+        Returns
+        -------
+        PriceMatrix
+        """
+        reference = get_reference(session)
+        query = price_matrix_query(as_of=as_of)
+        df = pd.DataFrame(
+            session.execute(query).all(), columns=list(query.selected_columns.keys())
+        )
+
+        items = df.drop_duplicates(subset=["item_id"]).assign(
+            category=lambda d: d["category_id"].map(reference.category_names),
+            unit=lambda d: d["unit_id"].map(reference.unit_names),
+            pref_store=lambda d: d["pref_store_id"].map(reference.store_names),
+            active=lambda d: d["active"].astype(bool),
+        )
+        # the column is read as floats when any item has no preferred store
+        items["pref_store_id"] = items["pref_store_id"].astype("Int64")
+        items = items[ITEM_COLUMNS].astype(object)
+        items = items.where(items.notnull(), None).astype(
+            {"item_id": np.int64, "active": bool}
+        )
+
+        prices = df[df["store_id"].notnull()]
+        prices = prices.assign(pt=prices["pt_id"].map(reference.preference_type_shorts))
+
+        matrix = cls.from_prices(
+            items,
+            prices,
+            reference.active_stores,
+            reference.preference_type_shorts.values(),
+        )
+        logger.debug(f"loaded price matrix: {matrix}")
+        return matrix
+
+    @property
+    def shape(self):
+        return self.prices.shape
+
+    def __repr__(self):
+        n_items, n_stores = self.shape
+        n_prices = int((self.preferences != NO_PRICE).sum())
+        return f"PriceMatrix({n_items} items x {n_stores} stores, {n_prices} prices)"
+
+    def row(self, item_id):
+        """row of an item ID, raises KeyError for unknown items"""
+        return self._rows[item_id]
+
+    def col(self, store):
+        """column of a store ID or name, raises KeyError for unknown stores"""
+        return self._cols[store]
+
+    def code(self, short):
+        """preference code of a preference type short name"""
+        return self.preference_types.index(short)
+
+    def price(self, item_id, store):
+        """price of an item at a store, NaN when there is no price value"""
+        return self.prices[self.row(item_id), self.col(store)].item()
+
+    def item_prices(self, item_id):
+        """prices of an item at every store, indexed by store name"""
+        return pd.Series(self.prices[self.row(item_id)], index=self.store_names)
+
+    def store_prices(self, store):
+        """prices of every item at a store, indexed by item ID"""
+        return pd.Series(
+            self.prices[:, self.col(store)], index=self.item_ids, name=store
+        )
+
+    def is_preference(self, *shorts):
+        """mask of the prices with any of the given preference types"""
+        codes = [self.code(short) for short in shorts if short in self.preference_types]
+        return np.isin(self.preferences, codes)
+
+    def at_preferred_store(self):
+        """
+        Mask of the stores each item may be bought at
+
+        Items with a preferred store may only be bought there, all other items may be
+        bought at any store. An item whose preferred store is not active has no store
+        at all.
+        """
+        pref_store_ids = self.items["pref_store_id"]
+        has_pref_store = pref_store_ids.notnull().to_numpy()
+        pref_cols = pd.Index(self.store_ids).get_indexer(
+            pref_store_ids.astype("Int64").fillna(-1).to_numpy(dtype=np.int64)
+        )
+
+        allowed = np.ones(self.shape, dtype=bool)
+        allowed[has_pref_store] = False
+        valid = has_pref_store & (pref_cols >= 0)
+        allowed[valid.nonzero()[0], pref_cols[valid]] = True
+        return allowed
+
+    def take(self, rows):
+        """matrix of a subset of the items, selected by a mask or row positions"""
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = rows.nonzero()[0]
+        return PriceMatrix(
+            self.items.iloc[rows],
+            self.store_ids,
+            self.store_names,
+            self.prices[rows],
+            self.preferences[rows],
+            self.preference_types,
+        )
+
+    def cheapest(self, mask=None):
+        """
+        Column of the cheapest price of every item
+
+        Parameters
+        ----------
+        mask : ndarray of bool, optional
+            cells that may be chosen, defaults to every cell with a price
+
+        Returns
+        -------
+        ndarray : column of the cheapest price of each item. Items with only cells
+            without a price value get their first allowed column, and items without any
+            allowed cell get -1
+        """
+        if mask is None:
+            mask = self.preferences != NO_PRICE
+        values = np.where(mask & ~np.isnan(self.prices), self.prices, np.inf)
+        cols = values.argmin(axis=1)
+
+        no_value = ~np.isfinite(values.min(axis=1, initial=np.inf))
+        cols[no_value] = mask[no_value].argmax(axis=1)
+        cols[~mask.any(axis=1)] = -1
+        return cols
+
+    def to_frame(self, standard=STANDARD):
+        """
+        Wide DataFrame of the prices, with one column per store, indexed by item ID
+
+        Cells hold the price for standard prices, and the short name of the preference
+        type for all other prices. Cells without a price are NaN.
+        """
+        values = self.prices.astype(object)
+        shorts = np.asarray(self.preference_types, dtype=object)
+        is_other = (self.preferences != NO_PRICE) & (
+            self.preferences != self.code(standard)
+        )
+        values[is_other] = shorts[self.preferences[is_other]]
+        return pd.DataFrame(values, index=self.item_ids, columns=self.store_names)
@@ -1,36 +1,102 @@
 import logging
 
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
 
-from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
 
-from groceries.db import models
+from groceries import cache, solver, tabular
+from groceries.db import queries
+from groceries.db.models import best_price
+from groceries.db.reference import get_reference
+from groceries.price_matrix import PriceMatrix
 
 logger = logging.getLogger(__name__)
 
 
 def read_shopping_list(path):
     logger.debug(f"read shopping list: {path}")
-    df_dict = pd.read_excel(path, sheet_name=None)
-
-    df = pd.DataFrame()
-    for store_name, df_store in df_dict.items():
-        df_store["store"] = store_name
-        df = pd.concat([df, df_store])
-
-    return df
+    df_dict = tabular.read_sheets(path)
+
+    df_stores = [
+        df_store.assign(store=store_name) for store_name, df_store in df_dict.items()
+    ]
+    if not df_stores:
+        return pd.DataFrame()
+    return pd.concat(df_stores, ignore_index=True)
+
+
+def __cheapest_prices(matrix):
+    """
+    Shopping list of the cheapest price of every item, computed on the price matrix
+
+    This follows the rules of the BestPrices table that `sql/shopping_list.sql` reads:
+    only active items with a category are listed, at their preferred store when they
+    have one, and only standard and preferred prices are considered.
+    """
+    listed = matrix.items["active"].to_numpy(dtype=bool)
+    listed &= matrix.items["category"].notnull().to_numpy()
+    matrix = matrix.take(listed)
+
+    allowed = matrix.is_preference("S", "P") & matrix.at_preferred_store()
+    cols = matrix.cheapest(allowed)
+    rows = (cols >= 0).nonzero()[0]
+    cols = cols[rows]
+
+    return pd.DataFrame(
+        {
+            "store": np.asarray(matrix.store_names, dtype=object)[cols],
+            "category": matrix.items["category"].to_numpy()[rows],
+            "description": matrix.items["description"].to_numpy()[rows],
+            "price": matrix.prices[rows, cols],
+        }
+    )
 
 
-def get_shopping_list(sql_path, session):
+def get_shopping_list(sql_path, session, as_of=None):
+    """
+    Get the cheapest store and price of every item
+
+    Parameters
+    ----------
+    sql_path : str or Path or None
+        path to the shopping list query. When `None`, the list is computed from the
+        price matrix instead, with the same rules as the BestPrices table
+    session : Session
+        database session
+    as_of : datetime, optional
+        use the prices as they were at this time. The query must take an `as_of`
+        parameter, e.g. `sql/shopping_list_as_of.sql`
+
+    Returns
+    -------
+    DataFrame : with store, category, description and price columns
+
+    Raises
+    ------
+    RuntimeError
+        when the query reads the BestPrices table, and the database does not have it
+        yet. It is added by `groceries.db.migrate.migrate`
+    """
     logger.debug("generate shopping list from database prices")
 
-    with open(sql_path, "r") as f:
-        sql = text(f.read())
+    if sql_path is None:
+        return __cheapest_prices(PriceMatrix.from_db(session, as_of=as_of))
 
-    engine = session.get_bind()
-    conn = engine.connect()
-    df = pd.read_sql(sql, conn)
+    # queries on the price history take the point in time as the `as_of` parameter
+    params = {} if as_of is None else {"as_of": as_of}
+    try:
+        df = queries.fetch_frame(sql_path, session, params=params)
+    except OperationalError as exc:
+        # databases created before the BestPrices table was added do not have it yet
+        if best_price.BestPrice.__tablename__ not in str(exc.orig):
+            raise
+        raise RuntimeError(
+            "the database has no BestPrices table, add it with "
+            "`python -m groceries migrate`"
+        ) from exc
 
     # rename all columns to be lower-case
     df = df.rename(columns={c: c.lower() for c in df.columns})
@@ -42,84 +108,204 @@ def write_shopping_list(df, session, output_path=None):
     df = df.sort_values(by=columns)
 
     if output_path is not None:
-        stores = session.query(models.Store).filter(models.Store.active == 1).all()
-        store_names = [store.name for store in stores]
-        with pd.ExcelWriter(output_path) as writer:
-            for store_name in store_names:
-                logger.debug(f"write shopping list for '{store_name}'")
-                df[df["store"] == store_name][columns[1:]].to_excel(
-                    writer, sheet_name=store_name, index=False
-                )
+        sheets = {
+            store_name: df[df["store"] == store_name][columns[1:]]
+            for store_name in get_reference(session).active_store_names
+        }
+        tabular.write_sheets(
+            output_path, sheets, number_formats={"price": tabular.PRICE_FORMAT}
+        )
     return df
 
 
-def __price_diff(row):
-    original = row["original_price"]
-    updated = row["updated_price"]
-
-    try:
-        return updated - original
-    except TypeError:
-        return np.nan
-
-
-def get_changed(df_original, df_updated):
-
-    # add columns for tracking where the data came from after it is combined
-    df_original["source"] = "original"
-    df_updated["source"] = "updated"
-
-    for column in ["store", "price"]:
-        df_updated[f"updated_{column}"] = df_updated[column]
-        df_original[f"original_{column}"] = df_original[column]
-
-    # get a dataframe of all items that changed price or store
-    df_changed = pd.concat([df_original, df_updated]).drop_duplicates(
-        subset=["description", "store", "price"], keep=False
+ADDED = "added"
+REMOVED = "removed"
+MOVED_STORE = "moved-store"
+REPRICED = "repriced"
+
+
+def __prefix_columns(df, keys, columns, prefix):
+    """select the key and value columns, with typed prices and prefixed value columns"""
+    df = df[keys + columns].copy()
+    df["price"] = pd.to_numeric(df["price"], errors="coerce").astype(float)
+    return df.rename(columns={c: f"{prefix}_{c}" for c in columns})
+
+
+def get_changed(df_original, df_updated, keys=("category", "description")):
+    """
+    Compare two shopping lists, and get every item that changed
+
+    The lists are matched with an outer merge on the key columns, and the store and
+    price of each item are compared column-wise.
+
+    Parameters
+    ----------
+    df_original : DataFrame
+        original shopping list, with store, price and the key columns
+    df_updated : DataFrame
+        updated shopping list, with the same columns
+    keys : tuple of str, optional
+        columns that identify an item, defaults to ("category", "description")
+
+    Returns
+    -------
+    DataFrame : one row per changed item, with the key columns, the original and
+        updated store and price, the price difference and the kind of change. The
+        change is one of "added", "removed", "moved-store" (which may also have a new
+        price) or "repriced"
+    """
+    keys = list(keys)
+    columns = ["store", "price"]
+
+    df = pd.merge(
+        __prefix_columns(df_original, keys, columns, "original"),
+        __prefix_columns(df_updated, keys, columns, "updated"),
+        on=keys,
+        how="outer",
+        validate="1:1",
+        indicator=True,
     )
-    # create key columns that are kept in the final changed dataframe (after grouping)
-    columns = ["category", "description"]
-    for col in ["store", "price"]:
-        columns.append(f"original_{col}")
-        columns.append(f"updated_{col}")
-    df_changed = df_changed[columns]
-    if df_changed.empty:
-        # the dataframe is empty, no need to combine columns
-        return df_changed
-
-    # Combine the rows so that each difference is represented as a single row
-    df_changed = df_changed.fillna("")
-    df_changed = df_changed.astype(str)
-    df_changed = df_changed.groupby(by=["category", "description"]).agg("".join)
-
-    # then keep only selected columns
-    df_changed.reset_index(inplace=True)
-    df_changed = df_changed[columns]
-
-    # change the type for all price columns to numeric or nan
-    for col in ["original", "updated"]:
-        df_changed[f"{col}_price"] = pd.to_numeric(
-            df_changed[f"{col}_price"], errors="coerce", downcast=None
-        )
-
-    # calculate the price difference between new and old prices, where applicable
-    df_changed["price_difference"] = df_changed.apply(__price_diff, axis=1)
-    return df_changed
-
 
-def generate_shopping_list(output_path, changed_path, sql_path, session):
-
-    df_updated = get_shopping_list(sql_path=sql_path, session=session)
-    write_shopping_list(df_updated, session, output_path)
-    try:
-        df_original = read_shopping_list(output_path)
+    original_price = df["original_price"]
+    updated_price = df["updated_price"]
+    same_price = (original_price == updated_price) | (
+        original_price.isnull() & updated_price.isnull()
+    )
+    same_store = df["original_store"] == df["updated_store"]
+
+    df["price_difference"] = updated_price - original_price
+    df["change"] = np.select(
+        [
+            df["_merge"] == "right_only",
+            df["_merge"] == "left_only",
+            ~same_store,
+            ~same_price,
+        ],
+        [ADDED, REMOVED, MOVED_STORE, REPRICED],
+        default="",
+    )
 
+    df = df[df["change"] != ""]
+    result_columns = keys + [
+        "original_store",
+        "updated_store",
+        "original_price",
+        "updated_price",
+        "price_difference",
+        "change",
+    ]
+    return df[result_columns].sort_values(by=keys).reset_index(drop=True)
+
+
+def generate_shopping_list(
+    output_path,
+    changed_path,
+    sql_path,
+    session,
+    force=False,
+    as_of=None,
+    trip_cost=None,
+    original=None,
+):
+    """
+    Generate the shopping list, and the changes since the previous shopping list
+
+    Parameters
+    ----------
+    output_path : str or Path
+        shopping list file, also read as the previous shopping list
+    changed_path : str or Path
+        file for the changes to the shopping list
+    sql_path : str or Path or None
+        shopping list query, see `get_shopping_list`
+    session : Session
+        database session
+    force : bool, optional
+        generate the shopping list even when it is up-to-date
+    as_of : datetime, optional
+        use the prices as they were at this time
+    trip_cost : float, optional
+        cost of each store visited, to trade off prices against trips
+    original : DataFrame, optional
+        the previous shopping list, when it is already in memory. Defaults to reading
+        it from `output_path`
+
+    Returns
+    -------
+    DataFrame or None : the shopping list, or None when it was up-to-date
+    """
+    if trip_cost is not None and as_of is not None:
+        raise ValueError("the trip cost can only be used with the current prices")
+
+    revision = cache.db_revision(session)
+    revision["as_of"] = None if as_of is None else as_of.isoformat()
+    revision["trip_cost"] = trip_cost
+    # an edited query gives a different shopping list from the same data
+    revision["query"] = None if sql_path is None else cache.file_revision(sql_path)
+    if not force and cache.is_current(output_path, "export", revision):
+        logger.info(f"shopping list is up-to-date: {output_path}")
+        return None
+
+    if trip_cost is None:
+        df_updated = get_shopping_list(sql_path=sql_path, session=session, as_of=as_of)
+    else:
+        # choose the stores to minimize the total of the prices and trip costs
+        df_updated = solver.optimize_shopping_list(session, trip_cost=trip_cost)
+
+    # the original list must be read before it is overwritten by the updated list
+    df_original = original
+    if df_original is None:
+        try:
+            df_original = read_shopping_list(output_path)
+        except FileNotFoundError:
+            logger.info(
+                f"original shopping list not found at: {output_path}\n"
+                f"no changes generated"
+            )
+
+    df_updated = write_shopping_list(df_updated, session, output_path)
+
+    if df_original is not None:
         df_changed = get_changed(df_original, df_updated)
-        if df_changed is not None:
-            df_changed.to_excel(changed_path, index=False)
-    except FileNotFoundError:
-        logger.info(
-            f"original shopping list not found at: {output_path}\nno changes generated"
+        price_columns = ["original_price", "updated_price", "price_difference"]
+        tabular.write_table(
+            changed_path,
+            df_changed,
+            number_formats={c: tabular.PRICE_FORMAT for c in price_columns},
         )
 
+    cache.stamp(output_path, "export", revision)
     logger.info(f"generated shopping list at: {output_path}")
+    return df_updated
+
+
+def export_store_sheets(path, out_path, suffix=".csv"):
+    """
+    Export each store (sheet) of a shopping list to its own file
+
+    Parameters
+    ----------
+    path : str or Path
+        path to the shopping list
+    out_path : str or Path
+        directory to write the files to, one file per store named after the store
+    suffix : str, optional
+        file extension of the exported files, which selects the format. Defaults to
+        ".csv"
+
+    Returns
+    -------
+    list of Path : the exported files
+    """
+    out_path = Path(out_path)
+    out_path.mkdir(parents=True, exist_ok=True)
+
+    paths = []
+    for store_name, df in tabular.read_sheets(path).items():
+        store_path = out_path / f"{store_name}{suffix}"
+        tabular.write_table(
+            store_path, df, number_formats={"price": tabular.PRICE_FORMAT}
+        )
+        paths.append(store_path)
+    logger.info(f"exported {len(paths)} store lists to: {out_path}")
+    return paths
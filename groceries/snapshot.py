@@ -0,0 +1,196 @@
+"""
+Columnar snapshots of the price data
+
+A snapshot is the joined item, store, price and preference data, written to a single
+Arrow IPC (`.arrow`) or Parquet (`.parquet`) file and stamped with the revision of the
+database it was taken from. Arrow IPC files are uncompressed and are loaded through a
+memory map without copying, so even a large price history opens almost instantly,
+without going through SQLAlchemy.
+"""
+
+import json
+import logging
+
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc
+import pyarrow.parquet as pq
+
+from sqlalchemy import select
+
+from groceries import cache
+from groceries.db import models
+
+logger = logging.getLogger(__name__)
+
+# schema metadata key holding the database revision
+REVISION_KEY = b"groceries.revision"
+
+# low cardinality text columns, stored dictionary-encoded
+DICTIONARY_COLUMNS = ["category", "unit", "pref_store", "store", "pt"]
+
+
+def snapshot_query(history=False):
+    """
+    Query the joined price data for a snapshot
+
+    Parameters
+    ----------
+    history : bool, optional
+        snapshot every observation in the price history, instead of the current
+        prices. Defaults to False
+
+    Returns
+    -------
+    Select : one row per price (or price observation)
+    """
+    price = models.PriceHistory.__table__ if history else models.Price.__table__
+    item = models.Item.__table__
+    category = models.Category.__table__
+    unit = models.Unit.__table__
+    store = models.Store.__table__
+    pref_store = models.Store.__table__.alias("PrefStores")
+    pref_type = models.PreferenceType.__table__
+
+    return (
+        select(
+            price.c.ItemID.label("item_id"),
+            category.c.Category.label("category"),
+            item.c.Description.label("description"),
+            unit.c.Unit.label("unit"),
+            item.c.Active.label("item_active"),
+            pref_store.c.Store.label("pref_store"),
+            price.c.StoreID.label("store_id"),
+            store.c.Store.label("store"),
+            store.c.Active.label("store_active"),
+            pref_type.c.ShortType.label("pt"),
+            price.c.Price.label("price"),
+            price.c.ObservedAt.label("observed_at"),
+            price.c.Note.label("note"),
+        )
+        .select_from(price)
+        .join(item, price.c.ItemID == item.c.ItemID)
+        .join(store, price.c.StoreID == store.c.StoreID)
+        .outerjoin(category, item.c.CategoryID == category.c.CategoryID)
+        .outerjoin(unit, item.c.UnitID == unit.c.UnitID)
+        .outerjoin(pref_store, item.c.PreferredStoreID == pref_store.c.StoreID)
+        .outerjoin(pref_type, price.c.PreferenceTypeID == pref_type.c.TypeID)
+    )
+
+
+def __to_table(df, revision):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for name in DICTIONARY_COLUMNS:
+        index = table.schema.get_field_index(name)
+        table = table.set_column(index, name, pc.dictionary_encode(table[name]))
+
+    # notes are usually all blank, which pyarrow would otherwise store as a null column
+    index = table.schema.get_field_index("note")
+    table = table.set_column(index, "note", table["note"].cast(pa.string()))
+
+    metadata = dict(table.schema.metadata or {})
+    metadata[REVISION_KEY] = json.dumps(revision).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def read_revision(path):
+    """
+    Read the database revision a snapshot was taken from
+
+    Only the schema is read, not the data.
+
+    Returns
+    -------
+    dict or None : the revision, or None when the file does not exist
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    if path.suffix == ".parquet":
+        schema = pq.read_schema(path)
+    else:
+        with pa.memory_map(str(path)) as source:
+            schema = pa.ipc.open_file(source).schema
+
+    revision = (schema.metadata or {}).get(REVISION_KEY)
+    return None if revision is None else json.loads(revision)
+
+
+def write_snapshot(session, path, history=False, force=False):
+    """
+    Write a snapshot of the price data
+
+    Parameters
+    ----------
+    session : Session
+        database session
+    path : str or Path
+        path to the snapshot. Written as Parquet for `.parquet` files, and as an Arrow
+        IPC file for anything else
+    history : bool, optional
+        snapshot every observation in the price history, instead of the current
+        prices. Defaults to False
+    force : bool, optional
+        write the snapshot even when the existing snapshot was taken from the current
+        revision of the database. Defaults to False
+
+    Returns
+    -------
+    bool : True when the snapshot was written, False when it was already up-to-date
+    """
+    path = Path(path)
+    revision = cache.db_revision(session)
+    revision["history"] = history
+    if not force and read_revision(path) == revision:
+        logger.info(f"snapshot is up-to-date: {path}")
+        return False
+
+    query = snapshot_query(history=history)
+    df = pd.DataFrame(
+        session.execute(query).all(), columns=list(query.selected_columns.keys())
+    )
+    df["price"] = df["price"].astype(float)
+    table = __to_table(df, revision)
+
+    if path.suffix == ".parquet":
+        pq.write_table(table, path)
+    else:
+        with pa.OSFile(str(path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as ipc_writer:
+                ipc_writer.write_table(table)
+
+    logger.info(f"wrote snapshot of {len(df)} prices: {path}")
+    return True
+
+
+def read_snapshot(path, columns=None):
+    """
+    Load a snapshot
+
+    Arrow IPC files are memory-mapped, so the returned table references the file
+    without copying it into memory. Parquet files are decoded, which does copy.
+
+    Parameters
+    ----------
+    path : str or Path
+        path to the snapshot
+    columns : list of str, optional
+        only load these columns
+
+    Returns
+    -------
+    pyarrow.Table : the snapshot. Use `Table.to_pandas` for a DataFrame
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        return pq.read_table(path, columns=columns, memory_map=True)
+
+    source = pa.memory_map(str(path))
+    table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table
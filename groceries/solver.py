@@ -0,0 +1,162 @@
+"""
+Choose where to buy each item, trading off prices against the number of stores visited
+
+Buying every item at its cheapest store can mean a trip to every store for a few cents
+of savings. Each store that is visited adds a fixed trip cost, and the stores are
+chosen to minimize the total of the item prices and the trip costs. This is a facility
+location problem, which is solved with a local search that opens and closes one store
+at a time, vectorized over all items and stores with NumPy.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from groceries.price_matrix import PriceMatrix
+
+logger = logging.getLogger(__name__)
+
+
+def cost_matrix(matrix):
+    """
+    Build the item x store cost matrix
+
+    Only the choices the shopping list allows are given a cost, every other cell is
+    infinite. These are the rules of the BestPrices table that `sql/shopping_list.sql`
+    reads:
+
+    - only standard ("S") and preferred ("P") prices are chosen, "NP" (not preferred)
+      prices never are
+    - when an item has a preferred store, only that store is allowed
+    - prices without a price value are never chosen
+
+    Parameters
+    ----------
+    matrix : PriceMatrix
+        prices of the items (rows) at the stores (columns)
+
+    Returns
+    -------
+    ndarray : cost of each item (rows) at each store (columns)
+    """
+    allowed = matrix.is_preference("S", "P") & matrix.at_preferred_store()
+    allowed &= ~np.isnan(matrix.prices)
+    return np.where(allowed, matrix.prices, np.inf)
+
+
+def solve(costs, trip_cost=0.0, max_iter=1000):
+    """
+    Choose the stores to visit, and the store to buy each item at
+
+    The search starts with every store open that is the cheapest option for any item.
+    Each iteration then applies the single best move, either closing an open store or
+    opening a closed one, until no move lowers the total cost. A store is only closed
+    when every item bought there can be bought at another open store.
+
+    Parameters
+    ----------
+    costs : ndarray
+        cost of each item (rows) at each store (columns), infinite where the item
+        cannot be bought
+    trip_cost : float, optional
+        cost of visiting each store, defaults to zero
+    max_iter : int, optional
+        maximum number of moves
+
+    Returns
+    -------
+    ndarray : index of the store to buy each item at, or -1 when the item can not be
+        bought at any store
+    """
+    n_items, n_stores = costs.shape
+    buyable = np.isfinite(costs).any(axis=1)
+    costs = costs[buyable]
+
+    is_open = np.zeros(n_stores, dtype=bool)
+    if len(costs):
+        is_open[np.unique(costs.argmin(axis=1))] = True
+
+    for _ in range(max_iter):
+        if not len(costs):
+            break
+        open_costs = np.where(is_open, costs, np.inf)
+        best_store = open_costs.argmin(axis=1)
+        best = open_costs[np.arange(len(costs)), best_store]
+
+        # closing a store moves each of its items to their next cheapest open store
+        if n_stores > 1:
+            second = np.partition(open_costs, 1, axis=1)[:, 1]
+        else:
+            second = np.full(len(costs), np.inf)
+        close_cost = np.bincount(best_store, weights=second - best, minlength=n_stores)
+        close_saving = np.where(is_open, trip_cost - close_cost, -np.inf)
+
+        # opening a store moves any item that is cheaper there
+        gain = np.maximum(best[:, None] - costs, 0).sum(axis=0)
+        open_saving = np.where(is_open, -np.inf, gain - trip_cost)
+
+        savings = np.concatenate([close_saving, open_saving])
+        move = savings.argmax()
+        if not savings[move] > 1e-9:
+            break
+        is_open[move % n_stores] = move >= n_stores
+
+    assignment = np.full(n_items, -1)
+    if len(costs):
+        assignment[buyable] = np.where(is_open, costs, np.inf).argmin(axis=1)
+    return assignment
+
+
+def optimize_shopping_list(session, trip_cost=0.0):
+    """
+    Generate a shopping list that minimizes the total of the prices and trip costs
+
+    Parameters
+    ----------
+    session : Session
+        database session
+    trip_cost : float, optional
+        cost of each store that is visited, defaults to zero. With a trip cost of zero,
+        every item is bought at its cheapest store, the same as the shopping list of
+        `shopping_list.get_shopping_list`
+
+    Returns
+    -------
+    DataFrame : with store, category, description and price columns, the same as
+        `shopping_list.get_shopping_list`. Like the shopping list, only active items
+        with a category are listed. Items that only have allowed prices without a
+        price value are listed at their first allowed store, without a price, and
+        items that can not be bought at any store are not included
+    """
+    matrix = PriceMatrix.from_db(session)
+    listed = matrix.items["active"].to_numpy(dtype=bool)
+    listed &= matrix.items["category"].notnull().to_numpy()
+    matrix = matrix.take(listed)
+    assignment = solve(cost_matrix(matrix), trip_cost=trip_cost)
+
+    # the shopping list query keeps the items without a price value
+    unpriced = assignment < 0
+    allowed = matrix.is_preference("S", "P") & matrix.at_preferred_store()
+    assignment[unpriced] = matrix.cheapest(allowed)[unpriced]
+
+    bought = assignment >= 0
+    rows = np.arange(len(assignment))[bought]
+    cols = assignment[bought]
+
+    df = pd.DataFrame(
+        {
+            "store": np.asarray(matrix.store_names, dtype=object)[cols],
+            "category": matrix.items["category"].to_numpy()[rows],
+            "description": matrix.items["description"].to_numpy()[rows],
+            "price": matrix.prices[rows, cols],
+        }
+    )
+
+    n_stores = len(np.unique(cols))
+    logger.info(
+        f"optimized shopping list: {len(df)} items at {n_stores} stores, "
+        f"total {np.nansum(df['price']) + trip_cost * n_stores:.2f} "
+        f"(trip cost {trip_cost:.2f} per store)"
+    )
+    return df
@@ -0,0 +1,211 @@
+"""
+Read and write tables in any of the supported file formats
+
+The format is chosen by the file extension:
+
+- `.xlsx`: Excel workbook, with one sheet per table. Read in openpyxl's streaming
+  read-only mode, and written with `groceries.writer`
+- `.csv`: plain text, read and written by pandas
+- `.parquet`: columnar, read and written by pandas (requires pyarrow)
+
+The CSV and Parquet formats hold a single table. When sheets are written to one of
+these files, they are stacked into a single table with an extra `sheet` column, which
+is split back into the sheets when the file is read.
+"""
+
+import logging
+
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# number format for all prices in the exported files
+PRICE_FORMAT = r"$* 0.000;[Color16]$* -0.000;-;[Color41]@"
+
+# column holding the sheet name, when several sheets are stored in a single table
+SHEET_COLUMN = "sheet"
+
+
+def __read_xlsx(path, na_filter=True):
+    # imported here, so the other formats never need to import openpyxl
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheets = {}
+        for worksheet in workbook.worksheets:
+            rows = worksheet.iter_rows(values_only=True)
+            header = next(rows, ())
+            df = pd.DataFrame.from_records(list(rows), columns=list(header))
+            # read-only worksheets can report trailing rows that are entirely blank
+            sheets[worksheet.title] = __na_filter(df.dropna(how="all"), na_filter)
+    finally:
+        workbook.close()
+    return sheets
+
+
+def __write_xlsx(path, sheets, number_formats=None):
+    from groceries import writer
+
+    writer.write_excel(path, sheets, number_formats=number_formats)
+
+
+def __read_csv(path, na_filter=True):
+    return __split_sheets(path, pd.read_csv(path, na_filter=na_filter))
+
+
+def __write_csv(path, sheets, number_formats=None):
+    __stack_sheets(sheets).to_csv(path, index=False)
+
+
+def __read_parquet(path, na_filter=True):
+    return __split_sheets(path, __na_filter(pd.read_parquet(path), na_filter))
+
+
+def __write_parquet(path, sheets, number_formats=None):
+    df = __stack_sheets(sheets)
+
+    # parquet columns have a single type, so columns that mix prices and preference
+    # types (e.g. in the price book) are stored as text
+    for column in df.columns:
+        if pd.api.types.infer_dtype(df[column], skipna=True) == "mixed":
+            df[column] = df[column].map(lambda x: None if pd.isnull(x) else str(x))
+    df.to_parquet(path, index=False)
+
+
+def __na_filter(df, na_filter):
+    """replace missing values with empty strings, like pandas' `na_filter=False`"""
+    if na_filter:
+        return df
+    return df.astype(object).where(df.notnull(), "")
+
+
+def __stack_sheets(sheets):
+    if isinstance(sheets, pd.DataFrame):
+        return sheets
+    if not sheets:
+        return pd.DataFrame(columns=[SHEET_COLUMN])
+    return pd.concat(
+        [df.assign(**{SHEET_COLUMN: name}) for name, df in sheets.items()],
+        ignore_index=True,
+    )
+
+
+def __split_sheets(path, df):
+    if SHEET_COLUMN not in df.columns:
+        return {Path(path).stem: df}
+    return {
+        name: group.drop(columns=[SHEET_COLUMN]).reset_index(drop=True)
+        for name, group in df.groupby(SHEET_COLUMN, sort=False)
+    }
+
+
+BACKENDS = {
+    ".xlsx": (__read_xlsx, __write_xlsx),
+    ".csv": (__read_csv, __write_csv),
+    ".parquet": (__read_parquet, __write_parquet),
+}
+
+
+def __backend(path):
+    suffix = Path(path).suffix.lower()
+    try:
+        return BACKENDS[suffix]
+    except KeyError:
+        raise ValueError(
+            f"unsupported file type '{suffix}' for {path}, "
+            f"expected one of: {', '.join(BACKENDS)}"
+        ) from None
+
+
+def read_sheets(path, na_filter=True):
+    """
+    Read every sheet (table) in a file
+
+    Parameters
+    ----------
+    path : str or Path
+        path to the file, the extension selects the format
+    na_filter : bool, optional
+        when False, missing values are read as empty strings instead of NaN, like
+        `pandas.read_csv`. Defaults to True
+
+    Returns
+    -------
+    dict : sheet name and DataFrame of each sheet. Files that hold a single table have
+        a single sheet, named after the file
+    """
+    read, _ = __backend(path)
+    logger.debug(f"read sheets: {path}")
+    return read(path, na_filter=na_filter)
+
+
+def read_table(path, na_filter=True):
+    """read the first sheet (table) in a file, see `read_sheets`"""
+    sheets = read_sheets(path, na_filter=na_filter)
+    return next(iter(sheets.values()))
+
+
+def read_chunks(path, chunksize, na_filter=True):
+    """
+    Read the first sheet (table) in a file in chunks of rows
+
+    CSV files are parsed one chunk at a time, and Parquet files are read one batch at
+    a time, so only a single chunk is held in memory. Other formats are read in full,
+    and then split into chunks.
+
+    Parameters
+    ----------
+    path : str or Path
+        path to the file, the extension selects the format
+    chunksize : int
+        maximum number of rows in each chunk
+    na_filter : bool, optional
+        see `read_sheets`
+
+    Yields
+    ------
+    DataFrame : the next chunk of rows
+    """
+    suffix = Path(path).suffix.lower()
+    logger.debug(f"read chunks: {path}")
+    if suffix == ".csv":
+        yield from pd.read_csv(path, na_filter=na_filter, chunksize=chunksize)
+    elif suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield __na_filter(batch.to_pandas(), na_filter)
+    else:
+        df = read_table(path, na_filter=na_filter)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:][:chunksize]
+
+
+def write_sheets(path, sheets, number_formats=None):
+    """
+    Write several sheets (tables) to a file
+
+    Parameters
+    ----------
+    path : str or Path
+        path to the file, the extension selects the format
+    sheets : dict
+        sheet name and DataFrame to write on each sheet. Formats that hold a single
+        table store the sheet name of each row in a `sheet` column
+    number_formats : dict, optional
+        number format for each column name. Only used by formats that support number
+        formats (`.xlsx`)
+    """
+    _, write = __backend(path)
+    logger.debug(f"write sheets: {path}")
+    write(path, sheets, number_formats=number_formats)
+
+
+def write_table(path, df, number_formats=None):
+    """write a single DataFrame to a file, see `write_sheets`"""
+    _, write = __backend(path)
+    logger.debug(f"write table: {path}")
+    write(path, df, number_formats=number_formats)
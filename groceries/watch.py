@@ -0,0 +1,180 @@
+"""
+Watch the price book, and apply each edit to the database as soon as it is saved
+
+The watcher is a long-running process that keeps its database session (and with it the
+engine and the reference data cache), the last imported price book and the last
+shopping list in memory. The price book file is polled for changes. When it was saved,
+it is read and compared to the last imported version, only the rows with a changed cell
+are applied to the database, and the shopping list is regenerated.
+"""
+
+import logging
+import threading
+import time
+
+from pathlib import Path
+
+from groceries import tabular
+from groceries.price_book.read import apply_price_book
+from groceries.shopping_list import generate_shopping_list
+
+logger = logging.getLogger(__name__)
+
+# time between checks of the price book, in seconds
+POLL_INTERVAL = 0.2
+
+
+def changed_rows(previous, current, key="item_id"):
+    """
+    Get the rows of a price book with any cell that changed
+
+    Parameters
+    ----------
+    previous : DataFrame or None
+        previously imported price book. When `None`, every row has changed
+    current : DataFrame
+        price book to compare, read the same way as `previous`
+    key : str, optional
+        column that identifies a row, defaults to "item_id"
+
+    Returns
+    -------
+    DataFrame : the rows of `current` that are new or have a changed cell. When the
+        columns changed (e.g. a store was added), every row is returned
+    """
+    if previous is None or list(previous.columns) != list(current.columns):
+        return current
+
+    old = previous.drop_duplicates(subset=[key]).set_index(key)
+    new = current.set_index(key)
+    is_new = ~new.index.isin(old.index)
+    old = old.reindex(new.index)
+
+    # compare as text, so a cell that changed type (e.g. a price to "P") is a change
+    changed = (new.astype(str) != old.astype(str)).any(axis=1).to_numpy()
+    return current[changed | is_new]
+
+
+def file_signature(path):
+    """modification time and size of a file, or None when it does not exist"""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class PriceBookWatcher:
+    """
+    Apply the edits to a price book, and regenerate the shopping list
+
+    Parameters
+    ----------
+    price_book_path : str or Path
+        price book to watch
+    session : Session
+        database session, kept open while watching
+    output_path, changed_path, sql_path : str or Path
+        shopping list, changes and shopping list query, see
+        `shopping_list.generate_shopping_list`
+    """
+
+    def __init__(self, price_book_path, session, output_path, changed_path, sql_path):
+        self.price_book_path = Path(price_book_path)
+        self.session = session
+        self.output_path = output_path
+        self.changed_path = changed_path
+        self.sql_path = sql_path
+
+        self.price_book = None
+        self.shopping_list = None
+        self.signature = None
+
+    def update(self):
+        """
+        Apply the rows that changed since the last update, and regenerate the outputs
+
+        The first update applies the whole price book.
+
+        Returns
+        -------
+        int : number of changed rows that were applied
+        """
+        price_book = tabular.read_table(self.price_book_path, na_filter=False)
+        rows = changed_rows(self.price_book, price_book)
+        partial = len(rows) < len(price_book)
+
+        try:
+            if not rows.empty:
+                apply_price_book(rows, self.session, partial=partial)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+        self.price_book = price_book
+        shopping_list = generate_shopping_list(
+            output_path=self.output_path,
+            changed_path=self.changed_path,
+            sql_path=self.sql_path,
+            session=self.session,
+            original=self.shopping_list,
+        )
+        # the last shopping list is kept, so it is not read back from its file
+        if shopping_list is not None:
+            self.shopping_list = shopping_list
+        return len(rows)
+
+    def poll(self):
+        """
+        Update when the price book was saved since the last update
+
+        A file that is still changing is left for the next poll, so a save that is in
+        progress is not read. A save that fails to apply is not tried again until the
+        price book is saved again.
+
+        Returns
+        -------
+        int or None : number of changed rows that were applied, or None when the price
+            book was not saved since the last update
+        """
+        signature = file_signature(self.price_book_path)
+        if signature is None or signature == self.signature:
+            return None
+
+        # wait until the file stops changing
+        time.sleep(POLL_INTERVAL / 2)
+        if file_signature(self.price_book_path) != signature:
+            return None
+
+        start = time.perf_counter()
+        self.signature = signature
+        n_rows = self.update()
+        logger.info(
+            f"applied {n_rows} changed rows of {self.price_book_path} in "
+            f"{time.perf_counter() - start:.2f}s"
+        )
+        return n_rows
+
+    def run(self, interval=POLL_INTERVAL, stop=None):
+        """
+        Poll the price book until stopped
+
+        Errors while reading or applying the price book are logged, and watching
+        continues.
+
+        Parameters
+        ----------
+        interval : float, optional
+            time between polls, in seconds
+        stop : threading.Event, optional
+            stop watching once set. Defaults to watching until interrupted
+        """
+        stop = threading.Event() if stop is None else stop
+        logger.info(f"watching price book: {self.price_book_path}")
+        while not stop.is_set():
+            try:
+                self.poll()
+            except Exception:
+                logger.exception(f"failed to apply price book: {self.price_book_path}")
+            stop.wait(interval)
@@ -0,0 +1,118 @@
+"""
+Stream DataFrames to Excel workbooks, formatted as they are written
+
+The workbook is written in openpyxl's write-only mode, so rows are streamed to the file
+as they are emitted instead of being held in memory. The column widths and number
+formats are set as part of that single pass, so the workbook never needs to be opened
+again to format it.
+"""
+
+import logging
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils import get_column_letter
+
+from groceries import format
+
+logger = logging.getLogger(__name__)
+
+# match the header style pandas uses when exporting with `DataFrame.to_excel`
+__THIN = Side(style="thin")
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=__THIN, right=__THIN, top=__THIN, bottom=__THIN)
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="top")
+
+
+def __header(worksheet, columns):
+    cells = []
+    for column in columns:
+        cell = WriteOnlyCell(worksheet, value=str(column))
+        cell.font = HEADER_FONT
+        cell.border = HEADER_BORDER
+        cell.alignment = HEADER_ALIGNMENT
+        cells.append(cell)
+    return cells
+
+
+def __rows(worksheet, df, number_formats):
+    """yield the rows of the DataFrame, with missing values written as blank cells"""
+    values = df.astype(object).where(df.notnull(), None)
+
+    formats = [number_formats.get(column) for column in df.columns]
+    formatted = [i for i, format_ in enumerate(formats) if format_ is not None]
+
+    for row in values.itertuples(index=False, name=None):
+        if not formatted:
+            yield row
+            continue
+
+        row = list(row)
+        for i in formatted:
+            cell = WriteOnlyCell(worksheet, value=row[i])
+            cell.number_format = formats[i]
+            row[i] = cell
+        yield row
+
+
+def write_sheet(workbook, sheet_name, df, number_formats=None):
+    """
+    Stream a DataFrame to a new sheet of a write-only workbook
+
+    Parameters
+    ----------
+    workbook : Workbook
+        workbook created with `write_only=True`
+    sheet_name : str
+        name of the new sheet
+    df : DataFrame
+        data to write. The columns are written as a header row and the index is not
+        written
+    number_formats : dict, optional
+        number format for each column name, columns that are not included keep the
+        default format
+    """
+    if number_formats is None:
+        number_formats = {}
+
+    logger.debug(f"write sheet '{sheet_name}' ({len(df)} rows)")
+    worksheet = workbook.create_sheet(title=sheet_name)
+
+    # column styles must be set before any row is written
+    widths = format.column_widths(df)
+    for icol, (column, width) in enumerate(zip(df.columns, widths), 1):
+        dimension = worksheet.column_dimensions[get_column_letter(icol)]
+        dimension.width = width
+        if column in number_formats:
+            dimension.number_format = number_formats[column]
+
+    worksheet.append(__header(worksheet, df.columns))
+    for row in __rows(worksheet, df, number_formats):
+        worksheet.append(row)
+    return worksheet
+
+
+def write_excel(path, sheets, number_formats=None):
+    """
+    Write one or more DataFrames to an Excel workbook in a single streaming pass
+
+    Parameters
+    ----------
+    path : str or Path
+        path to save the workbook to
+    sheets : DataFrame or dict
+        DataFrame to write to a single sheet, or a dictionary of sheet names and the
+        DataFrame to write on each sheet
+    number_formats : dict, optional
+        number format for each column name, applied on every sheet
+    """
+    if not isinstance(sheets, dict):
+        sheets = {"Sheet1": sheets}
+
+    workbook = Workbook(write_only=True)
+    for sheet_name, df in sheets.items():
+        write_sheet(workbook, sheet_name, df, number_formats=number_formats)
+
+    workbook.save(path)
+    logger.debug(f"saved workbook: {path}")
@@ -1,11 +1,14 @@
+import functools
 import logging
+import sys
 
 from pathlib import Path
 
-import openpyxl
-
-from groceries import create_price_book, format, generate_shopping_list, read_price_book
+from groceries import create_price_book, generate_shopping_list, read_price_book
 from groceries.db import populate, recreate_all, session
+from groceries.pipeline import run_pipeline, select_stages, Stage
+from groceries.shopping_list import export_store_sheets
+from groceries.snapshot import write_snapshot
 
 DATA_PATH = Path(".") / "data" / "setup"
 SQL_PATH = Path(".") / "sql"
@@ -33,6 +36,15 @@ logger.addHandler(sh)
 logger.debug(f"Database engine: {session.get_bind()}")
 
 
+def run_recreate_all():
+    recreate_all()
+
+
+def run_populate():
+    populate.initial_populate(DATA_PATH, session)
+    session.commit()
+
+
 def run_generate_shopping_list():
 
     generate_shopping_list(
@@ -53,34 +65,83 @@ def run_read_price_book():
     session.commit()
 
 
-def format_all():
-
-    xl_sets = [("changed", "EFG"), ("shopping_list", "C"), ("price_book", "EFG")]
-    for name, columns in xl_sets:
-        path = RESULTS_PATH / f"{name}.xlsx"
-        if not path.exists():
-            continue
-
-        wb = openpyxl.load_workbook(path, read_only=False)
-        worksheet = wb.active
-        format.column_width(worksheet)
-        format.number_format(
-            worksheet,
-            column_letters=columns,
-            format_=r"$* 0.000;[Color16]$* -0.000;-;[Color41]@",
-        )
-
-        wb.save(path)
-        wb.close()
+def run_write_snapshot():
+    write_snapshot(session, RESULTS_PATH / "prices.arrow")
+
+
+def run_export_store_sheets():
+    export_store_sheets(RESULTS_PATH / "shopping_list.xlsx", RESULTS_PATH / "stores")
+
+
+def in_session(func):
+    """run a stage, and close the database session of its thread when it is done"""
+
+    @functools.wraps(func)
+    def wrapper():
+        try:
+            return func()
+        finally:
+            session.remove()
+
+    return wrapper
+
+
+# each thread has its own database session. Stages that write to the database are
+# serial, and the stages that only read from it run concurrently. The shopping list
+# and snapshot wait for both the populated prices and the imported price book, so
+# they never start before an import that is part of the same run
+STAGES = [
+    Stage(
+        "recreate-all",
+        in_session(run_recreate_all),
+        provides=("database",),
+        serial=True,
+    ),
+    Stage(
+        "populate",
+        in_session(run_populate),
+        requires=("database",),
+        provides=("prices",),
+        serial=True,
+    ),
+    Stage(
+        "create-price-book",
+        in_session(run_create_price_book),
+        requires=("prices",),
+        provides=("price_book",),
+    ),
+    Stage(
+        "read-price-book",
+        in_session(run_read_price_book),
+        requires=("price_book",),
+        provides=("prices_imported",),
+        serial=True,
+    ),
+    Stage(
+        "shopping-list",
+        in_session(run_generate_shopping_list),
+        requires=("prices", "prices_imported"),
+        provides=("shopping_list",),
+    ),
+    Stage(
+        "snapshot",
+        in_session(run_write_snapshot),
+        requires=("prices", "prices_imported"),
+        provides=("snapshot",),
+    ),
+    Stage(
+        "store-sheets",
+        run_export_store_sheets,
+        requires=("shopping_list",),
+        provides=("store_sheets",),
+    ),
+]
+
+DEFAULT_STAGES = ["read-price-book", "shopping-list", "snapshot", "store-sheets"]
 
 
 if __name__ == "__main__":
-    # recreate_all()
-    # populate.initial_populate(DATA_PATH, session)
-
-    # run_create_price_book()
-
-    run_read_price_book()
-    run_generate_shopping_list()
-
-    format_all()
+    # run the stages named on the command line, e.g.
+    #   python main.py recreate-all populate create-price-book
+    stages, available = select_stages(STAGES, sys.argv[1:] or DEFAULT_STAGES)
+    run_pipeline(stages, available=available)
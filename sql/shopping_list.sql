@@ -2,23 +2,12 @@ select
     S.Store,
     C.Category,
     I.Description,
-    P.Price
-from (select
-    P.ItemID,
-    I.CategoryID,
-    P.StoreID,
-    min(P.Price) as Price
+    B.Price
 
-from Prices as P
-    inner join Stores as S on P.StoreID = S.StoreID
-    inner join Items as I on P.ItemID = I.ItemID
+-- the cheapest allowed price of each active item, at an active store. The BestPrices
+-- table is kept up-to-date by triggers, see groceries/db/models/best_price.py
+from BestPrices as B
 
-where
-    S.Active = 1 and I.Active = 1  -- Store and item are active and should be included
-    and P.PreferenceTypeID in (select TypeID from PreferenceTypes where ShortType in ("P", "S")) -- filter out any priced items that positively wanted
-    and (I.PreferredStoreID is null or I.PreferredStoreID = P.StoreID)
-group by P.ItemID) as P
-
-inner join Stores as S on P.StoreID = S.StoreID
-inner join Items as I on P.ItemID = I.ItemID
-inner join Categories as C on P.CategoryID = C.CategoryID
+inner join Stores as S on B.StoreID = S.StoreID
+inner join Items as I on B.ItemID = I.ItemID
+inner join Categories as C on I.CategoryID = C.CategoryID
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from groceries import tabular
+from groceries.db import Base, get_engine, models, populate
+from groceries.db.generate import generate_setup
+
+ROOT_PATH = Path(__file__).parent.parent
+
+# the queries shipped with the package
+SQL_PATH = ROOT_PATH / "sql"
+
+N_ITEMS = 40
+N_STORES = 4
+
+
+@pytest.fixture
+def setup_path(tmp_path):
+    """setup directory with a small, repeatable set of generated data"""
+    path = tmp_path / "setup"
+    generate_setup(path, n_items=N_ITEMS, n_stores=N_STORES, seed=0)
+    return path
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'groceries.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(bind=engine) as session:
+        yield session
+
+
+@pytest.fixture
+def populated(session, setup_path):
+    """session of a database populated from the generated setup data"""
+    populate.initial_populate(setup_path, session)
+    return session
+
+
+def read_prices(session):
+    """every price in the database, indexed by store and item ID"""
+    table = models.Price.__table__
+    query = select(
+        table.c.StoreID, table.c.ItemID, table.c.PreferenceTypeID, table.c.Price
+    )
+    df = pd.DataFrame(
+        session.execute(query).all(),
+        columns=["store_id", "item_id", "pt_id", "price"],
+    )
+    return df.set_index(["store_id", "item_id"]).sort_index()
+
+
+def load_price_book(path):
+    """read a price book the way it is imported, with blank cells as empty strings"""
+    return tabular.read_table(path, na_filter=False)
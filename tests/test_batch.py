@@ -0,0 +1,52 @@
+import pytest
+
+from sqlalchemy.orm import Session
+
+from conftest import SQL_PATH
+from groceries.batch import run_batch, run_job
+from groceries.db import Base, get_engine, populate
+
+# the changes are only written once there is a previous shopping list to compare to
+FILES = ["price_book.xlsx", "shopping_list.xlsx"]
+
+
+@pytest.fixture
+def databases(tmp_path, setup_path):
+    """two populated databases"""
+    paths = []
+    for name in ["first", "second"]:
+        path = tmp_path / f"{name}.db"
+        engine = get_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(engine)
+        with Session(bind=engine) as session:
+            populate.initial_populate(setup_path, session)
+        engine.dispose()
+        paths.append(path)
+    return paths
+
+
+def test_job(databases, tmp_path):
+    output_path = tmp_path / "out"
+    result = run_job(databases[0], output_path, sql_path=SQL_PATH / "shopping_list.sql")
+    assert result["ok"], result["error"]
+    assert list(result["steps"]) == ["price book", "shopping list"]
+    for name in FILES:
+        assert (output_path / name).exists()
+
+
+def test_failed_job_is_reported(tmp_path):
+    result = run_job(tmp_path / "missing.db", tmp_path / "out")
+    assert not result["ok"]
+    assert "database not found" in result["error"]
+
+
+def test_batch(databases, tmp_path):
+    jobs = [(path, tmp_path / path.stem) for path in databases]
+    jobs.insert(1, (tmp_path / "missing.db", tmp_path / "missing"))
+
+    report = run_batch(jobs, sql_path=SQL_PATH / "shopping_list.sql", max_workers=2)
+    assert (report["succeeded"], report["failed"]) == (2, 1)
+    assert [result["ok"] for result in report["jobs"]] == [True, False, True]
+    for path in databases:
+        for name in FILES:
+            assert (tmp_path / path.stem / name).exists()
@@ -0,0 +1,134 @@
+"""
+Benchmark the core pipelines at several scales
+
+The benchmarks are not run with the rest of the tests. Run them with
+`pytest -m benchmark` (`make benchmark`), and pick a scale with e.g. `-k small`. For
+each scale, synthetic setup data is generated and each pipeline is timed on a new
+SQLite database, in the order a user would run them:
+
+- `populate`: `populate.initial_populate` from the setup files
+- `export-price-book`: `create_price_book`
+- `import-price-book`: `read_price_book` of the exported (unchanged) price book
+- `shopping-list`: `generate_shopping_list`, including the changes to the previous list
+
+The result of each scale is appended to `benchmarks.jsonl` in the project root, and
+compared to the previous result of that scale.
+"""
+
+import json
+import platform
+import time
+
+from datetime import datetime
+
+import pytest
+
+from sqlalchemy.orm import Session
+
+from conftest import ROOT_PATH, SQL_PATH
+from groceries.db import Base, get_engine, populate
+from groceries.db.generate import generate_setup
+from groceries.price_book import create_price_book, read_price_book
+from groceries.shopping_list import generate_shopping_list
+
+pytestmark = pytest.mark.benchmark
+
+# number of items and stores of each scale
+SCALES = {
+    "small": {"n_items": 100, "n_stores": 5},
+    "medium": {"n_items": 1_000, "n_stores": 10},
+    "large": {"n_items": 10_000, "n_stores": 30},
+}
+
+PIPELINES = ["populate", "export-price-book", "import-price-book", "shopping-list"]
+
+# number of runs of each scale, each on a new database. The best time is kept
+REPEAT = 3
+
+RESULTS_PATH = ROOT_PATH / "benchmarks.jsonl"
+
+
+def __time(timings, name, func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    timings[name] = min(timings.get(name, elapsed), elapsed)
+
+
+def __run_once(path, timings):
+    engine = get_engine(f"sqlite:///{path / 'benchmark.db'}")
+    Base.metadata.create_all(engine)
+    try:
+        with Session(bind=engine) as session:
+            __time(timings, "populate", populate.initial_populate, path, session)
+
+            price_book = path / "price_book.xlsx"
+            __time(timings, "export-price-book", create_price_book, session, price_book)
+
+            __time(timings, "import-price-book", read_price_book, price_book, session)
+            session.commit()
+
+            shopping_list = path / "shopping_list.xlsx"
+            for _ in range(2):
+                # the second list is compared to the first, so the changes are timed
+                __time(
+                    timings,
+                    "shopping-list",
+                    generate_shopping_list,
+                    output_path=shopping_list,
+                    changed_path=path / "changed.xlsx",
+                    sql_path=SQL_PATH / "shopping_list.sql",
+                    session=session,
+                    force=True,
+                )
+    finally:
+        engine.dispose()
+
+
+def __previous(scale):
+    """the previous result of a scale, or None"""
+    if not RESULTS_PATH.exists():
+        return None
+    with open(RESULTS_PATH, "r") as f:
+        results = [json.loads(line) for line in f if line.strip()]
+    results = [result for result in results if result.get("scale") == scale]
+    return results[-1] if results else None
+
+
+def __report(result, previous=None):
+    lines = [f"\n{'scale':8} {'pipeline':18} {'prices':>8} {'seconds':>9}"]
+    for pipeline in PIPELINES:
+        seconds = result["seconds"][pipeline]
+        line = f"{result['scale']:8} {pipeline:18} {result['prices']:8d} {seconds:9.3f}"
+        if previous is not None:
+            before = previous["seconds"][pipeline]
+            line += f"   was {before:9.3f} ({seconds / before:.2f}x)"
+        lines.append(line)
+    if previous is not None:
+        lines.append(f"compared to the run at {previous['time']}")
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize("scale", list(SCALES))
+def test_benchmark(scale, tmp_path, capsys):
+    timings = {}
+    for k in range(REPEAT):
+        path = tmp_path / f"run {k}"
+        counts = generate_setup(path, seed=0, **SCALES[scale])
+        __run_once(path, timings)
+    assert list(timings) == PIPELINES
+
+    result = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "repeat": REPEAT,
+        "scale": scale,
+        **counts,
+        "seconds": timings,
+    }
+    previous = __previous(scale)
+    with open(RESULTS_PATH, "a") as f:
+        f.write(json.dumps(result) + "\n")
+    with capsys.disabled():
+        print(__report(result, previous))
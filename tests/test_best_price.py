@@ -0,0 +1,120 @@
+import pandas as pd
+import pytest
+
+from sqlalchemy import delete, insert, text, update
+
+from conftest import SQL_PATH
+from groceries.db import models, populate
+from groceries.db.migrate import migrate
+from groceries.db.models import best_price
+from groceries.shopping_list import get_shopping_list
+
+PRICE = models.Price.__table__
+
+
+def __best_prices(connection):
+    df = pd.DataFrame(
+        connection.exec_driver_sql("SELECT ItemID, StoreID, Price FROM BestPrices"),
+        columns=["item_id", "store_id", "price"],
+    )
+    return df.sort_values("item_id").reset_index(drop=True)
+
+
+def __check(session):
+    """the table maintained by the triggers matches the table rebuilt from scratch"""
+    session.commit()
+    connection = session.connection()
+    maintained = __best_prices(connection)
+    best_price.rebuild(connection)
+    pd.testing.assert_frame_equal(maintained, __best_prices(connection))
+    session.rollback()
+    return maintained
+
+
+def test_populate_installs_the_triggers(populated):
+    assert best_price.is_installed(populated.connection())
+    names = populated.connection().exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+    )
+    assert set(best_price.TRIGGERS) <= set(names.scalars())
+    assert len(__check(populated)) > 0
+
+
+def test_failed_populate_restores_the_triggers(session, setup_path):
+    (setup_path / "prices.csv").unlink()
+    with pytest.raises(FileNotFoundError):
+        populate.initial_populate(setup_path, session)
+
+    connection = session.connection()
+    assert set(best_price.TRIGGERS) <= set(
+        connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+        ).scalars()
+    )
+    # the items were committed before the failure
+    assert connection.exec_driver_sql("SELECT count(*) FROM Items").scalar() > 0
+
+
+def test_triggers_follow_price_changes(populated):
+    rows = populated.connection().exec_driver_sql(
+        "SELECT StoreID, ItemID FROM Prices WHERE Price IS NOT NULL LIMIT 3"
+    )
+    (s1, i1), (s2, i2), (s3, i3) = rows.all()
+
+    populated.execute(
+        update(PRICE)
+        .where(PRICE.c.StoreID == s1, PRICE.c.ItemID == i1)
+        .values(Price=0.01)
+    )
+    populated.execute(delete(PRICE).where(PRICE.c.StoreID == s2, PRICE.c.ItemID == i2))
+    populated.execute(
+        update(PRICE)
+        .where(PRICE.c.StoreID == s3, PRICE.c.ItemID == i3)
+        .values(PreferenceTypeID=3)
+    )
+    maintained = __check(populated)
+    assert maintained.loc[maintained["item_id"] == i1, "price"].item() == 0.01
+
+    # a new cheapest price
+    store_id = 1 if s1 != 1 else 2
+    populated.execute(
+        delete(PRICE).where(PRICE.c.StoreID == store_id, PRICE.c.ItemID == i1)
+    )
+    populated.execute(
+        insert(PRICE).values(
+            StoreID=store_id, ItemID=i1, PreferenceTypeID=1, Price=0.001
+        )
+    )
+    __check(populated)
+
+
+def test_triggers_follow_item_and_store_changes(populated):
+    populated.execute(text("UPDATE Items SET Active = 0 WHERE ItemID = 1"))
+    populated.execute(text("UPDATE Items SET PreferredStoreID = 2 WHERE ItemID = 2"))
+    populated.execute(text("DELETE FROM Prices WHERE ItemID = 3"))
+    populated.execute(text("DELETE FROM Items WHERE ItemID = 3"))
+    populated.execute(text("UPDATE Stores SET Active = 0 WHERE StoreID = 1"))
+    maintained = __check(populated)
+    assert 1 not in maintained["item_id"].tolist()
+    assert 1 not in maintained["store_id"].tolist()
+
+    populated.execute(
+        text("UPDATE PreferenceTypes SET ShortType = 'X' WHERE TypeID = 1")
+    )
+    __check(populated)
+
+
+def test_shopping_list_requires_a_migration(populated):
+    connection = populated.connection()
+    best_price.drop_triggers(connection)
+    connection.exec_driver_sql("DROP TABLE BestPrices")
+    populated.commit()
+
+    with pytest.raises(RuntimeError, match="migrate"):
+        get_shopping_list(SQL_PATH / "shopping_list.sql", populated)
+    # reading the shopping list does not change the schema
+    assert not best_price.is_installed(populated.connection())
+
+    migrate(populated.get_bind())
+    df = get_shopping_list(SQL_PATH / "shopping_list.sql", populated)
+    assert len(df) == len(__check(populated))
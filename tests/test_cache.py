@@ -0,0 +1,83 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from conftest import SQL_PATH
+from groceries import cache
+from groceries.db import models
+from groceries.price_book import create_price_book
+from groceries.shopping_list import generate_shopping_list
+
+
+@pytest.fixture
+def sql_path(tmp_path):
+    path = tmp_path / "shopping_list.sql"
+    shutil.copy(SQL_PATH / "shopping_list.sql", path)
+    return path
+
+
+def __generate(session, tmp_path, sql_path):
+    return generate_shopping_list(
+        output_path=tmp_path / "shopping_list.csv",
+        changed_path=tmp_path / "changed.csv",
+        sql_path=sql_path,
+        session=session,
+    )
+
+
+def test_revision_changes_on_write(populated):
+    before = cache.db_revision(populated)
+    price = populated.query(models.Price).first()
+    price.price += 1
+    populated.commit()
+
+    after = cache.db_revision(populated)
+    assert after["Prices"] > before["Prices"]
+    assert after["Items"] == before["Items"]
+
+
+def test_up_to_date_price_book_is_not_exported(populated, tmp_path):
+    path = tmp_path / "price_book.csv"
+    exported = create_price_book(populated, path)
+    mtime = os.stat(path).st_mtime_ns
+
+    cached = create_price_book(populated, path)
+    assert os.stat(path).st_mtime_ns == mtime
+    pd.testing.assert_frame_equal(cached, exported)
+
+
+def test_price_book_is_exported_after_a_write(populated, tmp_path):
+    path = tmp_path / "price_book.csv"
+    create_price_book(populated, path)
+    revision = cache.db_revision(populated)
+    exported = path.read_text()
+    os.utime(path, ns=(0, 0))
+
+    price = populated.query(models.Price).first()
+    price.price += 1
+    populated.commit()
+
+    create_price_book(populated, path)
+    new_revision = {**cache.db_revision(populated), "as_of": None}
+    assert new_revision != {**revision, "as_of": None}
+    assert path.stat().st_mtime_ns != 0
+    assert path.read_text() != exported
+    assert cache.is_current(path, "export", new_revision)
+
+
+def test_up_to_date_shopping_list_is_skipped(populated, tmp_path, sql_path):
+    assert __generate(populated, tmp_path, sql_path) is not None
+    assert __generate(populated, tmp_path, sql_path) is None
+
+
+def test_shopping_list_is_generated_after_the_query_changed(
+    populated, tmp_path, sql_path
+):
+    __generate(populated, tmp_path, sql_path)
+    sql_path.write_text(sql_path.read_text() + "\nwhere B.Price < 10\n")
+
+    df = __generate(populated, tmp_path, sql_path)
+    assert df is not None
+    assert (df["price"] < 10).all()
@@ -0,0 +1,60 @@
+import logging
+
+import pytest
+
+from sqlalchemy import func, select
+
+from conftest import load_price_book, N_ITEMS, ROOT_PATH
+from groceries import cli
+from groceries.db import get_session, models
+
+
+@pytest.fixture
+def main():
+    """run the CLI, removing the log handler it adds when it is done"""
+    logger = logging.getLogger("groceries")
+    handlers = list(logger.handlers)
+    level = logger.level
+    yield cli.main
+    for handler in set(logger.handlers) - set(handlers):
+        logger.removeHandler(handler)
+    logger.setLevel(level)
+
+
+@pytest.fixture
+def database(tmp_path):
+    return f"sqlite:///{tmp_path / 'cli.db'}"
+
+
+def test_startup_does_not_import_heavy_modules(monkeypatch):
+    # the budget is generous, only the imports are checked on a busy test machine
+    monkeypatch.chdir(ROOT_PATH)
+    cli.check_startup(budget=10, repeat=1)
+
+
+def test_help(main, capsys):
+    with pytest.raises(SystemExit) as exc:
+        main(["--help"])
+    assert exc.value.code == 0
+    assert "populate" in capsys.readouterr().out
+
+
+def test_unknown_command(main):
+    with pytest.raises(SystemExit) as exc:
+        main(["unknown"])
+    assert exc.value.code == 2
+
+
+def test_populate_and_price_book(main, database, setup_path, tmp_path):
+    assert not main(["--database", database, "populate", "--recreate", str(setup_path)])
+    assert not main(["--database", database, "migrate"])
+
+    session = get_session(database)
+    n_items = session.scalar(select(func.count()).select_from(models.Item))
+    assert n_items == N_ITEMS
+
+    path = tmp_path / "price_book.csv"
+    assert not main(["--database", database, "export-price-book", str(path)])
+    assert len(load_price_book(path)) == N_ITEMS
+    assert not main(["--database", database, "import-price-book", str(path)])
+    session.remove()
@@ -0,0 +1,59 @@
+import numpy as np
+
+from groceries.db import models
+from groceries.db.reference import get_reference
+from groceries.price_book import create_price_book
+
+
+def test_one_row_per_item_and_one_column_per_active_store(populated):
+    price_book = create_price_book(populated, None)
+    reference = get_reference(populated)
+
+    n_items = populated.query(models.Item).count()
+    assert len(price_book) == n_items
+    assert price_book["item_id"].is_unique
+    assert list(price_book.columns) == [
+        "item_id",
+        "category",
+        "description",
+        "pref_store",
+        *reference.active_store_names,
+    ]
+
+
+def test_cells_match_the_prices(populated):
+    price_book = create_price_book(populated, None).set_index("item_id")
+    reference = get_reference(populated)
+
+    n_prices = 0
+    for price in populated.query(models.Price):
+        if not price.store.active:
+            continue
+        n_prices += 1
+        cell = price_book.loc[price.item.item_id, price.store.name]
+        short = price.preference.short
+        if short == "S":
+            assert cell == price.price
+        else:
+            assert cell == short
+
+    stores = reference.active_store_names
+    assert price_book[stores].notnull().to_numpy().sum() == n_prices
+
+
+def test_description_includes_the_unit(populated):
+    price_book = create_price_book(populated, None).set_index("item_id")
+
+    for item in populated.query(models.Item):
+        description = price_book.loc[item.item_id, "description"]
+        if item.unit is None:
+            assert description == item.description
+        else:
+            assert description == f"{item.description} (per {item.unit.unit})"
+
+
+def test_sorted_by_category_and_description(populated):
+    price_book = create_price_book(populated, None)
+    keys = list(zip(price_book["category"], price_book["description"]))
+    assert keys == sorted(keys)
+    assert np.all(price_book["category"].notnull())
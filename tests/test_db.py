@@ -0,0 +1,52 @@
+import threading
+
+from sqlalchemy import text
+
+from groceries import db
+
+
+def test_engines_and_sessions_are_shared_per_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'shared.db'}"
+    assert db.get_engine(url) is db.get_engine(url)
+    assert db.get_engine(url) is not db.get_engine(f"sqlite:///{tmp_path / 'other.db'}")
+
+    session = db.get_session(url)
+    assert session is db.get_session(url)
+    assert session.get_bind() is db.get_engine(url)
+    session.remove()
+
+
+def test_database_url_from_the_environment(monkeypatch, tmp_path):
+    url = f"sqlite:///{tmp_path / 'environment.db'}"
+    monkeypatch.delenv(db.DATABASE_URL_ENV, raising=False)
+    assert db.database_url() == db.DATABASE_URI
+
+    monkeypatch.setenv(db.DATABASE_URL_ENV, url)
+    assert db.database_url() == url
+    assert db.database_url(tmp_path) == str(tmp_path)
+    assert str(db.get_engine().url) == url
+
+
+def test_sqlite_pragmas(engine):
+    with engine.connect() as connection:
+        assert connection.scalar(text("PRAGMA journal_mode")) == "wal"
+        # NORMAL
+        assert connection.scalar(text("PRAGMA synchronous")) == 1
+        # MEMORY
+        assert connection.scalar(text("PRAGMA temp_store")) == 2
+        assert connection.scalar(text("PRAGMA cache_size")) == -64 * 1024
+
+
+def test_each_thread_has_its_own_session(tmp_path):
+    scoped = db.get_session(f"sqlite:///{tmp_path / 'threads.db'}")
+    sessions = []
+
+    def run():
+        sessions.append(scoped())
+        scoped.remove()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    assert sessions[0] is not scoped()
+    scoped.remove()
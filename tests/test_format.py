@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from openpyxl import load_workbook, Workbook
+
+from groceries import format
+
+
+def test_column_widths():
+    df = pd.DataFrame(
+        {"description": ["a", "a much longer description", None], "p": [1.5, 2.25, 3]}
+    )
+    widths = format.column_widths(df)
+    assert widths == [len("a much longer description") + 1, format.STANDARD_WIDTH]
+
+    # the header is included, unless it is not written
+    df = df[["p"]].rename(columns={"p": "x" * 20})
+    assert format.column_widths(df) == [21]
+    assert format.column_widths(df, header=False) == [format.STANDARD_WIDTH]
+
+
+def test_number_format_is_set_on_the_column_and_its_cells(tmp_path):
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.append(["price", "description"])
+    for k in range(100):
+        worksheet.append([k / 100, "item"])
+
+    format.number_format(worksheet, "A", format_="Accounting")
+    path = tmp_path / "book.xlsx"
+    workbook.save(path)
+
+    worksheet = load_workbook(path).active
+    assert worksheet.column_dimensions["A"].number_format == format.ACCOUNTING
+    cells = [cell for (cell,) in worksheet.iter_rows(min_row=2, max_col=1)]
+    assert {cell.number_format for cell in cells} == {format.ACCOUNTING}
+    # every cell shares the same style
+    assert len({cell.style_id for cell in cells}) == 1
+    assert worksheet["B2"].number_format == "General"
+
+
+def test_format_workbook(tmp_path):
+    path = tmp_path / "book.xlsx"
+    df = pd.DataFrame({"description": ["item with a long name"], "price": [np.pi]})
+    df.to_excel(path, index=False)
+
+    format.format_workbook(path, column_letters="B", format_="0.000")
+
+    worksheet = load_workbook(path).active
+    assert worksheet.column_dimensions["A"].width == len("item with a long name") + 1
+    assert worksheet.column_dimensions["B"].number_format == "0.000"
+    assert worksheet["B2"].number_format == "0.000"
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from groceries.db.generate import generate_setup
+
+
+def test_generated_setup(tmp_path):
+    counts = generate_setup(tmp_path, n_items=50, n_stores=6, n_categories=3, seed=1)
+    assert counts["items"] == 50
+
+    prices = pd.read_csv(tmp_path / "prices.csv", dtype=str, keep_default_na=False)
+    assert len(prices) == 50
+    assert len(prices.columns) == 2 + 6
+    cells = prices.iloc[:, 2:].to_numpy()
+    assert (cells != "").sum() == counts["prices"]
+    # every cell is a price, a preference type or blank
+    assert set(cells[~np.char.startswith(cells.astype(str), "$")]) <= {"", "P", "NP"}
+
+    stores = pd.read_csv(tmp_path / "base items" / "stores.csv")
+    assert stores["active"].tolist() == [True] * 5 + [False]
+
+
+def test_generated_setup_is_repeatable(tmp_path):
+    generate_setup(tmp_path / "a", seed=2)
+    generate_setup(tmp_path / "b", seed=2)
+    for name in ["items.csv", "prices.csv"]:
+        assert (tmp_path / "a" / name).read_text() == (
+            tmp_path / "b" / name
+        ).read_text()
+
+
+def test_densities_over_one(tmp_path):
+    with pytest.raises(ValueError):
+        generate_setup(tmp_path, preferred_density=0.5, blank_density=0.6)
@@ -0,0 +1,128 @@
+import time
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from sqlalchemy import inspect, select, text
+
+from conftest import read_prices
+from groceries.db import history, models
+from groceries.db.migrate import migrate
+
+
+def __prices_as_of(session, as_of):
+    table = history.prices_as_of(as_of)
+    query = select(
+        table.c.StoreID, table.c.ItemID, table.c.PreferenceTypeID, table.c.Price
+    )
+    df = pd.DataFrame(
+        session.execute(query).all(),
+        columns=["store_id", "item_id", "pt_id", "price"],
+    )
+    return df.set_index(["store_id", "item_id"]).sort_index()
+
+
+def __priced(session):
+    """query of the prices with a price value"""
+    return session.query(models.Price).filter(models.Price.price.is_not(None))
+
+
+def test_every_change_is_recorded(populated):
+    price = __priced(populated).first()
+    store_id, item_id, old_price = price.store_id, price.item_id, price.price
+    before = datetime.now()
+
+    price.price = old_price + 1
+    populated.commit()
+    assert history.price_at(populated, store_id, item_id).price == old_price + 1
+    assert history.price_at(populated, store_id, item_id, before).price == old_price
+
+    populated.delete(price)
+    populated.commit()
+    removed = history.price_at(populated, store_id, item_id)
+    assert removed.price is None and removed.preference is None
+
+
+def test_plain_update_is_observed_now(populated):
+    price = __priced(populated).first()
+    store_id, item_id, old_price = price.store_id, price.item_id, price.price
+    observed_at = price.observed_at
+    before = datetime.now()
+    # SQLite records the current time in milliseconds
+    time.sleep(0.002)
+
+    populated.execute(
+        text(
+            "UPDATE Prices SET Price = :price "
+            "WHERE StoreID = :store_id AND ItemID = :item_id"
+        ),
+        {"price": old_price + 1, "store_id": store_id, "item_id": item_id},
+    )
+    populated.commit()
+
+    latest = history.price_at(populated, store_id, item_id)
+    assert latest.price == old_price + 1
+    assert latest.observed_at >= before > observed_at
+    assert history.price_at(populated, store_id, item_id, before).price == old_price
+
+
+def test_prices_as_of(populated):
+    before = datetime.now()
+    current = read_prices(populated)
+    pd.testing.assert_frame_equal(__prices_as_of(populated, before), current)
+
+    for price in __priced(populated).limit(3):
+        price.price += 1
+    populated.delete(
+        populated.query(models.Price).order_by(text("PriceID desc")).first()
+    )
+    populated.commit()
+
+    pd.testing.assert_frame_equal(__prices_as_of(populated, before), current)
+    pd.testing.assert_frame_equal(
+        __prices_as_of(populated, datetime.now()), read_prices(populated)
+    )
+    assert __prices_as_of(populated, before - timedelta(days=1)).empty
+
+
+@pytest.fixture
+def old_database(populated, engine):
+    """a populated database, as it was before the price history was added"""
+    populated.close()
+    with engine.begin() as connection:
+        for name in models.price_history.TRIGGERS:
+            connection.exec_driver_sql(f'DROP TRIGGER "{name}"')
+        connection.exec_driver_sql('DROP TABLE "PriceHistory"')
+        connection.exec_driver_sql('ALTER TABLE "Prices" DROP COLUMN "ObservedAt"')
+        connection.exec_driver_sql('ALTER TABLE "Prices" DROP COLUMN "Note"')
+    return engine
+
+
+def test_migrate_keeps_the_data(old_database, session):
+    before = read_prices(session)
+    session.close()
+
+    changes = migrate(old_database)
+    assert changes["created"] == ["PriceHistory"]
+    assert changes["columns"] == {"Prices": ["ObservedAt", "Note"]}
+
+    columns = {c["name"] for c in inspect(old_database).get_columns("Prices")}
+    assert {"ObservedAt", "Note"} <= columns
+    pd.testing.assert_frame_equal(read_prices(session), before)
+
+    # the history starts with the current prices, and records any change
+    pd.testing.assert_frame_equal(__prices_as_of(session, datetime.now()), before)
+    price = __priced(session).first()
+    assert price.observed_at is not None
+    price.price += 1
+    session.commit()
+    assert history.price_at(session, price.store_id, price.item_id).price == price.price
+
+
+def test_migrate_up_to_date_database(populated, engine):
+    before = read_prices(populated)
+    populated.close()
+    assert migrate(engine) == {"created": [], "columns": {}}
+    pd.testing.assert_frame_equal(read_prices(populated), before)
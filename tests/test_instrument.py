@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from sqlalchemy import text
+
+from groceries import instrument
+
+
+@pytest.fixture
+def connection(engine):
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE Numbers (Number INTEGER)"))
+        yield connection
+
+
+def test_rows_written_and_read(connection):
+    with instrument.stage("stage") as metrics:
+        connection.execute(text("INSERT INTO Numbers VALUES (1), (2), (3)"))
+        assert len(connection.execute(text("SELECT * FROM Numbers")).all()) == 3
+        result = connection.execute(text("SELECT * FROM Numbers"))
+        result.fetchone()
+        result.fetchmany(1)
+        result.close()
+
+    assert metrics.queries == 3
+    assert metrics.rows_written == 3
+    assert metrics.rows_read == 5
+    assert metrics.statements["SELECT * FROM Numbers"] == 2
+
+
+def test_nested_stages(connection):
+    with instrument.stage("outer") as outer:
+        connection.execute(text("SELECT 1")).all()
+        with instrument.stage("inner") as inner:
+            connection.execute(text("SELECT 1")).all()
+    assert (outer.queries, outer.rows_read) == (2, 2)
+    assert (inner.queries, inner.rows_read) == (1, 1)
+
+
+def test_metrics_file(connection, tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    with instrument.stage("first", metrics_path=path):
+        connection.execute(text("SELECT 1")).all()
+    with instrument.stage("second", metrics_path=path):
+        pass
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record["name"] for record in records] == ["first", "second"]
+    assert records[0]["queries"] == 1
+    assert records[0]["rows_read"] == 1
+    assert "statements" not in records[0]
+
+
+def test_query_budget(connection):
+    with instrument.query_budget(2):
+        connection.execute(text("SELECT 1"))
+        connection.execute(text("SELECT 1"))
+
+    with pytest.raises(instrument.QueryBudgetError, match="2x SELECT 1"):
+        with instrument.query_budget(1):
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT 1"))
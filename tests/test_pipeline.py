@@ -0,0 +1,146 @@
+import dataclasses
+import importlib.util
+import logging
+import threading
+import time
+
+import pytest
+
+from conftest import ROOT_PATH
+from groceries.pipeline import run_pipeline, select_stages, Stage
+
+
+class Recorder:
+    """record the start and end of each stage, in the order they happened"""
+
+    def __init__(self):
+        self.events = []
+        self.lock = threading.Lock()
+
+    def __call__(self, name, seconds=0.01, fail=False):
+        def func():
+            with self.lock:
+                self.events.append(("start", name))
+            time.sleep(seconds)
+            with self.lock:
+                self.events.append(("end", name))
+            if fail:
+                raise RuntimeError(name)
+
+        return func
+
+    def index(self, event, name):
+        return self.events.index((event, name))
+
+    def started(self):
+        return [name for event, name in self.events if event == "start"]
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    """the `main` script, with the log file in a temporary directory"""
+    monkeypatch.chdir(tmp_path)
+    logger = logging.getLogger("groceries")
+    handlers = list(logger.handlers)
+
+    spec = importlib.util.spec_from_file_location("main", ROOT_PATH / "main.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    yield module
+
+    for handler in set(logger.handlers) - set(handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def __recorded(stages, recorder):
+    return [dataclasses.replace(stage, func=recorder(stage.name)) for stage in stages]
+
+
+def test_independent_stages_run_concurrently():
+    recorder = Recorder()
+    stages = [
+        Stage("a", recorder("a", 0.2), provides=("a",)),
+        Stage("b", recorder("b", 0.2), provides=("b",)),
+        Stage("c", recorder("c"), requires=("a", "b")),
+    ]
+    timings = run_pipeline(stages)
+    assert set(timings) == {"a", "b", "c"}
+    assert recorder.index("start", "b") < recorder.index("end", "a")
+    assert recorder.index("start", "c") > recorder.index("end", "b")
+
+
+def test_serial_stages_never_overlap():
+    recorder = Recorder()
+    stages = [
+        Stage(name, recorder(name, 0.05), serial=True) for name in ["a", "b", "c"]
+    ]
+    run_pipeline(stages)
+    assert recorder.events == [
+        (event, name) for name in ["a", "b", "c"] for event in ["start", "end"]
+    ]
+
+
+def test_failed_stage_stops_the_pipeline():
+    recorder = Recorder()
+    stages = [
+        Stage("a", recorder("a", fail=True), provides=("a",)),
+        Stage("b", recorder("b"), requires=("a",)),
+    ]
+    with pytest.raises(RuntimeError, match="a"):
+        run_pipeline(stages)
+    assert recorder.started() == ["a"]
+
+
+def test_stages_that_can_never_run():
+    stages = [Stage("a", None, requires=("missing",))]
+    with pytest.raises(ValueError, match="can never run"):
+        run_pipeline(stages)
+    with pytest.raises(ValueError, match="duplicate"):
+        run_pipeline([Stage("a", None), Stage("a", None)])
+    with pytest.raises(ValueError, match="unknown stages"):
+        select_stages(stages, ["b"])
+
+
+def test_skipped_stages_provide_their_outputs():
+    stages = [
+        Stage("a", None, provides=("a",)),
+        Stage("b", None, requires=("a",), provides=("b",)),
+    ]
+    selected, available = select_stages(stages, ["b"])
+    assert [stage.name for stage in selected] == ["b"]
+    assert available == {"a"}
+
+
+def test_main_price_book_round_trip(main):
+    recorder = Recorder()
+    stages, available = select_stages(
+        __recorded(main.STAGES, recorder), ["create-price-book", "read-price-book"]
+    )
+    run_pipeline(stages, available=available)
+    assert recorder.started() == ["create-price-book", "read-price-book"]
+
+
+def test_main_full_run_order(main):
+    recorder = Recorder()
+    stages = __recorded(main.STAGES, recorder)
+    run_pipeline(stages)
+
+    read = recorder.index("end", "read-price-book")
+    for name in ["shopping-list", "snapshot"]:
+        assert recorder.index("start", name) > read
+    assert recorder.index("start", "read-price-book") > recorder.index(
+        "end", "create-price-book"
+    )
+    assert recorder.index("start", "store-sheets") > recorder.index(
+        "end", "shopping-list"
+    )
+
+
+def test_main_default_stages(main):
+    recorder = Recorder()
+    stages, available = select_stages(
+        __recorded(main.STAGES, recorder), main.DEFAULT_STAGES
+    )
+    run_pipeline(stages, available=available)
+    assert recorder.started()[0] == "read-price-book"
@@ -0,0 +1,43 @@
+import pytest
+
+from sqlalchemy import inspect
+
+from conftest import SQL_PATH
+from groceries.db import plans
+
+
+def test_shipped_queries_use_indexes(session):
+    plans.check_query_plans(SQL_PATH, session=session)
+
+
+def test_shipped_queries_on_the_declared_schema():
+    plans.check_query_plans(SQL_PATH)
+
+
+def test_as_of_query_takes_a_parameter():
+    queries = plans.shipped_queries(SQL_PATH)
+    assert set(queries["price_matrix_as_of"].compile().params) == {"as_of"}
+
+
+def test_full_scan_is_found(session):
+    sql = "SELECT * FROM Prices AS P WHERE P.Price > 1"
+    assert plans.full_scans(session, sql) == ["SCAN P"]
+    with pytest.raises(plans.QueryPlanError):
+        plans.check_query_plans(SQL_PATH, session=session, table="Items")
+
+
+def test_foreign_keys_are_indexed(engine):
+    inspector = inspect(engine)
+    for table in ["Items", "Prices"]:
+        indexed = {
+            column
+            for index in inspector.get_indexes(table)
+            for column in index["column_names"][:1]
+        }
+        indexed |= {
+            constraint["column_names"][0]
+            for constraint in inspector.get_unique_constraints(table)
+        }
+        for foreign_key in inspector.get_foreign_keys(table):
+            column = foreign_key["constrained_columns"][0]
+            assert column in indexed, f"{table}.{column} is not indexed"
@@ -0,0 +1,56 @@
+import pandas as pd
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from conftest import N_ITEMS, N_STORES, read_prices
+from groceries.db import Base, get_engine, models, populate
+
+
+def __count(session, model):
+    return session.scalar(select(func.count()).select_from(model))
+
+
+def test_populate_matches_the_setup(populated, setup_path):
+    assert __count(populated, models.Item) == N_ITEMS
+    assert __count(populated, models.Store) == N_STORES
+
+    # item IDs follow the order of items.csv
+    items = pd.read_csv(setup_path / "items.csv")
+    descriptions = populated.scalars(
+        select(models.Item.description).order_by(models.Item.item_id)
+    ).all()
+    assert descriptions == items["description"].tolist()
+
+    cells = pd.read_csv(setup_path / "prices.csv", dtype=str, keep_default_na=False)
+    cells = cells.iloc[:, 2:].to_numpy()
+    assert len(read_prices(populated)) == (cells != "").sum()
+
+
+def test_chunk_size_does_not_change_the_result(session, setup_path, tmp_path):
+    populate.initial_populate(setup_path, session)
+
+    engine = get_engine(f"sqlite:///{tmp_path / 'chunked.db'}")
+    Base.metadata.create_all(engine)
+    with Session(bind=engine) as chunked:
+        populate.initial_populate(setup_path, chunked, chunk_size=7)
+        pd.testing.assert_frame_equal(read_prices(chunked), read_prices(session))
+    engine.dispose()
+
+
+def test_unknown_items_and_stores_are_skipped(populated, tmp_path, caplog):
+    path = tmp_path / "prices.csv"
+    pd.DataFrame(
+        {
+            "index": [0, 1],
+            "item": ["unknown", "item 0"],
+            "store 0": ["1", ""],
+            "no store": ["1", "2"],
+        }
+    ).to_csv(path, index=False)
+
+    before = read_prices(populated)
+    populate.populate_prices(path, populated)
+    pd.testing.assert_frame_equal(read_prices(populated), before.drop((1, 1)))
+    assert "unknown items: ['unknown']" in caplog.text
+    assert "unknown stores: ['no store']" in caplog.text
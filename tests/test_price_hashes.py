@@ -0,0 +1,122 @@
+import pandas as pd
+import pytest
+
+from sqlalchemy import delete, func, insert, select, update
+
+from conftest import load_price_book, N_ITEMS, N_STORES, read_prices
+from groceries import tabular
+from groceries.db import models, populate
+from groceries.db.models import price_hash
+from groceries.price_book import create_price_book, read_price_book
+
+
+@pytest.fixture
+def prices_path(setup_path):
+    return setup_path / "prices.csv"
+
+
+def __import(session, path):
+    counts = populate.populate_prices(path, session)
+    return counts["written"], counts["deleted"]
+
+
+def __n_hashes(session):
+    return session.scalar(select(func.count()).select_from(models.PriceHash))
+
+
+def __drop_triggers(session):
+    for name in price_hash.TRIGGERS:
+        session.connection().exec_driver_sql(f'DROP TRIGGER "{name}"')
+
+
+def test_unchanged_file_writes_nothing(populated, prices_path):
+    before = read_prices(populated)
+    assert __import(populated, prices_path) == (0, 0)
+    pd.testing.assert_frame_equal(read_prices(populated), before)
+
+
+def test_only_edited_cells_are_written(populated, prices_path):
+    df = pd.read_csv(prices_path, dtype=str, keep_default_na=False)
+    store = df.columns[2]
+    priced = df.index[df[store].str.startswith("$")]
+    df.loc[priced[0], store] = "$99.99"
+    df.loc[priced[1], store] = ""
+    df.to_csv(prices_path, index=False)
+
+    assert __import(populated, prices_path) == (1, 1)
+    assert __import(populated, prices_path) == (0, 0)
+
+
+def test_prices_written_elsewhere_are_imported_again(populated, prices_path):
+    before = read_prices(populated)
+    store_id, item_id = map(int, before.index[0])
+    table = models.Price.__table__
+    populated.execute(
+        update(table)
+        .where(table.c.StoreID == store_id, table.c.ItemID == item_id)
+        .values(Price=before["price"].max() + 1)
+    )
+    populated.commit()
+
+    assert __import(populated, prices_path) == (1, 0)
+    pd.testing.assert_frame_equal(read_prices(populated), before)
+
+
+def test_price_book_edits_are_imported_again(populated, prices_path, tmp_path):
+    before = read_prices(populated)
+    path = tmp_path / "price_book.csv"
+    create_price_book(populated, path)
+    df = load_price_book(path)
+    store = [column for column in df.columns if (df[column] == "").any()][-1]
+    df.loc[df.index[df[store] == ""][0], store] = 1.23
+    tabular.write_table(path, df)
+    read_price_book(path, populated)
+    populated.commit()
+    assert len(read_prices(populated)) == len(before) + 1
+
+    # the cell is blank in the prices file, so the new price is deleted
+    assert __import(populated, prices_path) == (0, 1)
+    pd.testing.assert_frame_equal(read_prices(populated), before)
+
+
+def test_database_populated_before_the_hashes(populated, prices_path):
+    before = read_prices(populated)
+    __drop_triggers(populated)
+    models.PriceHash.__table__.drop(populated.connection())
+    # a price of a cell that is blank in the prices file
+    store_id, item_id = next(
+        (store_id, item_id)
+        for store_id in range(1, 4)
+        for item_id in range(1, 41)
+        if (store_id, item_id) not in before.index
+    )
+    populated.execute(
+        insert(models.Price.__table__).values(
+            StoreID=store_id, ItemID=item_id, PreferenceTypeID=1, Price=1.0
+        )
+    )
+    populated.commit()
+
+    written, deleted = __import(populated, prices_path)
+    assert (written, deleted) == (len(before), N_ITEMS * N_STORES - len(before))
+    pd.testing.assert_frame_equal(read_prices(populated), before)
+    assert price_hash.is_installed(populated.connection())
+    assert __import(populated, prices_path) == (0, 0)
+
+
+def test_hashes_are_cleared_when_the_triggers_were_missing(populated, prices_path):
+    before = read_prices(populated)
+    __drop_triggers(populated)
+    # written without invalidating its hash
+    table = models.Price.__table__
+    store_id, item_id = map(int, before.index[0])
+    populated.execute(
+        delete(table).where(table.c.StoreID == store_id, table.c.ItemID == item_id)
+    )
+    populated.commit()
+    assert __n_hashes(populated) > 0
+
+    price_hash.install_triggers(populated.connection())
+    assert __n_hashes(populated) == 0
+    __import(populated, prices_path)
+    pd.testing.assert_frame_equal(read_prices(populated), before)
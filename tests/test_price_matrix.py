@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from sqlalchemy import func, select, update
+
+from conftest import read_prices
+from groceries.db import models
+from groceries.price_book import create_price_book, read_price_book
+from groceries.price_matrix import NO_PRICE, PriceMatrix
+
+STORES = {"a": 10, "b": 20}
+
+
+def __matrix(prices):
+    items = pd.DataFrame(
+        {
+            "item_id": [1, 2, 3],
+            "category": "category",
+            "description": ["apples", "milk", "bread"],
+            "unit": None,
+            "pref_store_id": [None, 20, 30],
+            "pref_store": None,
+            "active": True,
+        }
+    )
+    return PriceMatrix.from_prices(items, prices, STORES, ["S", "P", "NP"])
+
+
+def __prices(rows):
+    return pd.DataFrame(rows, columns=["item_id", "store_id", "pt", "price"])
+
+
+def test_from_prices():
+    matrix = __matrix(
+        __prices(
+            [
+                (1, 10, None, 12345.678),
+                (1, 20, "S", 100000.01),
+                (2, 20, "P", None),
+                # unknown stores and items are ignored
+                (2, 30, "S", 1.0),
+                (4, 10, "S", 1.0),
+            ]
+        )
+    )
+    assert matrix.shape == (3, 2)
+    assert matrix.price(1, "a") == 12345.678
+    assert matrix.price(1, 20) == 100000.01
+    assert np.isnan(matrix.price(2, "b"))
+    assert matrix.preferences.tolist() == [[0, 0], [NO_PRICE, 1], [NO_PRICE] * 2]
+    assert matrix.item_prices(1).tolist() == [12345.678, 100000.01]
+    assert matrix.store_prices("a").index.tolist() == [1, 2, 3]
+
+
+def test_to_frame_keeps_full_precision():
+    matrix = __matrix(
+        __prices([(1, 10, "S", 12345.678), (1, 20, "S", 100000.01), (2, 10, "NP", 2.5)])
+    )
+    df = matrix.to_frame()
+    assert df.loc[1].tolist() == [12345.678, 100000.01]
+    assert df.loc[2, "a"] == "NP"
+    assert np.isnan(df.loc[3, "b"])
+
+
+def test_preferred_stores_and_cheapest():
+    matrix = __matrix(
+        __prices([(1, 10, "S", 2.0), (1, 20, "S", 1.0), (2, 10, "S", 1.0)])
+    )
+    # item 2 may only be bought at store b, item 3 at an inactive store
+    allowed = matrix.at_preferred_store()
+    assert allowed.tolist() == [[True, True], [False, True], [False, False]]
+    assert matrix.cheapest().tolist() == [1, 0, -1]
+    assert matrix.cheapest(allowed).tolist() == [1, 1, -1]
+
+    taken = matrix.take([True, False, True])
+    assert taken.item_ids.tolist() == [1, 3]
+    assert taken.price(1, "b") == 1.0
+
+
+def test_from_db(populated):
+    matrix = PriceMatrix.from_db(populated)
+    prices = read_prices(populated)
+    for (store_id, item_id), price in prices["price"].items():
+        if store_id in matrix.store_ids and not np.isnan(price):
+            assert matrix.price(item_id, store_id) == price
+
+
+def test_price_book_round_trip_keeps_prices(populated, tmp_path):
+    table = models.Price.__table__
+    store_id, item_id = map(int, read_prices(populated).dropna().index[0])
+    populated.execute(
+        update(table)
+        .where(table.c.StoreID == store_id, table.c.ItemID == item_id)
+        .values(Price=12345.678)
+    )
+    populated.commit()
+    before = read_prices(populated)
+    n_history = populated.scalar(select(func.count()).select_from(models.PriceHistory))
+
+    path = tmp_path / "price_book.csv"
+    create_price_book(populated, path)
+    read_price_book(path, populated)
+    populated.commit()
+
+    pd.testing.assert_frame_equal(read_prices(populated), before)
+    assert (
+        populated.scalar(select(func.count()).select_from(models.PriceHistory))
+        == n_history
+    )
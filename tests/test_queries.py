@@ -0,0 +1,70 @@
+import os
+
+import pandas as pd
+import pytest
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.orm import Session
+
+from groceries.db import queries
+
+N_ROWS = 25
+
+
+@pytest.fixture
+def session(engine):
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE Numbers (Number INTEGER)"))
+        connection.execute(
+            text("INSERT INTO Numbers VALUES (:number)"),
+            [{"number": k} for k in range(N_ROWS)],
+        )
+    with Session(bind=engine) as session:
+        yield session
+
+
+@pytest.fixture
+def query_path(tmp_path):
+    path = tmp_path / "numbers.sql"
+    path.write_text("SELECT Number FROM Numbers ORDER BY Number")
+    return path
+
+
+def test_fetch_frame(session, query_path):
+    df = queries.fetch_frame(query_path, session)
+    assert df["Number"].tolist() == list(range(N_ROWS))
+    assert session.get_bind().pool.checkedout() == 0
+
+
+def test_fetch_chunks_exhausted(session, query_path):
+    chunks = list(queries.fetch_chunks(query_path, session, chunksize=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert pd.concat(chunks)["Number"].tolist() == list(range(N_ROWS))
+    assert session.get_bind().pool.checkedout() == 0
+
+
+def test_fetch_chunks_closed_early(session, query_path):
+    chunks = queries.fetch_chunks(query_path, session, chunksize=10)
+    assert len(next(chunks)) == 10
+    assert session.get_bind().pool.checkedout() == 1
+    chunks.close()
+    assert session.get_bind().pool.checkedout() == 0
+
+
+def test_query_parameters(session):
+    query = text("SELECT Number FROM Numbers WHERE Number < :limit")
+    df = queries.fetch_frame(query, session, params={"limit": 3})
+    assert df["Number"].tolist() == [0, 1, 2]
+
+
+def test_queries_are_loaded_once(query_path):
+    statement = queries.load_query(query_path)
+    assert queries.load_query(query_path) is statement
+
+    query_path.write_text("SELECT Number FROM Numbers WHERE Number > :as_of")
+    mtime = query_path.stat().st_mtime_ns + 10**9
+    os.utime(query_path, ns=(mtime, mtime))
+    edited = queries.load_query(query_path)
+    assert edited is not statement
+    # known parameters are typed
+    assert isinstance(edited.compile().binds["as_of"].type, DateTime)
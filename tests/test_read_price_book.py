@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+from conftest import load_price_book, read_prices
+from groceries import tabular
+from groceries.db import models
+from groceries.db.reference import get_reference
+from groceries.instrument import query_budget
+from groceries.price_book import create_price_book, read_price_book
+
+
+@pytest.fixture
+def price_book_path(populated, tmp_path):
+    path = tmp_path / "price_book.csv"
+    create_price_book(populated, path)
+    return path
+
+
+def __cell(df, store, blank):
+    """row position of a price cell at a store that is (or is not) blank"""
+    is_blank = df[store] == ""
+    return df.index[is_blank if blank else ~is_blank & (df[store] != "NP")][0]
+
+
+def test_unchanged_price_book_changes_nothing(populated, price_book_path):
+    before = read_prices(populated)
+    read_price_book(price_book_path, populated)
+    populated.commit()
+    pd.testing.assert_frame_equal(read_prices(populated), before)
+
+
+def test_price_book_changes_are_applied(populated, price_book_path):
+    reference = get_reference(populated)
+    store = reference.active_store_names[0]
+    store_id = reference.store_ids[store]
+
+    df = load_price_book(price_book_path)
+    updated = __cell(df, store, blank=False)
+    deleted = __cell(df.drop(index=updated), store, blank=False)
+    inserted = __cell(df, store, blank=True)
+    preferred = __cell(df.drop(index=[updated, deleted]), store, blank=False)
+
+    df.loc[updated, store] = 123.45
+    df.loc[deleted, store] = ""
+    df.loc[inserted, store] = 6.78
+    df.loc[preferred, store] = "P"
+    df.loc[updated, "category"] = df.loc[inserted, "category"]
+    tabular.write_table(price_book_path, df)
+
+    read_price_book(price_book_path, populated)
+    populated.commit()
+
+    prices = read_prices(populated)
+    item_ids = df["item_id"].astype(int)
+    assert prices.loc[(store_id, item_ids[updated]), "price"] == 123.45
+    assert (store_id, item_ids[deleted]) not in prices.index
+    assert prices.loc[(store_id, item_ids[inserted]), "price"] == 6.78
+    assert (
+        prices.loc[(store_id, item_ids[preferred]), "pt_id"]
+        == reference.preference_type_ids["P"]
+    )
+
+    item = populated.get(models.Item, int(item_ids[updated]))
+    assert item.category.category == df.loc[inserted, "category"]
+
+
+def test_pending_changes_are_flushed(populated, price_book_path):
+    item = populated.get(models.Item, 1)
+    item.description = "renamed"
+
+    # without autoflush, the change is only pending until the import flushes it
+    with populated.no_autoflush:
+        read_price_book(price_book_path, populated)
+    populated.commit()
+
+    populated.expire_all()
+    assert populated.get(models.Item, 1).description == "renamed"
+
+
+def test_query_count_does_not_depend_on_size(populated, price_book_path):
+    # load the reference data, which is cached
+    get_reference(populated)
+    with query_budget(10):
+        read_price_book(price_book_path, populated)
@@ -0,0 +1,46 @@
+from sqlalchemy import text, update
+
+from groceries.db import models, reference
+from groceries.db.reference import get_reference
+from groceries.instrument import stage
+
+
+def test_reference_is_cached(populated):
+    first = get_reference(populated)
+    with stage("cached") as metrics:
+        assert get_reference(populated) is first
+    assert metrics.queries == 0
+
+    assert first.store_ids == {name: id_ for id_, name in first.store_names.items()}
+    assert set(first.active_store_names) < set(first.store_ids)
+    assert set(first.preference_type_ids) == {"S", "P", "NP"}
+
+
+def test_reference_writes_clear_the_cache(populated):
+    first = get_reference(populated)
+    store = first.active_store_names[0]
+    populated.execute(
+        update(models.Store.__table__)
+        .where(models.Store.__table__.c.Store == store)
+        .values(Active=False)
+    )
+    populated.commit()
+    assert store not in get_reference(populated).active_stores
+
+    populated.execute(text("INSERT INTO Units (Unit) VALUES ('dozen')"))
+    populated.commit()
+    assert "dozen" in get_reference(populated).unit_ids
+
+
+def test_other_writes_keep_the_cache(populated):
+    first = get_reference(populated)
+    populated.execute(text("UPDATE Prices SET Price = Price + 1"))
+    populated.commit()
+    assert get_reference(populated) is first
+
+
+def test_invalidate(populated):
+    first = get_reference(populated)
+    reference.invalidate(populated.get_bind())
+    assert get_reference(populated) is not first
+    assert get_reference(populated) == first
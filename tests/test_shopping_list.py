@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from groceries import shopping_list
+
+
+def __list(rows):
+    return pd.DataFrame(rows, columns=["store", "category", "description", "price"])
+
+
+def test_get_changed():
+    original = __list(
+        [
+            ("a", "fruit", "apples", 1.0),
+            ("a", "fruit", "pears", 2.0),
+            ("b", "dairy", "milk", 3.0),
+            ("b", "dairy", "cheese", 4.0),
+            ("b", "bakery", "bread", None),
+        ]
+    )
+    updated = __list(
+        [
+            ("a", "fruit", "apples", 1.0),
+            ("b", "fruit", "pears", 1.5),
+            ("b", "dairy", "milk", 3.5),
+            ("a", "snacks", "chips", 2.0),
+            ("b", "bakery", "bread", None),
+        ]
+    )
+
+    changed = shopping_list.get_changed(original, updated)
+    assert changed["description"].tolist() == ["cheese", "milk", "pears", "chips"]
+    assert changed["change"].tolist() == [
+        shopping_list.REMOVED,
+        shopping_list.REPRICED,
+        shopping_list.MOVED_STORE,
+        shopping_list.ADDED,
+    ]
+    np.testing.assert_allclose(
+        changed["price_difference"], [np.nan, 0.5, -0.5, np.nan], equal_nan=True
+    )
+    assert changed.loc[2, ["original_store", "updated_store"]].tolist() == ["a", "b"]
+
+
+def test_get_changed_compares_prices_as_numbers():
+    # prices read back from a file can be text
+    original = __list([("a", "fruit", "apples", "1.50")])
+    updated = __list([("a", "fruit", "apples", 1.5)])
+    assert shopping_list.get_changed(original, updated).empty
+
+
+def test_get_changed_without_changes():
+    df = __list([("a", "fruit", "apples", 1.0)])
+    changed = shopping_list.get_changed(df, df)
+    assert changed.empty
+    assert "change" in changed.columns
@@ -0,0 +1,53 @@
+import pyarrow as pa
+import pytest
+
+from sqlalchemy import func, select, update
+
+from groceries import snapshot
+from groceries.db import models
+
+FORMATS = [".arrow", ".parquet"]
+
+
+@pytest.mark.parametrize("suffix", FORMATS)
+def test_snapshot_round_trip(populated, tmp_path, suffix):
+    path = tmp_path / f"prices{suffix}"
+    assert snapshot.write_snapshot(populated, path)
+
+    table = snapshot.read_snapshot(path)
+    n_prices = populated.scalar(select(func.count()).select_from(models.Price))
+    assert table.num_rows == n_prices
+    assert table.column_names == list(snapshot.snapshot_query().selected_columns.keys())
+    for name in snapshot.DICTIONARY_COLUMNS:
+        assert pa.types.is_dictionary(table.schema.field(name).type)
+    assert table.schema.field("note").type == pa.string()
+
+
+@pytest.mark.parametrize("suffix", FORMATS)
+def test_snapshot_is_skipped_when_up_to_date(populated, tmp_path, suffix):
+    path = tmp_path / f"prices{suffix}"
+    assert snapshot.write_snapshot(populated, path)
+    assert not snapshot.write_snapshot(populated, path)
+    assert snapshot.write_snapshot(populated, path, force=True)
+
+    # a price history snapshot is a different snapshot of the same revision
+    assert snapshot.write_snapshot(populated, path, history=True)
+    assert snapshot.read_revision(path)["history"]
+
+    populated.execute(update(models.Price).values(price=models.Price.price + 1))
+    populated.commit()
+    assert snapshot.write_snapshot(populated, path, history=True)
+
+
+def test_missing_snapshot_has_no_revision(tmp_path):
+    assert snapshot.read_revision(tmp_path / "prices.arrow") is None
+
+
+def test_arrow_snapshot_is_memory_mapped(populated, tmp_path):
+    path = tmp_path / "prices.arrow"
+    snapshot.write_snapshot(populated, path)
+
+    allocated = pa.total_allocated_bytes()
+    table = snapshot.read_snapshot(path, columns=["item_id", "price"])
+    assert table.column_names == ["item_id", "price"]
+    assert pa.total_allocated_bytes() == allocated
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import SQL_PATH
+from groceries import solver
+from groceries.db import populate
+from groceries.db.generate import generate_setup
+from groceries.price_matrix import PriceMatrix
+from groceries.shopping_list import get_shopping_list
+
+INF = np.inf
+
+
+def __matrix(prices, pref_store_ids=None):
+    """price matrix of items 1, 2, ... at stores "a", "b", ... from (price, pt) cells"""
+    n_items, n_stores = len(prices), len(prices[0])
+    stores = {chr(ord("a") + k): k + 1 for k in range(n_stores)}
+    items = pd.DataFrame(
+        {
+            "item_id": np.arange(1, n_items + 1),
+            "category": "category",
+            "description": [f"item {k}" for k in range(n_items)],
+            "unit": None,
+            "pref_store_id": pref_store_ids or [None] * n_items,
+            "pref_store": None,
+            "active": True,
+        }
+    )
+    cells = pd.DataFrame(
+        [
+            {"item_id": row + 1, "store_id": col + 1, "price": price, "pt": pt}
+            for row, cells in enumerate(prices)
+            for col, (price, pt) in enumerate(cells)
+            if pt is not None
+        ]
+    )
+    return PriceMatrix.from_prices(items, cells, stores, ["S", "P", "NP"])
+
+
+def test_cost_matrix_rules():
+    matrix = __matrix(
+        [
+            [(1.0, "S"), (2.0, "S"), (0.5, "NP")],
+            [(1.0, "S"), (None, "P"), (3.0, "P")],
+            [(1.0, "S"), (2.0, "S"), (None, None)],
+        ],
+        pref_store_ids=[None, None, 2],
+    )
+    costs = solver.cost_matrix(matrix)
+    np.testing.assert_array_equal(
+        costs,
+        [
+            # not preferred prices are never chosen
+            [1.0, 2.0, INF],
+            # standard and preferred prices alike, prices without a value never
+            [1.0, INF, 3.0],
+            # only the preferred store
+            [INF, 2.0, INF],
+        ],
+    )
+
+
+def test_without_trip_cost_every_item_is_at_its_cheapest_store():
+    costs = np.array([[1.0, 2.0, 3.0], [3.0, 1.0, 2.0], [3.0, 2.0, 1.0]])
+    np.testing.assert_array_equal(solver.solve(costs), [0, 1, 2])
+
+
+def test_trip_cost_consolidates_stores():
+    costs = np.array([[1.0, 1.1], [2.0, 2.1], [3.0, 2.9]])
+    np.testing.assert_array_equal(solver.solve(costs), [0, 0, 1])
+    np.testing.assert_array_equal(solver.solve(costs, trip_cost=1.0), [0, 0, 0])
+
+
+def test_a_store_is_kept_when_an_item_is_only_sold_there():
+    costs = np.array([[1.0, INF], [INF, 1.0], [INF, INF]])
+    assignment = solver.solve(costs, trip_cost=100.0)
+    np.testing.assert_array_equal(assignment, [0, 1, -1])
+
+
+def test_optimized_shopping_list(populated):
+    cheapest = solver.optimize_shopping_list(populated, trip_cost=0.0)
+    optimized = solver.optimize_shopping_list(populated, trip_cost=5.0)
+    assert len(optimized) == len(cheapest)
+
+    def total(df, trip_cost):
+        return df["price"].sum() + trip_cost * df["store"].nunique()
+
+    assert optimized["store"].nunique() <= cheapest["store"].nunique()
+    assert total(optimized, 5.0) <= total(cheapest, 5.0)
+
+
+@pytest.fixture
+def preferred(tmp_path, session):
+    """session of a database with many preferred prices, most without a price value"""
+    path = tmp_path / "preferred"
+    generate_setup(path, n_items=60, n_stores=5, preferred_density=0.3, seed=0)
+    populate.initial_populate(path, session)
+    return session
+
+
+def test_without_trip_cost_the_shopping_list_is_reproduced(preferred):
+    def ordered(df):
+        return df.sort_values("description").reset_index(drop=True)
+
+    optimized = ordered(solver.optimize_shopping_list(preferred, trip_cost=0.0))
+    expected = ordered(get_shopping_list(None, preferred))
+    pd.testing.assert_frame_equal(optimized, expected, check_dtype=False)
+
+    # the query picks an arbitrary store for items without any price value, all
+    # other items are at the same store
+    queried = ordered(get_shopping_list(SQL_PATH / "shopping_list.sql", preferred))
+    assert optimized["description"].tolist() == queried["description"].tolist()
+    priced = queried["price"].notnull()
+    assert optimized["price"].isnull().tolist() == (~priced).tolist()
+    pd.testing.assert_frame_equal(optimized[priced], queried[priced], check_dtype=False)
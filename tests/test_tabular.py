@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from groceries import tabular
+
+FORMATS = [".xlsx", ".csv", ".parquet"]
+
+
+def __df():
+    return pd.DataFrame(
+        {"description": ["apples", "milk", "bread"], "price": [1.5, np.nan, 2.25]}
+    )
+
+
+@pytest.mark.parametrize("suffix", FORMATS)
+def test_table_round_trip(tmp_path, suffix):
+    path = tmp_path / f"table{suffix}"
+    tabular.write_table(path, __df(), number_formats={"price": tabular.PRICE_FORMAT})
+    pd.testing.assert_frame_equal(tabular.read_table(path), __df())
+
+
+@pytest.mark.parametrize("suffix", FORMATS)
+def test_sheets_round_trip(tmp_path, suffix):
+    path = tmp_path / f"sheets{suffix}"
+    sheets = {"store a": __df(), "store b": __df().head(1)}
+    tabular.write_sheets(path, sheets)
+
+    read = tabular.read_sheets(path)
+    assert list(read) == list(sheets)
+    for name, df in sheets.items():
+        pd.testing.assert_frame_equal(read[name], df)
+
+
+@pytest.mark.parametrize("suffix", FORMATS)
+def test_missing_values_as_empty_strings(tmp_path, suffix):
+    path = tmp_path / f"table{suffix}"
+    tabular.write_table(path, __df())
+    df = tabular.read_table(path, na_filter=False)
+    assert df.loc[1, "price"] == ""
+
+
+@pytest.mark.parametrize("suffix", FORMATS)
+def test_read_chunks(tmp_path, suffix):
+    path = tmp_path / f"table{suffix}"
+    tabular.write_table(path, __df())
+    chunks = list(tabular.read_chunks(path, 2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), __df())
+
+
+def test_unsupported_format(tmp_path):
+    with pytest.raises(ValueError, match="unsupported file type"):
+        tabular.read_table(tmp_path / "table.txt")
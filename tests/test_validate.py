@@ -0,0 +1,67 @@
+import pytest
+
+from conftest import load_price_book, read_prices
+from groceries.db.reference import get_reference
+from groceries.price_book import create_price_book, read_price_book
+from groceries.price_book.validate import (
+    check_price_book,
+    MAX_REPORTED,
+    PriceBookValidationError,
+    validate_price_book,
+)
+
+
+@pytest.fixture
+def price_book(populated, tmp_path):
+    path = tmp_path / "price_book.csv"
+    create_price_book(populated, path)
+    return load_price_book(path)
+
+
+def test_valid_price_book(populated, price_book):
+    assert validate_price_book(price_book, get_reference(populated)).empty
+    check_price_book(price_book, get_reference(populated))
+
+
+def test_every_error_is_reported(populated, price_book):
+    store = get_reference(populated).active_store_names[0]
+    df = price_book.rename(columns={"pref_store": "store"}).astype({"item_id": object})
+    df.loc[0, "item_id"] = "one"
+    df.loc[2, "item_id"] = df.loc[1, "item_id"]
+    df.loc[3, "category"] = "no category"
+    df.loc[4, store] = "cheap"
+    df.loc[5, store] = "-1"
+    df.loc[6, store] = " P "
+
+    errors = validate_price_book(df, get_reference(populated))
+    assert errors.values.tolist() == [
+        [1, "pref_store", None, "missing"],
+        [1, "store", "store", "unknown store"],
+        [2, "item_id", "one", "not a whole number"],
+        [3, "item_id", df.loc[1, "item_id"], "listed more than once"],
+        [4, "item_id", df.loc[1, "item_id"], "listed more than once"],
+        [5, "category", "no category", "unknown category"],
+        [6, store, "cheap", "not a price or a preference type"],
+        [7, store, "-1", "price is not above zero"],
+    ]
+
+
+def test_rows_of_a_selection_keep_their_position(populated, price_book):
+    store = get_reference(populated).active_store_names[0]
+    price_book.loc[10, store] = "cheap"
+    errors = validate_price_book(price_book.iloc[8:12], get_reference(populated))
+    assert errors["row"].tolist() == [12]
+
+
+def test_invalid_price_book_changes_nothing(populated, price_book, tmp_path):
+    store = get_reference(populated).active_store_names[0]
+    price_book[store] = "cheap"
+    path = tmp_path / "invalid.csv"
+    price_book.to_csv(path, index=False)
+
+    before = read_prices(populated)
+    with pytest.raises(PriceBookValidationError) as exc:
+        read_price_book(path, populated)
+    assert len(exc.value.errors) == len(price_book)
+    assert f"and {len(price_book) - MAX_REPORTED} more" in str(exc.value)
+    assert read_prices(populated).equals(before)
@@ -0,0 +1,89 @@
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import load_price_book, read_prices, SQL_PATH
+from groceries import tabular
+from groceries.price_book import create_price_book
+from groceries.price_book.validate import PriceBookValidationError
+from groceries.watch import changed_rows, PriceBookWatcher
+
+
+def __book():
+    return pd.DataFrame(
+        {
+            "item_id": [1, 2, 3],
+            "description": ["a", "b", "c"],
+            "store": ["1.5", "", "P"],
+        }
+    )
+
+
+def __save(path, df):
+    """write a price book, with a later modification time than the last save"""
+    mtime = path.stat().st_mtime_ns if path.exists() else None
+    tabular.write_table(path, df)
+    if mtime is not None:
+        os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+
+def test_changed_rows():
+    previous = __book()
+    assert changed_rows(None, previous) is previous
+    assert changed_rows(previous, __book()).empty
+
+    current = __book()
+    current.loc[1, "store"] = "2.0"
+    current.loc[2, "store"] = "1.0"
+    assert changed_rows(previous, current)["item_id"].tolist() == [2, 3]
+
+    current = pd.concat([__book(), __book().head(1).assign(item_id=4)])
+    assert changed_rows(previous, current)["item_id"].tolist() == [4]
+
+    current = __book().rename(columns={"store": "other store"})
+    assert changed_rows(previous, current) is current
+
+
+@pytest.fixture
+def watcher(populated, tmp_path):
+    path = tmp_path / "price_book.csv"
+    create_price_book(populated, path)
+    return PriceBookWatcher(
+        path,
+        populated,
+        output_path=tmp_path / "shopping_list.xlsx",
+        changed_path=tmp_path / "changed.xlsx",
+        sql_path=SQL_PATH / "shopping_list.sql",
+    )
+
+
+def test_watcher_applies_saved_edits(watcher, populated):
+    n_rows = len(load_price_book(watcher.price_book_path))
+    assert watcher.poll() == n_rows
+    assert watcher.output_path.exists()
+    assert watcher.poll() is None
+
+    df = load_price_book(watcher.price_book_path)
+    store = df.columns[-1]
+    row = df.index[df[store] == ""][0]
+    df.loc[row, store] = 0.01
+    __save(watcher.price_book_path, df)
+
+    assert watcher.poll() == 1
+    item_id = int(df.loc[row, "item_id"])
+    prices = read_prices(populated).reset_index()
+    assert (prices.loc[prices["item_id"] == item_id, "price"] == 0.01).any()
+    assert 0.01 in watcher.shopping_list["price"].tolist()
+    assert watcher.changed_path.exists()
+
+
+def test_failed_edit_is_not_retried(watcher):
+    watcher.poll()
+    df = load_price_book(watcher.price_book_path)
+    df.loc[0, df.columns[-1]] = "not a price"
+    __save(watcher.price_book_path, df)
+
+    with pytest.raises(PriceBookValidationError):
+        watcher.poll()
+    assert watcher.poll() is None
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from openpyxl import load_workbook
+
+from groceries import writer
+
+PRICE_FORMAT = "0.000"
+
+
+def __df():
+    return pd.DataFrame(
+        {
+            "description": ["apples (per lb)", "milk", "bread"],
+            "price": [1.5, np.nan, 2.25],
+        }
+    )
+
+
+def test_sheets_are_written(tmp_path):
+    path = tmp_path / "out.xlsx"
+    writer.write_excel(path, {"first": __df(), "second": __df().head(1)})
+
+    workbook = load_workbook(path)
+    assert workbook.sheetnames == ["first", "second"]
+
+    rows = list(workbook["first"].iter_rows(values_only=True))
+    assert rows == [
+        ("description", "price"),
+        ("apples (per lb)", 1.5),
+        ("milk", None),
+        ("bread", 2.25),
+    ]
+    assert len(list(workbook["second"].iter_rows())) == 2
+
+
+def test_single_frame_is_written_to_one_sheet(tmp_path):
+    path = tmp_path / "out.xlsx"
+    writer.write_excel(path, __df())
+    assert load_workbook(path).sheetnames == ["Sheet1"]
+
+
+def test_formatted_as_written(tmp_path):
+    path = tmp_path / "out.xlsx"
+    writer.write_excel(path, __df(), number_formats={"price": PRICE_FORMAT})
+
+    worksheet = load_workbook(path)["Sheet1"]
+    assert worksheet["A1"].font.bold
+    assert worksheet["B2"].number_format == PRICE_FORMAT
+    assert worksheet["A2"].number_format == "General"
+    assert worksheet.column_dimensions["A"].width == len("apples (per lb)") + 1